@@ -0,0 +1,303 @@
+"""
+Generador de carga y medidor de latencia del servidor.
+
+Simula muchos clientes concurrentes (tareas asyncio, sin pygame) que
+mezclan guardar_resultado y solicitar_mejores en la proporción pedida,
+con los mismos mensajes que construyen los juegos (client/common/mensajes.py).
+Cada cliente reutiliza su conexión para --por-conexion peticiones (0 = toda
+la prueba) y después reconecta. Al terminar muestra el ritmo y los
+percentiles p50/p95/p99 de latencia por acción.
+
+Sin --host arranca un servidor local en un directorio temporal, con una
+base de datos nueva y un puerto libre, y lo para al terminar; así puede
+ejecutarse antes de desplegar para detectar regresiones (--max-p99-ms
+devuelve código 1 si el p99 global lo supera).
+
+Ten en cuenta que el generador también es Python: con muchos clientes
+puede ser él quien sature un núcleo. Compara siempre ejecuciones con los
+mismos parámetros.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.carga
+    python -m benchmarks.carga --clientes 2000 --duracion 20 --lecturas 0.8
+    python -m benchmarks.carga --servidor multiproceso --procesos 4 --binario
+    python -m benchmarks.carga --host 127.0.0.1 --port 5000   # servidor ya arrancado
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from client.common import mensajes
+from client.common.communication import construir_lote
+from protocolo import binario
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+JUEGOS = ("nreinas", "caballo", "hanoi")
+
+
+# — Mensajes —
+
+def mensaje_escritura() -> dict:
+    """Un guardar_resultado aleatorio, como los que envían los juegos."""
+    juego = random.choice(JUEGOS)
+    completado = random.random() < 0.7
+    if juego == "nreinas":
+        return mensajes.resultado_nreinas(random.randint(4, 12), random.randint(1, 200), completado)
+    if juego == "caballo":
+        inicio = (random.randrange(8), random.randrange(8))
+        return mensajes.resultado_caballo(inicio, random.randint(1, 63), completado)
+    discos = random.randint(3, 8)
+    return mensajes.resultado_hanoi(discos, random.randint(2 ** discos - 1, 2 ** discos + 100), completado)
+
+
+def mensaje_lectura() -> dict:
+    return mensajes.solicitar_mejores(random.choice(JUEGOS))
+
+
+# — Servidor local —
+
+def _puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def arrancar_servidor(modo, procesos, directorio) -> tuple:
+    """Lanza el servidor en 'directorio' con una BD nueva. Devuelve (proceso, puerto)."""
+    puerto = _puerto_libre()
+    entorno = dict(os.environ)
+    entorno.update({
+        "PYTHONPATH": RAIZ + os.pathsep + entorno.get("PYTHONPATH", ""),
+        "ARCADE_HOST": "127.0.0.1",
+        "ARCADE_PORT": str(puerto),
+        "ARCADE_ALMACEN": "sqlite",
+        "ARCADE_DB_URL": "sqlite:///" + os.path.join(directorio, "carga.db"),
+    })
+    if modo == "multiproceso":
+        orden = [sys.executable, "-m", "server.multiproceso", "--procesos", str(procesos)]
+    else:
+        orden = [sys.executable, "-m", "server.main", "--modo", modo]
+    salida = open(os.path.join(directorio, "servidor.log"), "w")
+    proc = subprocess.Popen(orden, cwd=directorio, env=entorno,
+                            stdout=salida, stderr=subprocess.STDOUT)
+    limite = time.monotonic() + 30
+    while time.monotonic() < limite:
+        if proc.poll() is not None:
+            raise RuntimeError(f"El servidor terminó al arrancar (código {proc.returncode}); "
+                               f"ver {salida.name}")
+        try:
+            socket.create_connection(("127.0.0.1", puerto), timeout=0.5).close()
+            return proc, puerto
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("El servidor no empezó a escuchar en 30 s")
+
+
+def parar_servidor(proc):
+    proc.terminate()
+    try:
+        proc.wait(15)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+def _subir_limite_descriptores():
+    # Miles de clientes necesitan miles de sockets (aquí y en el servidor hijo)
+    try:
+        import resource
+        blando, duro = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if duro == resource.RLIM_INFINITY or blando < duro:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (duro, duro))
+    except (ImportError, ValueError, OSError):
+        pass
+
+
+# — Clientes —
+
+class Medidas:
+    def __init__(self):
+        self.latencias = {"guardar_resultado": [], "solicitar_mejores": []}
+        self.errores = {"guardar_resultado": 0, "solicitar_mejores": 0}
+        self.conexiones = 0
+        self.fallos_conexion = 0
+
+
+async def _leer_respuesta(reader, usar_binario) -> dict:
+    if usar_binario:
+        cabecera = await reader.readexactly(5)
+        longitud = int.from_bytes(cabecera[1:], "big")
+        return binario.decodificar(await reader.readexactly(longitud))
+    return json.loads(await reader.readuntil(b"\n"))
+
+
+async def cliente(host, port, fin, lecturas, por_conexion, usar_binario, retraso, medidas):
+    await asyncio.sleep(retraso)
+    while time.monotonic() < fin:
+        try:
+            reader, writer = await asyncio.open_connection(host, port, limit=1024 * 1024)
+        except OSError:
+            medidas.fallos_conexion += 1
+            await asyncio.sleep(0.1)
+            continue
+        medidas.conexiones += 1
+        enviadas = 0
+        try:
+            while time.monotonic() < fin and (not por_conexion or enviadas < por_conexion):
+                msg = mensaje_lectura() if random.random() < lecturas else mensaje_escritura()
+                datos = (binario.codificar(msg) if usar_binario
+                         else (json.dumps(msg) + "\n").encode("utf-8"))
+                inicio = time.perf_counter()
+                writer.write(datos)
+                await writer.drain()
+                resp = await _leer_respuesta(reader, usar_binario)
+                latencia = time.perf_counter() - inicio
+                accion = msg["acción"]
+                if resp.get("acción") == "error":
+                    medidas.errores[accion] += 1
+                else:
+                    medidas.latencias[accion].append(latencia)
+                enviadas += 1
+        except (OSError, asyncio.IncompleteReadError):
+            medidas.fallos_conexion += 1
+        finally:
+            writer.close()
+
+
+async def precargar(host, port, cantidad):
+    """Guarda 'cantidad' resultados para que el top no esté vacío."""
+    reader, writer = await asyncio.open_connection(host, port, limit=1024 * 1024)
+    try:
+        for inicio in range(0, cantidad, 500):
+            lote = [mensaje_escritura() for _ in range(min(500, cantidad - inicio))]
+            writer.write((json.dumps(construir_lote(lote)) + "\n").encode("utf-8"))
+            await writer.drain()
+            await reader.readuntil(b"\n")
+    finally:
+        writer.close()
+
+
+async def generar_carga(host, port, args) -> tuple:
+    medidas = Medidas()
+    if args.precarga:
+        await precargar(host, port, args.precarga)
+    inicio = time.monotonic()
+    fin = inicio + args.rampa + args.duracion
+    # La rampa reparte las conexiones iniciales para no desbordar el backlog
+    tareas = [
+        asyncio.create_task(cliente(host, port, fin, args.lecturas, args.por_conexion,
+                                    args.binario, args.rampa * i / args.clientes, medidas))
+        for i in range(args.clientes)
+    ]
+    await asyncio.gather(*tareas)
+    return medidas, time.monotonic() - inicio
+
+
+# — Informe —
+
+def percentil(ordenadas, p) -> float:
+    if not ordenadas:
+        return 0.0
+    return ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * p / 100))]
+
+
+def resumir(medidas, segundos) -> dict:
+    informe = {}
+    todas = []
+    for accion, latencias in medidas.latencias.items():
+        latencias.sort()
+        todas.extend(latencias)
+        informe[accion] = _fila(latencias, medidas.errores[accion], segundos)
+    todas.sort()
+    informe["total"] = _fila(todas, sum(medidas.errores.values()), segundos)
+    informe["conexiones"] = medidas.conexiones
+    informe["fallos_conexion"] = medidas.fallos_conexion
+    informe["segundos"] = segundos
+    return informe
+
+
+def _fila(latencias, errores, segundos) -> dict:
+    return {
+        "peticiones": len(latencias),
+        "errores": errores,
+        "por_segundo": len(latencias) / segundos if segundos else 0.0,
+        "p50_ms": percentil(latencias, 50) * 1000,
+        "p95_ms": percentil(latencias, 95) * 1000,
+        "p99_ms": percentil(latencias, 99) * 1000,
+        "max_ms": (latencias[-1] * 1000) if latencias else 0.0,
+    }
+
+
+def imprimir_informe(informe):
+    print(f"\n{'acción':<20}{'peticiones':>11}{'errores':>9}{'pet/s':>10}"
+          f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'máx ms':>9}")
+    for accion in ("guardar_resultado", "solicitar_mejores", "total"):
+        f = informe[accion]
+        print(f"{accion:<20}{f['peticiones']:>11}{f['errores']:>9}{f['por_segundo']:>10.0f}"
+              f"{f['p50_ms']:>9.2f}{f['p95_ms']:>9.2f}{f['p99_ms']:>9.2f}{f['max_ms']:>9.2f}")
+    print(f"\nConexiones: {informe['conexiones']}  fallos: {informe['fallos_conexion']}  "
+          f"duración: {informe['segundos']:.1f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generador de carga y latencia del servidor")
+    parser.add_argument("--clientes", type=int, default=1000, help="clientes concurrentes")
+    parser.add_argument("--duracion", type=float, default=10.0, help="segundos de medida")
+    parser.add_argument("--rampa", type=float, default=1.0,
+                        help="segundos en los que se reparten las conexiones iniciales")
+    parser.add_argument("--lecturas", type=float, default=0.5,
+                        help="fracción de solicitar_mejores (el resto son guardar_resultado)")
+    parser.add_argument("--por-conexion", type=int, default=0,
+                        help="peticiones por conexión antes de reconectar (0 = reutilizar siempre)")
+    parser.add_argument("--binario", action="store_true", help="usa el protocolo binario")
+    parser.add_argument("--precarga", type=int, default=200,
+                        help="resultados guardados antes de medir")
+    parser.add_argument("--host", help="servidor ya arrancado (si no, se lanza uno local)")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--servidor", choices=("asyncio", "hilos", "multiproceso"),
+                        default="asyncio", help="modo del servidor local")
+    parser.add_argument("--procesos", type=int, default=os.cpu_count() or 1,
+                        help="trabajadores del servidor local multiproceso")
+    parser.add_argument("--salida", help="guarda el informe en este fichero JSON")
+    parser.add_argument("--max-p99-ms", type=float,
+                        help="falla (código 1) si el p99 global supera este valor")
+    args = parser.parse_args()
+
+    _subir_limite_descriptores()
+    directorio = proc = None
+    host, port = args.host, args.port
+    if host is None:
+        directorio = tempfile.mkdtemp(prefix="arcade-carga-")
+        proc, port = arrancar_servidor(args.servidor, args.procesos, directorio)
+        host = "127.0.0.1"
+        print(f"Servidor local ({args.servidor}) en {host}:{port}, datos en {directorio}")
+    try:
+        print(f"{args.clientes} clientes, {args.duracion:.0f} s, "
+              f"{args.lecturas:.0%} lecturas, protocolo {'binario' if args.binario else 'JSON'}")
+        medidas, segundos = asyncio.run(generar_carga(host, port, args))
+    finally:
+        if proc is not None:
+            parar_servidor(proc)
+            shutil.rmtree(directorio, ignore_errors=True)
+
+    informe = resumir(medidas, segundos)
+    imprimir_informe(informe)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(informe, f, indent=2)
+    if args.max_p99_ms is not None and informe["total"]["p99_ms"] > args.max_p99_ms:
+        print(f"REGRESIÓN: p99 {informe['total']['p99_ms']:.2f} ms > {args.max_p99_ms} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Informe de importación del menú del cliente (python -X importtime).
+
+Lanza un intérprete nuevo que importa --modulo (por defecto el menú,
+client.common.base_client) con -X importtime y muestra el tiempo total y
+los módulos que más tardan (tiempo acumulado, con lo que importan). Además
+comprueba que no se haya importado ninguno de PROHIBIDOS: los juegos y la
+IA (transformers, torch) se cargan al elegirlos en el menú, no al arrancar.
+
+Con --primer-fotograma mide también el arranque completo hasta el primer
+fotograma del menú (intérprete incluido), con SDL sin ventana.
+
+Sirve como comprobación de regresiones antes de desplegar: devuelve código
+1 si se importa algo prohibido o si se superan --max-ms (importación) o
+--max-fotograma-ms.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.importtime
+    python -m benchmarks.importtime --top 20 --max-ms 500
+    python -m benchmarks.importtime --primer-fotograma --max-fotograma-ms 1000
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Módulos que el menú no debe importar al arrancar (y sus submódulos)
+PROHIBIDOS = ("transformers", "torch", "client.nreinas", "client.caballo", "client.hanoi")
+
+# "import time:  self [us] | cumulative | imported package", con el nombre
+# sangrado según la profundidad
+_LINEA = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+# Código del proceso hijo de --primer-fotograma: sale en cuanto se pinta el menú
+_PRIMER_FOTOGRAMA = """
+import os, pygame
+flip = pygame.display.flip
+def primer_flip():
+    flip()
+    os._exit(0)
+pygame.display.flip = primer_flip
+from client.common import base_client
+base_client.run_menu()
+"""
+
+
+def _entorno(**extra) -> dict:
+    entorno = dict(os.environ)
+    entorno["PYTHONPATH"] = RAIZ + os.pathsep + entorno.get("PYTHONPATH", "")
+    entorno.update(extra)
+    return entorno
+
+
+def importar(modulo) -> list:
+    """
+    Importa 'modulo' en un intérprete nuevo con -X importtime.
+    Devuelve [(módulo, propio µs, acumulado µs, profundidad)] en orden.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+        cwd=RAIZ, env=_entorno(), capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    filas = []
+    for linea in proc.stderr.splitlines():
+        m = _LINEA.match(linea)
+        if m:
+            # La sangría crece de 2 en 2 espacios por nivel
+            filas.append((m.group(4), int(m.group(1)), int(m.group(2)), (len(m.group(3)) - 1) // 2))
+    return filas
+
+
+def prohibidos(filas) -> list:
+    return sorted({
+        nombre for nombre, _, _, _ in filas
+        if any(nombre == p or nombre.startswith(p + ".") for p in PROHIBIDOS)
+    })
+
+
+def primer_fotograma() -> float:
+    """Segundos desde lanzar el intérprete hasta el primer fotograma del menú."""
+    inicio = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-c", _PRIMER_FOTOGRAMA],
+        cwd=RAIZ, env=_entorno(SDL_VIDEODRIVER="dummy", SDL_AUDIODRIVER="dummy"),
+        capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    return time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo de importación del menú del cliente")
+    parser.add_argument("--modulo", default="client.common.base_client")
+    parser.add_argument("--top", type=int, default=15, help="módulos más lentos que se muestran")
+    parser.add_argument("--repeticiones", type=int, default=3,
+                        help="se queda con la más rápida (la primera paga la caché de disco fría)")
+    parser.add_argument("--max-ms", type=float, help="código 1 si la importación tarda más")
+    parser.add_argument("--primer-fotograma", action="store_true",
+                        help="mide también el arranque hasta el primer fotograma del menú")
+    parser.add_argument("--max-fotograma-ms", type=float,
+                        help="código 1 si el primer fotograma tarda más (implica --primer-fotograma)")
+    args = parser.parse_args()
+
+    try:
+        filas = min((importar(args.modulo) for _ in range(max(1, args.repeticiones))),
+                    key=lambda f: sum(acumulado for _, _, acumulado, nivel in f if nivel == 0))
+    except RuntimeError as e:
+        sys.exit(f"[ERROR] No se pudo importar {args.modulo}: {e}")
+    total_ms = sum(acumulado for _, _, acumulado, nivel in filas if nivel == 0) / 1000
+
+    print(f"{'módulo':<50}{'propio ms':>11}{'acumulado ms':>14}")
+    for nombre, propio, acumulado, nivel in sorted(filas, key=lambda f: -f[2])[:args.top]:
+        print(f"{'  ' * nivel + nombre:<50}{propio / 1000:>11.1f}{acumulado / 1000:>14.1f}")
+    print(f"\n{len(filas)} módulos, {total_ms:.1f} ms en importar {args.modulo}")
+
+    fallo = False
+    encontrados = prohibidos(filas)
+    if encontrados:
+        print(f"[REGRESIÓN] Se importan al arrancar: {', '.join(encontrados)}")
+        fallo = True
+    if args.max_ms is not None and total_ms > args.max_ms:
+        print(f"[REGRESIÓN] La importación supera {args.max_ms:.0f} ms")
+        fallo = True
+    if args.primer_fotograma or args.max_fotograma_ms is not None:
+        try:
+            fotograma_ms = min(primer_fotograma() for _ in range(max(1, args.repeticiones))) * 1000
+        except RuntimeError as e:
+            sys.exit(f"[ERROR] No se pudo abrir el menú: {e}")
+        print(f"Primer fotograma del menú: {fotograma_ms:.0f} ms (intérprete incluido)")
+        if args.max_fotograma_ms is not None and fotograma_ms > args.max_fotograma_ms:
+            print(f"[REGRESIÓN] El primer fotograma supera {args.max_fotograma_ms:.0f} ms")
+            fallo = True
+    sys.exit(1 if fallo else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Comparativa JSON vs protocolo binario: bytes en el cable y CPU por mensaje.
+
+Para cada tipo de mensaje mide el tamaño de la trama y el tiempo de
+codificar + separar + decodificar (el trabajo de emisor y receptor).
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.protocolo [--repeticiones 20000]
+"""
+import argparse
+import json
+import time
+
+from protocolo import binario
+from protocolo.framing import LectorTramas
+
+TS = "2024-05-01T10:11:12.123456Z"
+
+MENSAJES = {
+    "guardar nreinas": {
+        "juego": "nreinas", "acción": "guardar_resultado",
+        "datosPartida": {"N": 8, "resuelto": True, "intentos": 12}, "timestamp": TS,
+    },
+    "guardar caballo": {
+        "juego": "caballo", "acción": "guardar_resultado",
+        "datosPartida": {"posicion_inicial": "(3, 4)", "movimientos": 63, "completado": True},
+        "timestamp": TS,
+    },
+    "guardar hanoi": {
+        "juego": "hanoi", "acción": "guardar_resultado",
+        "datosPartida": {"discos": 5, "movimientos": 31, "completado": True}, "timestamp": TS,
+    },
+    "solicitar_mejores": {"juego": "hanoi", "acción": "solicitar_mejores", "timestamp": TS},
+    "confirmación": {
+        "acción": "confirmación", "status": "ok", "timestamp": TS, "mensaje": "Resultado guardado",
+    },
+    "mejores (5)": {
+        "acción": "confirmación", "status": "ok", "timestamp": TS,
+        "mejores": [
+            {"id": i, "discos": 5, "movimientos": 31 + i, "completado": True, "timestamp": TS}
+            for i in range(1, 6)
+        ],
+    },
+}
+
+
+def _json_ida_vuelta(msg, lector):
+    trama = (json.dumps(msg) + "\n").encode("utf-8")
+    for t in lector.alimentar(trama):
+        json.loads(t)
+    return trama
+
+
+def _binario_ida_vuelta(msg, lector):
+    trama = binario.codificar(msg)
+    for t in lector.alimentar(trama):
+        binario.decodificar(t)
+    return trama
+
+
+def medir(funcion, msg, lector, repeticiones) -> float:
+    """Microsegundos por mensaje."""
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion(msg, lector)
+    return (time.perf_counter() - inicio) / repeticiones * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON vs binario: bytes y CPU por mensaje")
+    parser.add_argument("--repeticiones", type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"{'mensaje':<20}{'bytes json':>11}{'bytes bin':>10}{'ahorro':>8}"
+          f"{'µs json':>10}{'µs bin':>9}{'ahorro':>8}")
+    for nombre, msg in MENSAJES.items():
+        bytes_json = len(_json_ida_vuelta(msg, LectorTramas()))
+        bytes_bin = len(_binario_ida_vuelta(msg, binario.LectorBinario()))
+        us_json = medir(_json_ida_vuelta, msg, LectorTramas(), args.repeticiones)
+        us_bin = medir(_binario_ida_vuelta, msg, binario.LectorBinario(), args.repeticiones)
+        print(f"{nombre:<20}{bytes_json:>11}{bytes_bin:>10}{1 - bytes_bin / bytes_json:>8.0%}"
+              f"{us_json:>10.2f}{us_bin:>9.2f}{1 - us_bin / us_json:>8.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,7 @@
 import pygame
 import sys
-from datetime import datetime
-from client.common.communication import send_and_receive
-from client.common.threading_utils import run_async
+from client.common import outbox
+from client.common.mensajes import resultado_caballo
 from client.common.ia_client import solicitar_sugerencia_async
 
 # — Configuración Pygame —
@@ -27,22 +26,12 @@ KNIGHT_MOVES = [
     (-2,-1),(-1,-2),(1,-2),(2,-1)
 ]
 
-@run_async
 def enviar_resultado(initial_pos, movimientos, completado):
-    msg = {
-        "juego": "caballo",
-        "acción": "guardar_resultado",
-        "datosPartida": {
-            "posicion_inicial": str(initial_pos),
-            "movimientos": movimientos,
-            "completado": completado
-        },
-        "timestamp": datetime.utcnow().isoformat() + "Z"
-    }
-    try:
-        send_and_receive(msg)
-    except:
-        pass
+    """
+    Apunta el resultado en el buzón local; un hilo de fondo lo envía al
+    servidor (reintentando si no está disponible) sin bloquear la UI.
+    """
+    outbox.encolar(resultado_caballo(initial_pos, movimientos, completado))
 
 
 def warnsdorff_next(visited, current):
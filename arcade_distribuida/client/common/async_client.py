@@ -0,0 +1,173 @@
+"""
+Cliente asyncio con varias peticiones en vuelo por conexión (pipelining).
+
+Para pasarelas y herramientas que lanzan muchas peticiones a la vez: en
+lugar de esperar cada respuesta antes de enviar la siguiente, ClienteAsync
+escribe las peticiones según llegan por una única conexión y una tarea
+lectora reparte las respuestas a medida que se reciben. Cada mensaje sale
+con un "id_peticion" que el servidor devuelve en su respuesta; las pocas
+respuestas que no lo llevan (una trama que el servidor no pudo decodificar)
+corresponden a la petición más antigua sin respuesta, porque el servidor
+responde en orden.
+
+Cada petición tiene su propio plazo; si vence, o si la tarea que espera se
+cancela, la respuesta se descarta cuando llegue sin afectar a las demás.
+
+Uso:
+    async with ClienteAsync("localhost", 5000) as cliente:
+        respuestas = await asyncio.gather(*(
+            cliente.peticion(mensajes.solicitar_mejores(juego))
+            for juego in ("nreinas", "caballo", "hanoi")
+        ))
+"""
+import asyncio
+import itertools
+import json
+from collections import OrderedDict
+
+from protocolo.framing import LectorTramas
+from protocolo import binario as codec_binario
+from client.common import communication
+from client.common.communication import BUFFER_SIZE, SEPARATOR, TIMEOUT_PETICION
+
+# Peticiones sin respuesta como mucho por conexión (el servidor las atiende
+# en orden; las que no ha leído aún esperan en el socket)
+MAX_EN_VUELO = 32
+
+
+class ClienteAsync:
+    def __init__(self, host="localhost", port=5000, binario: bool = None,
+                 timeout=TIMEOUT_PETICION, max_en_vuelo=MAX_EN_VUELO, al_actualizar=None):
+        """
+        'binario' elige el protocolo (None = el de communication). Los
+        mensajes que el servidor envía sin que se pidan (las
+        actualizacion_mejores de una suscripción) se pasan a 'al_actualizar'.
+        """
+        self.host = host
+        self.port = port
+        self.binario = communication._usar_binario if binario is None else binario
+        self.timeout = timeout
+        self.al_actualizar = al_actualizar
+        self._ids = itertools.count(1)
+        self._pendientes = OrderedDict()  # id_peticion -> Future, en orden de envío
+        self._plazas = asyncio.Semaphore(max_en_vuelo)
+        self._escritura = asyncio.Lock()
+        self._reader = None
+        self._writer = None
+        self._lectora = None
+        self._error = None
+
+    async def conectar(self):
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), self.timeout)
+        self._lectora = asyncio.create_task(self._leer())
+        return self
+
+    async def __aenter__(self):
+        return await self.conectar()
+
+    async def __aexit__(self, *exc):
+        await self.cerrar()
+
+    async def peticion(self, message: dict, timeout=None) -> dict:
+        """
+        Envía 'message' y espera su respuesta, como mucho 'timeout' segundos
+        (por defecto el del cliente). Lanza asyncio.TimeoutError si vence y
+        ConnectionError si la conexión se pierde antes de la respuesta.
+        """
+        if self._error is not None:
+            raise self._error
+        if self._writer is None:
+            raise ConnectionError("Cliente no conectado")
+        espera = self.timeout if timeout is None else timeout
+        async with self._plazas:
+            id_ = next(self._ids)
+            fut = asyncio.get_running_loop().create_future()
+            message = dict(message, id_peticion=id_)
+            if self.binario:
+                datos = codec_binario.codificar(message)
+            else:
+                datos = (json.dumps(message) + SEPARATOR).encode("utf-8")
+            async with self._escritura:
+                if self._error is not None:
+                    raise self._error
+                # Se apunta justo al escribir (sin await de por medio): una
+                # petición cancelada mientras esperaba turno no llega a
+                # enviarse ni deja una entrada que desalinee las respuestas
+                self._writer.write(datos)
+                self._pendientes[id_] = fut
+                await self._writer.drain()
+            # Si vence el plazo o se cancela la espera, wait_for cancela el
+            # Future; su entrada sigue en _pendientes hasta que llegue la
+            # respuesta, para no desalinear las que vienen sin id
+            return await asyncio.wait_for(fut, espera)
+
+    async def peticiones(self, mensajes: list, timeout=None) -> list:
+        """Envía todos los 'mensajes' encadenados y devuelve sus respuestas en orden."""
+        return await asyncio.gather(*(self.peticion(m, timeout) for m in mensajes))
+
+    async def cerrar(self):
+        if self._writer is None:
+            return
+        self._writer.close()
+        try:
+            await self._writer.wait_closed()
+        except OSError:
+            pass
+        if self._lectora is not None:
+            self._lectora.cancel()
+            try:
+                await self._lectora
+            except asyncio.CancelledError:
+                pass
+        self._writer = None
+        self._fallar(ConnectionError("Cliente cerrado"))
+
+    # — Lectura —
+
+    async def _leer(self):
+        clase = codec_binario.LectorBinario if self.binario else LectorTramas
+        lector = clase(buffer_size=BUFFER_SIZE)
+        try:
+            while True:
+                datos = await self._reader.read(BUFFER_SIZE)
+                if not datos:
+                    raise ConnectionError("Conexión cerrada por el servidor")
+                for trama in lector.alimentar(datos):
+                    if self.binario:
+                        self._entregar(codec_binario.decodificar(trama))
+                    else:
+                        self._entregar(json.loads(trama))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._fallar(e if isinstance(e, ConnectionError) else ConnectionError(str(e)))
+
+    def _entregar(self, resp: dict):
+        id_ = resp.get("id_peticion")
+        if id_ is None and resp.get("acción") == "actualizacion_mejores":
+            if self.al_actualizar is not None:
+                self.al_actualizar(resp)
+            return
+        if id_ is not None:
+            fut = self._pendientes.pop(id_, None)
+        elif self._pendientes:
+            _, fut = self._pendientes.popitem(last=False)
+        else:
+            fut = None
+        # None: respuesta a una petición que nadie espera ya
+        if fut is not None and not fut.done():
+            fut.set_result(resp)
+
+    def _fallar(self, error: Exception):
+        """Termina con 'error' todas las peticiones sin respuesta."""
+        self._error = error
+        pendientes, self._pendientes = self._pendientes, OrderedDict()
+        for fut in pendientes.values():
+            if not fut.done():
+                fut.set_exception(error)
+
+
+async def conectar(host="localhost", port=5000, **opciones) -> ClienteAsync:
+    """Abre un ClienteAsync ya conectado (ver ClienteAsync para las opciones)."""
+    return await ClienteAsync(host, port, **opciones).conectar()
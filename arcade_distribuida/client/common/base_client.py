@@ -3,15 +3,22 @@
 import pygame
 import sys
 import time
-from datetime import datetime
-from client.nreinas.nreinas import main as nreinas_main
-from client.caballo.caballo import main as caballo_main
-from client.hanoi.hanoi import main as hanoi_main
 from client.common.communication import send_and_receive
+from client.common import ia_client
+from client.common.threading_utils import delayed_call, start_thread
+from client.common.mensajes import solicitar_mejores, solicitar_ranking, ORDEN, TAMAÑOS
+from protocolo import TOP_MEJORES
+
+# Los juegos (y con ellos la IA: transformers y torch) se importan al
+# elegirlos en el menú, no al arrancar; `python -m benchmarks.importtime`
+# comprueba que siga siendo así.
 
 # Configuración de ventana
 WINDOW_WIDTH, WINDOW_HEIGHT = 600, 400
 FPS = 60
+# Segundos tras arrancar en que empieza la precarga de la IA, para que
+# importar torch no compita con el primer fotograma del menú
+ESPERA_PRECARGA = 1.0
 
 MAIN_OPTIONS = [
     "NReinas",
@@ -27,12 +34,18 @@ GAMES = {
     "Torres de Hanói": "hanoi"
 }
 
-def show_menu(options, title="Menú", prompt=None):
+def show_menu(options, title="Menú", prompt=None, estado=None):
+    """
+    Menú de opciones con las flechas. 'estado' (opcional) es una función que
+    devuelve una línea que se pinta al pie en cada fotograma (p. ej. la carga
+    de la IA).
+    """
     pygame.init()
     screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
     pygame.display.set_caption(title)
     clock = pygame.time.Clock()
     font = pygame.font.SysFont(None, 36)
+    small_font = pygame.font.SysFont(None, 24)
     selected = 0
     message = prompt or ""
 
@@ -59,47 +72,125 @@ def show_menu(options, title="Menú", prompt=None):
             color = (255,255,0) if i==selected else (255,255,255)
             txt = font.render(opt, True, color)
             screen.blit(txt, txt.get_rect(center=(WINDOW_WIDTH//2, WINDOW_HEIGHT//2 + i*50 - 50)))
+        pie = estado() if estado else ""
+        if pie:
+            pie_surf = small_font.render(pie, True, (150,150,150))
+            screen.blit(pie_surf, pie_surf.get_rect(center=(WINDOW_WIDTH//2, WINDOW_HEIGHT - 20)))
         pygame.display.flip()
         clock.tick(FPS)
 
-def display_top_times(game_key):
-    msg = {
-        "juego": GAMES[game_key],
-        "acción": "solicitar_mejores",
-        "timestamp": datetime.utcnow().isoformat()+"Z"
-    }
+# Entradas por página en "Ver mejores tiempos": las del top que guarda la
+# caché del servidor, que así sirve la primera página
+POR_PAGINA = TOP_MEJORES
+# Segundos sin pulsar ↑ ↓ antes de pedir el ranking filtrado por tamaño
+ESPERA_FILTRO = 0.3
+
+def cargar_pagina(juego, tamaño, despues):
+    """
+    Pide una página del ranking. Devuelve (entradas, cursor siguiente, error).
+    La primera página sin filtro es el top, que el servidor responde desde
+    su caché (si cabe en él una página entera); las siguientes y las
+    filtradas se piden por cursor. Bloquea: se llama desde el pool.
+    """
+    primera = tamaño is None and despues is None and POR_PAGINA <= TOP_MEJORES
+    if primera:
+        msg = solicitar_mejores(juego)
+    else:
+        msg = solicitar_ranking(juego, POR_PAGINA, tamaño, despues)
     try:
         resp = send_and_receive(msg)
-        mejores = resp.get("mejores", [])
     except Exception as e:
-        mejores = []
-        error_text = f"Error de red: {e}"
-
-    header, rows = [], []
-    if mejores:
-        if game_key=="NReinas":
-            header = ["#"," N ","Intentos"," Fecha"]
-            for i,ent in enumerate(mejores,1):
-                rows.append(f"{i:>2}   {ent['N']:<3}     {ent['intentos']:<8} {ent['timestamp']}")
-        else:
-            header = ["#","Movs"," Fecha"]
-            for i,ent in enumerate(mejores,1):
-                movs = ent.get("movimientos", ent.get("intentos","?"))
-                rows.append(f"{i:>2}   {movs:<5}  {ent['timestamp']}")
-    else:
-        header = ["No hay datos de mejores tiempos."]
-        if 'error_text' in locals():
-            rows = [error_text]
+        return [], None, f"Error de red: {e}"
+    if resp.get("acción") == "error":
+        return [], None, resp["error"]["mensaje"]
+    if not primera:
+        return resp.get("ranking", []), resp.get("siguiente"), None
+    mejores = resp.get("mejores", [])[:POR_PAGINA]
+    # Mismo cursor que daría solicitar_ranking: página llena -> puede haber más
+    siguiente = [mejores[-1][ORDEN[juego]], mejores[-1]["id"]] if len(mejores) == POR_PAGINA else None
+    return mejores, siguiente, None
+
+def display_top_times(game_key):
+    """
+    Ranking paginado del juego: ← → cambian de página y, en N-Reinas y
+    Hanói, ↑ ↓ filtran por tamaño (N o discos). Cada página se pide con el
+    cursor de la anterior, así que avanzar no cuesta más en páginas profundas.
+    El filtro se pide cuando se deja de pulsar ↑ ↓ durante ESPERA_FILTRO, no
+    con cada pulsación. Las páginas se piden en el pool de hilos del
+    cliente para no detener el bucle de eventos mientras llega la respuesta.
+    """
+    juego = GAMES[game_key]
+    filtrable = juego in TAMAÑOS
+    tamaño = None
+    cursores = [None]   # cursor 'despues' con el que se pidió cada página
+    pagina = 0
+    recargar = True
+    filtrar_en = None   # instante en que se pide el tamaño elegido con ↑ ↓
+    peticion = None     # Future de la página pedida; las anteriores se ignoran
+    siguiente = None
 
     pygame.init()
     screen = pygame.display.set_mode((WINDOW_WIDTH,WINDOW_HEIGHT))
-    pygame.display.set_caption(f"Top 5 – {game_key}")
     clock = pygame.time.Clock()
     font = pygame.font.SysFont("Courier",24)
 
+    def titulo():
+        filtro = f" ({TAMAÑOS[juego]}={tamaño})" if tamaño is not None else ""
+        pygame.display.set_caption(f"Ranking – {game_key}{filtro} – pág. {pagina + 1}")
+
     while True:
+        if filtrar_en is not None and time.monotonic() >= filtrar_en:
+            recargar, filtrar_en = True, None
+        if recargar:
+            peticion = start_thread(cargar_pagina, (juego, tamaño, cursores[pagina]))
+            recargar, siguiente = False, None
+            titulo()
+            header, rows = [], ["Cargando…"]
+        if peticion is not None and peticion.done():
+            try:
+                mejores, siguiente, error_text = peticion.result()
+            except Exception as e:
+                mejores, siguiente, error_text = [], None, f"Error: {e}"
+            peticion = None
+
+            header, rows = [], []
+            primero = pagina * POR_PAGINA + 1
+            if mejores:
+                if game_key=="NReinas":
+                    header = ["#"," N ","Intentos"," Fecha"]
+                    for i,ent in enumerate(mejores,primero):
+                        rows.append(f"{i:>2}   {ent['N']:<3}     {ent['intentos']:<8} {ent['timestamp']}")
+                else:
+                    header = ["#","Movs"," Fecha"]
+                    for i,ent in enumerate(mejores,primero):
+                        movs = ent.get("movimientos", ent.get("intentos","?"))
+                        rows.append(f"{i:>2}   {movs:<5}  {ent['timestamp']}")
+            else:
+                header = ["No hay datos de mejores tiempos."]
+                if error_text:
+                    rows = [error_text]
+
         for evt in pygame.event.get():
-            if evt.type in (pygame.QUIT, pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN):
+            if evt.type == pygame.KEYDOWN and evt.key == pygame.K_RIGHT:
+                # Con un filtro pendiente, 'siguiente' es del tamaño anterior
+                if siguiente is not None and filtrar_en is None:
+                    del cursores[pagina + 1:]
+                    cursores.append(siguiente)
+                    pagina += 1
+                    recargar = True
+            elif evt.type == pygame.KEYDOWN and evt.key == pygame.K_LEFT:
+                if pagina > 0:
+                    pagina -= 1
+                    recargar = True
+            elif evt.type == pygame.KEYDOWN and evt.key in (pygame.K_UP, pygame.K_DOWN) and filtrable:
+                if evt.key == pygame.K_UP:
+                    tamaño = 1 if tamaño is None else tamaño + 1
+                else:
+                    tamaño = None if tamaño in (None, 1) else tamaño - 1
+                cursores, pagina = [None], 0
+                filtrar_en = time.monotonic() + ESPERA_FILTRO
+                titulo()
+            elif evt.type in (pygame.QUIT, pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN):
                 pygame.quit()
                 return
         screen.fill((30,30,30))
@@ -111,28 +202,36 @@ def display_top_times(game_key):
         for line in rows:
             screen.blit(font.render(line,True,(255,255,255)), (20,y))
             y+=30
-        tip = "Pulsa cualquier tecla para volver"
+        tip = "<- -> pág." + ("  ^ v tamaño" if filtrable else "") + "  otra tecla: salir"
         screen.blit(font.render(tip,True,(200,200,200)), (20,WINDOW_HEIGHT-40))
         pygame.display.flip()
         clock.tick(FPS)
 
 def run_menu():
+    # El modelo de la IA se carga mientras el jugador elige juego, en lugar
+    # de con la primera pregunta del chat (salvo ARCADE_IA_PRECARGA=0)
+    if ia_client.PRECARGA:
+        delayed_call(ESPERA_PRECARGA, ia_client.precargar)
     while True:
-        choice = show_menu(MAIN_OPTIONS, title="Máquina Arcade Distribuida")
+        choice = show_menu(MAIN_OPTIONS, title="Máquina Arcade Distribuida",
+                           estado=ia_client.texto_estado)
         if choice=="NReinas":
             try:
+                from client.nreinas.nreinas import main as nreinas_main
                 nreinas_main()
             except Exception as e:
                 print("Error en N-Reinas:", e, file=sys.stderr)
                 time.sleep(2)
         elif choice=="Knight’s Tour":
             try:
+                from client.caballo.caballo import main as caballo_main
                 caballo_main()
             except Exception as e:
                 print("Error en Knight’s Tour:", e, file=sys.stderr)
                 time.sleep(2)
         elif choice=="Torres de Hanói":
             try:
+                from client.hanoi.hanoi import main as hanoi_main
                 hanoi_main()
             except Exception as e:
                 print("Error en Torres de Hanói:", e, file=sys.stderr)
@@ -140,7 +239,7 @@ def run_menu():
         elif choice=="Ver mejores tiempos":
             sel = show_menu(
                 ["NReinas","Knight’s Tour","Torres de Hanói","Volver"],
-                title="Selecciona juego", prompt="Consultar top 5"
+                title="Selecciona juego", prompt="Consultar ranking"
             )
             if sel in GAMES:
                 display_top_times(sel)
@@ -1,54 +1,328 @@
+import os
+import random
 import socket
 import json
 import threading
 import time
+import weakref
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from protocolo.framing import LectorTramas
+from protocolo import binario as codec_binario
+from client.common.mensajes import suscribir_mejores as mensaje_suscribir
 
 BUFFER_SIZE = 4096
 SEPARATOR = "\n"
 
-def connect(host="localhost", port=5000, retries=3, delay=2):
+# Lector de tramas de cada socket: conserva los bytes recibidos de más
+# (p. ej. una segunda respuesta llegada en el mismo recv) entre llamadas
+_lectores = weakref.WeakKeyDictionary()
+_tramas_pendientes = weakref.WeakKeyDictionary()
+
+# Protocolo por defecto: JSON delimitado por '\n'. Con el binario compacto
+# (protocolo/binario.py) los mensajes ocupan bastante menos; el servidor lo
+# detecta solo. Se activa con ARCADE_BINARIO=1 o usar_protocolo_binario().
+_usar_binario = os.environ.get("ARCADE_BINARIO", "").lower() in ("1", "true", "si", "sí")
+
+# Segundos máximos de espera de cada conexión, envío o respuesta
+TIMEOUT_PETICION = float(os.environ.get("ARCADE_TIMEOUT_PETICION", "5"))
+# Tope de la espera entre reintentos de conexión (backoff exponencial)
+ESPERA_MAX = 2.0
+# Conexiones abiertas que cada pool guarda para reutilizar
+MAX_LIBRES = 4
+# Una conexión libre más antigua que esto se cierra en lugar de reutilizarse
+# (el servidor cierra las inactivas tras ARCADE_TIMEOUT_INACTIVIDAD, 300 s)
+MAX_INACTIVIDAD = 240.0
+
+def usar_protocolo_binario(activo: bool = True):
+    """Elige el protocolo por defecto de send_message/receive_message."""
+    global _usar_binario
+    _usar_binario = activo
+
+def connect(host="localhost", port=5000, retries=3, delay=0.1, timeout=TIMEOUT_PETICION):
     """
-    Intenta conectar al servidor con reintentos.
-    Devuelve el socket conectado o lanza excepción si falla.
+    Intenta conectar al servidor con reintentos. Entre intentos espera un
+    tiempo al azar entre 0 y delay·2^intento (como mucho ESPERA_MAX), para
+    que muchos clientes no reintenten a la vez. Devuelve el socket
+    conectado (con 'timeout' para cada operación) o lanza excepción si falla.
     """
     for attempt in range(retries):
         try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.connect((host, port))
+            sock = socket.create_connection((host, port), timeout=timeout)
+            # Mensajes pequeños de petición/respuesta: sin esperar a Nagle
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
             return sock
-        except socket.error as e:
-            if attempt < retries - 1:
-                time.sleep(delay)
-            else:
-                raise e
+        except OSError:
+            if attempt == retries - 1:
+                raise
+            time.sleep(random.uniform(0, min(ESPERA_MAX, delay * 2 ** attempt)))
 
-def send_message(message: dict, sock: socket.socket):
+def send_message(message: dict, sock: socket.socket, binario: bool = None):
     """
-    Serializa y envía un mensaje JSON terminado en '\n'.
+    Serializa y envía un mensaje JSON terminado en '\n' (o una trama
+    binaria si binario=True; None usa el protocolo por defecto).
     """
+    if _usar_binario if binario is None else binario:
+        sock.sendall(codec_binario.codificar(message))
+        return
     payload = json.dumps(message) + SEPARATOR
     sock.sendall(payload.encode("utf-8"))
 
-def receive_message(sock: socket.socket) -> dict:
+def receive_message(sock: socket.socket, binario: bool = None) -> dict:
+    """
+    Lee del socket hasta completar una trama terminada en '\n' (o una
+    trama binaria), luego la decodifica y devuelve el mensaje. Las tramas
+    completas que lleguen de más se guardan para la siguiente llamada
+    sobre el mismo socket.
+    """
+    binario = _usar_binario if binario is None else binario
+    pendientes = _tramas_pendientes.setdefault(sock, [])
+    if not pendientes:
+        lector = _lectores.get(sock)
+        if lector is None:
+            clase = codec_binario.LectorBinario if binario else LectorTramas
+            lector = _lectores[sock] = clase(buffer_size=BUFFER_SIZE)
+        while not pendientes:
+            tramas = lector.leer_de(sock)
+            if tramas is None:
+                raise ConnectionError("Conexión cerrada por el servidor")
+            pendientes.extend(tramas)
+    trama = pendientes.pop(0)
+    return codec_binario.decodificar(trama) if binario else json.loads(trama)
+
+def es_idempotente(message: dict) -> bool:
+    """
+    True si enviar 'message' dos veces no guarda nada dos veces: las
+    consultas y los guardados con clave de idempotencia (todos los del lote
+    en guardar_resultados).
+    """
+    acción = message.get("acción")
+    if acción == "guardar_resultado":
+        return bool(message.get("clave"))
+    if acción == "guardar_resultados":
+        return all(r.get("clave") for r in message.get("resultados", []))
+    return True
+
+class PoolConexiones:
     """
-    Lee del socket hasta encontrar '\n', luego parsea el JSON y lo devuelve.
+    Conexiones persistentes a un servidor, reutilizadas entre peticiones.
+    El servidor atiende varios mensajes por conexión, así que cada petición
+    se ahorra el establecimiento y cierre de TCP. Es seguro entre hilos:
+    cada petición usa una conexión en exclusiva.
     """
-    buffer = ""
-    while SEPARATOR not in buffer:
-        data = sock.recv(BUFFER_SIZE).decode("utf-8")
-        if not data:
-            raise ConnectionError("Conexión cerrada por el servidor")
-        buffer += data
-    line, _ = buffer.split(SEPARATOR, 1)
-    return json.loads(line)
+
+    def __init__(self, host="localhost", port=5000, binario=False,
+                 max_libres=MAX_LIBRES, timeout=TIMEOUT_PETICION):
+        self.host = host
+        self.port = port
+        # El servidor fija el protocolo de la conexión con el primer byte
+        self.binario = binario
+        self.max_libres = max_libres
+        self.timeout = timeout
+        self._libres = deque()  # (socket, instante en que quedó libre)
+        self._lock = threading.Lock()
+
+    def _sana(self, sock, libre_desde) -> bool:
+        """Comprueba sin bloquear que una conexión libre sigue utilizable."""
+        if time.monotonic() - libre_desde > MAX_INACTIVIDAD:
+            return False
+        lector = _lectores.get(sock)
+        if _tramas_pendientes.get(sock) or (lector is not None and lector.pendiente()):
+            return False
+        try:
+            sock.setblocking(False)
+            try:
+                # b"" = el servidor cerró; datos = respuesta que nadie esperaba
+                sock.recv(1, socket.MSG_PEEK)
+                return False
+            except BlockingIOError:
+                return True
+            finally:
+                sock.settimeout(self.timeout)
+        except OSError:
+            return False
+
+    def obtener(self) -> tuple:
+        """(socket, reutilizada): una conexión libre y sana o una nueva."""
+        while True:
+            with self._lock:
+                if not self._libres:
+                    break
+                sock, libre_desde = self._libres.pop()
+            if self._sana(sock, libre_desde):
+                return sock, True
+            sock.close()
+        return connect(self.host, self.port, timeout=self.timeout), False
+
+    def devolver(self, sock):
+        with self._lock:
+            if len(self._libres) < self.max_libres:
+                self._libres.append((sock, time.monotonic()))
+                return
+        sock.close()
+
+    @contextmanager
+    def conexion(self):
+        """
+        Presta una conexión; si algo falla dentro se cierra en lugar de
+        devolverse (podría quedar una respuesta a medias en el socket).
+        """
+        sock, _ = self.obtener()
+        try:
+            yield sock
+        except BaseException:
+            sock.close()
+            raise
+        self.devolver(sock)
+
+    def peticion(self, message: dict) -> dict:
+        """
+        Envía 'message' y devuelve la respuesta. Si una conexión reutilizada
+        resulta estar cerrada se repite una vez con otra nueva, pero sólo si
+        repetirla no puede guardar nada dos veces (ver es_idempotente); si
+        no, el ConnectionError llega a quien llama.
+        """
+        sock, reutilizada = self.obtener()
+        try:
+            send_message(message, sock, self.binario)
+            resp = receive_message(sock, self.binario)
+        except ConnectionError:
+            sock.close()
+            # El servidor pudo guardar el resultado y cerrar sin responder
+            if not reutilizada or not es_idempotente(message):
+                raise
+            # Conexión libre que el servidor cerró justo después de la
+            # comprobación: se repite una vez con una conexión nueva
+            sock = connect(self.host, self.port, timeout=self.timeout)
+            try:
+                send_message(message, sock, self.binario)
+                resp = receive_message(sock, self.binario)
+            except BaseException:
+                sock.close()
+                raise
+        except BaseException:
+            # Timeout incluido: la respuesta podría llegar más tarde
+            sock.close()
+            raise
+        self.devolver(sock)
+        return resp
+
+    def cerrar(self):
+        with self._lock:
+            libres, self._libres = self._libres, deque()
+        for sock, _ in libres:
+            sock.close()
+
+
+# Pools del proceso, uno por (host, port, protocolo)
+_pools = {}
+_pools_lock = threading.Lock()
+
+def obtener_pool(host="localhost", port=5000, binario: bool = None) -> PoolConexiones:
+    binario = _usar_binario if binario is None else binario
+    clave = (host, port, binario)
+    with _pools_lock:
+        pool = _pools.get(clave)
+        if pool is None:
+            pool = _pools[clave] = PoolConexiones(host, port, binario)
+        return pool
+
+def cerrar_conexiones():
+    """Cierra las conexiones libres de todos los pools."""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.cerrar()
+
+def _tras_fork():
+    # Un proceso hijo no debe compartir sockets con el padre
+    global _pools
+    _pools = {}
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_tras_fork)
 
 def send_and_receive(message: dict, host="localhost", port=5000) -> dict:
     """
-    Función de conveniencia: conecta, envía y recibe respuesta.
+    Función de conveniencia: envía y recibe la respuesta reutilizando una
+    conexión del pool del proceso (o abriendo una si no hay libres).
+    """
+    return obtener_pool(host, port).peticion(message)
+
+def construir_lote(resultados: list) -> dict:
+    """
+    Construye un mensaje 'guardar_resultados' a partir de una lista de
+    resultados. Cada elemento puede ser un mensaje 'guardar_resultado'
+    completo (como los de enviar_resultado) o un dict con 'juego',
+    'datosPartida' y 'timestamp' (y opcionalmente 'clave', la clave de
+    idempotencia); se admiten juegos distintos en un lote.
+    """
+    items = []
+    for r in resultados:
+        item = {
+            "juego": r["juego"],
+            "datosPartida": r["datosPartida"],
+            "timestamp": r.get("timestamp") or datetime.utcnow().isoformat() + "Z"
+        }
+        if r.get("clave"):
+            item["clave"] = r["clave"]
+        items.append(item)
+    return {
+        "acción": "guardar_resultados",
+        "resultados": items,
+        "timestamp": datetime.utcnow().isoformat() + "Z"
+    }
+
+def enviar_lote(resultados: list, host="localhost", port=5000, tam_max=500) -> list:
+    """
+    Envía 'resultados' en mensajes guardar_resultados de como mucho
+    'tam_max' elementos (todos por la misma conexión) y devuelve el estado
+    de cada resultado, en el mismo orden: {"status": "ok", "id": ...} o
+    {"status": "error", "mensaje": ...}.
+    """
+    estados = []
+    pool = obtener_pool(host, port)
+    with pool.conexion() as sock:
+        for inicio in range(0, len(resultados), tam_max):
+            parte = resultados[inicio:inicio + tam_max]
+            send_message(construir_lote(parte), sock, pool.binario)
+            resp = receive_message(sock, pool.binario)
+            if resp.get("acción") == "error":
+                raise RuntimeError(resp["error"]["mensaje"])
+            for estado in resp["resultados"]:
+                estado["indice"] += inicio
+                estados.append(estado)
+    return estados
+
+def escuchar_mejores(juego: str, host="localhost", port=5000, timeout=TIMEOUT_PETICION):
+    """
+    Generador para pantallas que muestran el top sin parar: se suscribe a
+    los cambios del top de 'juego' y produce la lista completa de mejores
+    al empezar y cada vez que cambia, sin volver a preguntar al servidor.
+    'timeout' sólo limita la conexión y la instantánea: después se espera
+    sin plazo, porque el top puede pasar mucho tiempo sin cambiar.
+    Termina (ConnectionError) si el servidor cierra la conexión.
     """
-    sock = connect(host, port)
+    sock = connect(host, port, timeout=timeout)
     try:
-        send_message(message, sock)
-        return receive_message(sock)
+        send_message(mensaje_suscribir(juego), sock)
+        resp = receive_message(sock)
+        if resp.get("acción") == "error":
+            raise RuntimeError(resp["error"]["mensaje"])
+        version, mejores = resp["version"], resp["mejores"]
+        # El servidor tampoco cierra una suscripción por inactividad
+        sock.settimeout(None)
+        yield list(mejores)
+        while True:
+            cambio = receive_message(sock)
+            # Las actualizaciones anteriores a la instantánea ya están en ella
+            if cambio.get("acción") != "actualizacion_mejores" or cambio["version"] <= version:
+                continue
+            version = cambio["version"]
+            # "sale" es el resultado que el nuevo deja fuera del top (si lo hay)
+            mejores = [e for e in mejores if e["id"] != cambio["sale"]]
+            mejores.insert(cambio["posicion"], cambio["entra"])
+            yield list(mejores)
     finally:
         sock.close()
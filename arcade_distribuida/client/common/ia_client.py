@@ -1,10 +1,36 @@
 # client/common/ia_client.py
 
 import json
+import os
 import threading
-from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline
+import time
+from concurrent.futures import Future
+from client.common.threading_utils import ejecutor
+
+# transformers (y torch) se importan en _get_pipe, al cargar el modelo:
+# importar este módulo no cuesta nada y el menú arranca sin esperarlos
+
+MODELO = "microsoft/DialoGPT-medium"
+
+# Directorio local con el modelo ya descargado (ARCADE_IA_CACHE). Con él se
+# carga sin red y sólo desde safetensors, que transformers lee mapeados en
+# memoria (mmap) en lugar de deserializar un pickle: arranca antes y las
+# páginas se comparten con la caché del sistema operativo.
+CACHE_DIR = os.environ.get("ARCADE_IA_CACHE") or None
+# Precarga del modelo al abrir el menú (ARCADE_IA_PRECARGA=0 la desactiva:
+# el modelo se carga entonces con la primera pregunta del chat)
+PRECARGA = os.environ.get("ARCADE_IA_PRECARGA", "1").lower() not in ("0", "false", "no")
 
 _local_pipe = None
+# Una sola carga aunque varias sugerencias lleguen a la vez que la precarga
+_carga_lock = threading.Lock()
+_precarga = None
+_precarga_lock = threading.Lock()
+
+# Estado de la carga, para mostrarlo en el menú
+SIN_CARGAR, CARGANDO, CALENTANDO, LISTA, ERROR = (
+    "sin_cargar", "cargando", "calentando", "lista", "error")
+_estado = {"estado": SIN_CARGAR, "progreso": 0.0, "paso": "", "error": None, "segundos": None}
 
 # Mensaje guía más directo
 INITIAL_INSTRUCTION = (
@@ -24,25 +50,98 @@ CALL_CONFIG = {
     "truncation": True,
 }
 
+def _avanzar(estado, progreso, paso):
+    _estado.update(estado=estado, progreso=progreso, paso=paso)
+
+def _opciones_carga() -> dict:
+    if CACHE_DIR is None:
+        return {}
+    return {"cache_dir": CACHE_DIR, "local_files_only": True}
+
 def _get_pipe():
     global _local_pipe
-    if _local_pipe is None:
-        tokenizer = AutoTokenizer.from_pretrained("microsoft/DialoGPT-medium")
-        model     = AutoModelForCausalLM.from_pretrained("microsoft/DialoGPT-medium")
-        _local_pipe = pipeline(
-            "text-generation",
-            model=model,
-            tokenizer=tokenizer,
-            **PIPELINE_CONFIG
-        )
+    if _local_pipe is not None:
+        return _local_pipe
+    with _carga_lock:
+        if _local_pipe is None:
+            inicio = time.perf_counter()
+            try:
+                _avanzar(CARGANDO, 0.0, "importando")
+                from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline
+                _avanzar(CARGANDO, 0.1, "tokenizer")
+                tokenizer = AutoTokenizer.from_pretrained(MODELO, **_opciones_carga())
+                _avanzar(CARGANDO, 0.2, "modelo")
+                opciones = _opciones_carga()
+                if CACHE_DIR is not None:
+                    opciones["use_safetensors"] = True
+                model = AutoModelForCausalLM.from_pretrained(MODELO, **opciones)
+                _avanzar(CARGANDO, 0.8, "pipeline")
+                pipe = pipeline(
+                    "text-generation",
+                    model=model,
+                    tokenizer=tokenizer,
+                    **PIPELINE_CONFIG
+                )
+                # Primera generación de prueba: inicializa kernels y cachés
+                # para que la primera pregunta real no pague ese coste
+                _avanzar(CALENTANDO, 0.9, "calentamiento")
+                pipe(INITIAL_INSTRUCTION, max_new_tokens=1)
+            except Exception as e:
+                _estado.update(estado=ERROR, error=str(e))
+                raise
+            _local_pipe = pipe
+            _estado.update(estado=LISTA, progreso=1.0, paso="", segundos=time.perf_counter() - inicio)
     return _local_pipe
 
+def precargar():
+    """
+    Carga y calienta el modelo en segundo plano y devuelve el Future de la
+    carga. La carga tiene su propio hilo: tarda decenas de segundos y no
+    debe ocupar uno del pool compartido. Llamarla más veces devuelve el
+    mismo Future; tras un error se puede volver a intentar.
+    """
+    global _precarga
+    with _precarga_lock:
+        if _precarga is None or (_precarga.done() and _precarga.exception() is not None):
+            _precarga = Future()
+            threading.Thread(target=_cargar, args=(_precarga,), name="ia-carga",
+                             daemon=True).start()
+        return _precarga
+
+def _cargar(fut):
+    fut.set_running_or_notify_cancel()
+    try:
+        fut.set_result(_get_pipe())
+    except BaseException as e:
+        fut.set_exception(e)
+
+def estado() -> dict:
+    """
+    Estado de la carga del modelo: {"estado", "progreso" (0..1), "paso",
+    "error", "segundos" (lo que tardó la carga)}.
+    """
+    return dict(_estado)
+
+def texto_estado() -> str:
+    """Línea corta con el estado de la IA para la interfaz."""
+    e = _estado
+    if e["estado"] == LISTA:
+        return "IA lista"
+    if e["estado"] == ERROR:
+        return "IA no disponible"
+    if e["estado"] == SIN_CARGAR:
+        return ""
+    return f"Cargando IA… {int(e['progreso'] * 100)}% ({e['paso']})"
+
 def solicitar_sugerencia_async(input_prompt, callback):
     """
     input_prompt: str o dict.
       - str: prompt humano
       - dict: se serializa a JSON
     callback(text): se llama con la respuesta generada
+    Devuelve el Future de la sugerencia. Mientras el modelo se carga la
+    petición sólo espera a la carga (precargar()), sin ocupar un hilo del
+    pool compartido; la generación pasa al pool cuando el modelo está listo.
     """
     # Construir prompt completo
     if isinstance(input_prompt, str):
@@ -50,8 +149,7 @@ def solicitar_sugerencia_async(input_prompt, callback):
     else:
         full_prompt = INITIAL_INSTRUCTION + "\n" + json.dumps(input_prompt)
 
-    def job():
-        pipe = _get_pipe()
+    def job(pipe):
         out = pipe(full_prompt, **CALL_CONFIG)
         raw = out[0]["generated_text"].strip()
 
@@ -66,6 +164,26 @@ def solicitar_sugerencia_async(input_prompt, callback):
 
         callback(result)
 
-    t = threading.Thread(target=job, daemon=True)
-    t.start()
-    return t
+    if _local_pipe is not None:
+        return ejecutor().enviar(job, _local_pipe)
+
+    sugerencia = Future()
+
+    def al_cargar(carga):
+        # Cancelada mientras esperaba al modelo: no se genera nada
+        if not sugerencia.set_running_or_notify_cancel():
+            return
+        if carga.exception() is not None:
+            sugerencia.set_exception(carga.exception())
+            return
+        ejecutor().enviar(job, carga.result()).add_done_callback(
+            lambda generacion: _copiar_resultado(generacion, sugerencia))
+
+    precargar().add_done_callback(al_cargar)
+    return sugerencia
+
+def _copiar_resultado(origen, destino):
+    if origen.exception() is not None:
+        destino.set_exception(origen.exception())
+    else:
+        destino.set_result(origen.result())
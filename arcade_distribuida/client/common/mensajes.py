@@ -0,0 +1,92 @@
+"""
+Constructores de los mensajes que los clientes envían al servidor.
+
+Los usan los juegos (enviar_resultado) y el menú (solicitar_mejores), y
+también el generador de carga de benchmarks/, para que las pruebas de
+rendimiento manden exactamente lo mismo que los clientes reales.
+No dependen de pygame.
+"""
+from datetime import datetime
+
+
+def _ahora() -> str:
+    return datetime.utcnow().isoformat() + "Z"
+
+
+def resultado_nreinas(N, intentos, resuelto) -> dict:
+    return {
+        "juego": "nreinas",
+        "acción": "guardar_resultado",
+        "datosPartida": {"N": N, "resuelto": resuelto, "intentos": intentos},
+        "timestamp": _ahora()
+    }
+
+
+def resultado_caballo(initial_pos, movimientos, completado) -> dict:
+    return {
+        "juego": "caballo",
+        "acción": "guardar_resultado",
+        "datosPartida": {
+            "posicion_inicial": str(initial_pos),
+            "movimientos": movimientos,
+            "completado": completado
+        },
+        "timestamp": _ahora()
+    }
+
+
+def resultado_hanoi(discos, movimientos, completado) -> dict:
+    return {
+        "juego": "hanoi",
+        "acción": "guardar_resultado",
+        "datosPartida": {
+            "discos": discos,
+            "movimientos": movimientos,
+            "completado": completado
+        },
+        "timestamp": _ahora()
+    }
+
+
+def solicitar_mejores(juego) -> dict:
+    return {
+        "juego": juego,
+        "acción": "solicitar_mejores",
+        "timestamp": _ahora()
+    }
+
+
+def suscribir_mejores(juego) -> dict:
+    """Mantiene la conexión abierta y recibe los cambios del top de 'juego'."""
+    return {
+        "juego": juego,
+        "acción": "suscribir_mejores",
+        "timestamp": _ahora()
+    }
+
+
+# Campo con el que se filtra el ranking por tamaño en cada juego
+TAMAÑOS = {"nreinas": "N", "hanoi": "discos"}
+# Campo por el que se ordena el ranking (el cursor "despues" es [valor, id])
+ORDEN = {"nreinas": "intentos", "caballo": "movimientos", "hanoi": "movimientos"}
+
+
+def solicitar_ranking(juego, limite=10, tamaño=None, despues=None, id_resultado=None) -> dict:
+    """
+    Página del ranking de 'juego'. 'despues' es el cursor "siguiente" de la
+    respuesta anterior; con 'id_resultado' se pide la posición de ese
+    resultado en lugar de una página.
+    """
+    msg = {
+        "juego": juego,
+        "acción": "solicitar_ranking",
+        "limite": limite,
+        "timestamp": _ahora()
+    }
+    if tamaño is not None and juego in TAMAÑOS:
+        msg[TAMAÑOS[juego]] = tamaño
+    if despues is not None:
+        msg["despues"] = despues
+    if id_resultado is not None:
+        msg["id"] = id_resultado
+    return msg
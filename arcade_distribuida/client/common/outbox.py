@@ -0,0 +1,302 @@
+"""
+Buzón de salida local de los resultados de las partidas.
+
+enviar_resultado() de cada juego no habla con el servidor ni toca el
+disco: encolar() deja el resultado a un hilo de fondo y vuelve al momento.
+Ese hilo lo apunta en un fichero sólo-append (ARCADE_OUTBOX_RUTA), con un
+único fsync para todos los que hayan llegado a la vez, y otro hilo lo va
+enviando en lotes guardar_resultados cuando el servidor responde; si no hay
+servidor, o contesta 503, reintenta con una espera exponencial con jitter.
+Así una partida no se pierde por una caída de red o del servidor, ni aunque
+se cierre la máquina antes de poder enviarla. Si el fichero no se puede
+usar (disco lleno, directorio sin permisos...) el resultado se envía una
+sola vez sin buzón, como antes de que existiera.
+
+Cada resultado lleva una "clave" de idempotencia (uuid4): si un lote llegó
+al servidor pero la respuesta no, al reenviarlo el servidor devuelve las
+filas ya guardadas en lugar de duplicarlas.
+
+Formato del fichero, una línea JSON por registro:
+    {"r": {...mensaje guardar_resultado con "clave"}}   resultado pendiente
+    {"hechas": [clave, ...]}                              ya enviados (o descartados)
+Al arrancar se reproduce para recuperar los pendientes. Memoria y disco
+están acotados: como mucho MAX_PENDIENTES resultados (al pasar del límite
+se descartan los más antiguos) y el fichero se reescribe sólo con los
+pendientes, de forma atómica, cuando acumula demasiadas líneas.
+
+Está pensado para un proceso por máquina (el menú lanza los juegos en el
+mismo proceso); dos procesos no deben compartir el fichero.
+"""
+import atexit
+import json
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from client.common.communication import construir_lote, enviar_lote, obtener_pool
+
+RUTA = os.environ.get("ARCADE_OUTBOX_RUTA", os.path.join(os.path.expanduser("~"), ".arcade_outbox.jsonl"))
+# Resultados pendientes como mucho (los más antiguos se descartan)
+MAX_PENDIENTES = int(os.environ.get("ARCADE_OUTBOX_MAX", "10000"))
+# Resultados por mensaje guardar_resultados
+TAM_LOTE = 100
+# Espera entre reintentos: al azar entre 0 y ESPERA_MIN·2^fallos (como mucho ESPERA_MAX)
+ESPERA_MIN = 0.5
+ESPERA_MAX = 60.0
+# Segundos que se espera al salir del programa a que se vacíe el buzón
+ESPERA_SALIDA = 2.0
+
+
+class Buzon:
+    def __init__(self, ruta=RUTA, host="localhost", port=5000, max_pendientes=MAX_PENDIENTES):
+        self.ruta = ruta
+        self.host = host
+        self.port = port
+        self.max_pendientes = max_pendientes
+        self._pendientes = OrderedDict()  # clave -> mensaje
+        self._lock = threading.Lock()
+        self._hay_trabajo = threading.Event()
+        self._parar = threading.Event()
+        self._vacio = threading.Condition(self._lock)
+        self._lineas = 0
+        self._hilo = None
+        self.enviados = 0
+        self.descartados = 0
+        self.fallos = 0
+        self._reproducir()
+        self._compactar()
+
+    # — Fichero —
+
+    def _reproducir(self):
+        if not os.path.exists(self.ruta):
+            return
+        with open(self.ruta, "rb") as f:
+            for linea in f:
+                try:
+                    registro = json.loads(linea)
+                except ValueError:
+                    # Última línea a medio escribir tras una caída: se descarta
+                    continue
+                if not isinstance(registro, dict):
+                    continue
+                # Registros con otra forma (fichero dañado o ajeno) se saltan
+                enviado, hechas = registro.get("r"), registro.get("hechas", ())
+                if isinstance(enviado, dict) and isinstance(enviado.get("clave"), str):
+                    self._pendientes[enviado["clave"]] = enviado
+                if isinstance(hechas, list):
+                    for clave in hechas:
+                        if isinstance(clave, str):
+                            self._pendientes.pop(clave, None)
+        while len(self._pendientes) > self.max_pendientes:
+            self._pendientes.popitem(last=False)
+            self.descartados += 1
+
+    def _compactar(self):
+        """Reescribe el fichero sólo con los pendientes (fichero temporal + rename)."""
+        temporal = f"{self.ruta}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            for msg in self._pendientes.values():
+                f.write(json.dumps({"r": msg}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporal, self.ruta)
+        self._lineas = len(self._pendientes)
+
+    def _anotar(self, registro: dict):
+        """Añade una línea al fichero. Debe llamarse con el lock tomado."""
+        with open(self.ruta, "a", encoding="utf-8") as f:
+            f.write(json.dumps(registro) + "\n")
+        self._lineas += 1
+        self._compactar_si_sobra()
+
+    def _anotar_varios(self, registros: list):
+        """Añade líneas al fichero y espera a que estén en disco. Con el lock tomado."""
+        with open(self.ruta, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(registro) + "\n" for registro in registros))
+            f.flush()
+            os.fsync(f.fileno())
+        self._lineas += len(registros)
+        self._compactar_si_sobra()
+
+    def _compactar_si_sobra(self):
+        # Con el doble de líneas que pendientes, la mitad del fichero sobra
+        if self._lineas > 2 * len(self._pendientes) + TAM_LOTE:
+            self._compactar()
+
+    # — API —
+
+    def encolar(self, msg: dict) -> str:
+        """
+        Guarda un mensaje guardar_resultado en el buzón (en disco antes de
+        volver) y avisa al hilo de envío. Devuelve su clave.
+        """
+        return self.encolar_lote([msg])[0]
+
+    def encolar_lote(self, mensajes: list) -> list:
+        """Como encolar(), para varios mensajes con un solo fsync. Devuelve sus claves."""
+        mensajes = [dict(msg, clave=msg.get("clave") or uuid.uuid4().hex) for msg in mensajes]
+        with self._lock:
+            for msg in mensajes:
+                self._pendientes[msg["clave"]] = msg
+            descartadas = []
+            while len(self._pendientes) > self.max_pendientes:
+                descartadas.append(self._pendientes.popitem(last=False)[0])
+            self._anotar_varios([{"r": msg} for msg in mensajes])
+            if descartadas:
+                self.descartados += len(descartadas)
+                self._anotar({"hechas": descartadas})
+        self._hay_trabajo.set()
+        return [msg["clave"] for msg in mensajes]
+
+    def pendientes(self) -> int:
+        return len(self._pendientes)
+
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self._bucle, name="outbox", daemon=True)
+        self._hilo.start()
+
+    def vaciar(self, timeout=None) -> bool:
+        """Espera a que no quede nada pendiente. False si vence 'timeout'."""
+        with self._vacio:
+            return self._vacio.wait_for(lambda: not self._pendientes, timeout)
+
+    def detener(self):
+        if self._hilo is None:
+            return
+        self._parar.set()
+        self._hay_trabajo.set()
+        self._hilo.join()
+        self._hilo = None
+
+    # — Envío —
+
+    def _bucle(self):
+        fallos = 0
+        while not self._parar.is_set():
+            if not self._pendientes:
+                self._hay_trabajo.wait()
+                self._hay_trabajo.clear()
+                continue
+            if self._enviar_lote():
+                fallos = 0
+                continue
+            fallos += 1
+            self.fallos += 1
+            # Un resultado nuevo no acorta la espera: el servidor sigue caído
+            self._parar.wait(random.uniform(0, min(ESPERA_MAX, ESPERA_MIN * 2 ** fallos)))
+
+    def _enviar_lote(self) -> bool:
+        """Envía los TAM_LOTE pendientes más antiguos. False si hay que reintentar."""
+        with self._lock:
+            lote = [msg for _, msg in zip(range(TAM_LOTE), self._pendientes.values())]
+        try:
+            resp = obtener_pool(self.host, self.port).peticion(construir_lote(lote))
+        except OSError:
+            # Sin conexión, timeout o conexión cortada (ConnectionError es un OSError)
+            return False
+        if resp.get("acción") == "error":
+            # 503 (servidor saturado) u otro fallo del lote entero
+            return False
+        # Los rechazados por inválidos tampoco se reintentan: no cambiarían
+        hechas = [lote[estado["indice"]]["clave"] for estado in resp.get("resultados", ())]
+        with self._lock:
+            for clave in hechas:
+                self._pendientes.pop(clave, None)
+            if self._pendientes:
+                self._anotar({"hechas": hechas})
+            else:
+                # Todo enviado: el fichero se queda vacío
+                self._compactar()
+            self.enviados += len(hechas)
+            self._vacio.notify_all()
+        return True
+
+
+_buzon = None
+_buzon_lock = threading.Lock()
+# Resultados que los juegos han encolado y el hilo de entrada aún no ha
+# apuntado en el buzón (o enviado directamente si no hay buzón)
+_entrada = queue.SimpleQueue()
+_sin_apuntar = 0
+_apuntados = threading.Condition()
+_hilo_entrada = None
+_salida_registrada = False
+
+def obtener_buzon() -> Buzon:
+    """
+    El buzón del proceso, creado (y su hilo arrancado) la primera vez. Al
+    crearlo se reproduce y compacta el fichero: puede tardar y lanzar OSError.
+    """
+    global _buzon
+    with _buzon_lock:
+        if _buzon is None:
+            _buzon = Buzon(RUTA)
+            _buzon.iniciar()
+            _registrar_salida()
+        return _buzon
+
+def _registrar_salida():
+    global _salida_registrada
+    if not _salida_registrada:
+        _salida_registrada = True
+        atexit.register(_al_salir)
+
+def encolar(msg: dict) -> str:
+    """
+    Apunta un resultado para enviarlo en cuanto el servidor esté disponible.
+    No bloquea: el disco (y, si falla, el envío directo) lo atiende el hilo
+    de entrada. Devuelve la clave de idempotencia del resultado.
+    """
+    global _sin_apuntar, _hilo_entrada
+    msg = dict(msg, clave=msg.get("clave") or uuid.uuid4().hex)
+    with _apuntados:
+        _sin_apuntar += 1
+        if _hilo_entrada is None:
+            _hilo_entrada = threading.Thread(target=_apuntar_entrada, name="outbox-entrada",
+                                             daemon=True)
+            _hilo_entrada.start()
+            with _buzon_lock:
+                _registrar_salida()
+    _entrada.put(msg)
+    return msg["clave"]
+
+def _apuntar_entrada():
+    global _sin_apuntar
+    while True:
+        mensajes = [_entrada.get()]
+        while True:
+            try:
+                mensajes.append(_entrada.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            obtener_buzon().encolar_lote(mensajes)
+        except Exception:
+            # Sin buzón utilizable (disco, permisos o fichero ilegible): un
+            # único intento, como antes del buzón. El hilo sigue vivo para
+            # los siguientes resultados.
+            _enviar_sin_buzon(mensajes)
+        finally:
+            with _apuntados:
+                _sin_apuntar -= len(mensajes)
+                _apuntados.notify_all()
+
+def _enviar_sin_buzon(mensajes: list):
+    try:
+        enviar_lote(mensajes)
+    except Exception:
+        pass
+
+def _al_salir():
+    # Lo que no dé tiempo a enviar sigue en el fichero para el próximo arranque
+    # (lo que aún no se había apuntado, no)
+    limite = time.monotonic() + ESPERA_SALIDA
+    with _apuntados:
+        _apuntados.wait_for(lambda: not _sin_apuntar, ESPERA_SALIDA)
+    if _buzon is not None:
+        _buzon.vaciar(max(0.0, limite - time.monotonic()))
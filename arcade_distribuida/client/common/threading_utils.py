@@ -1,61 +1,234 @@
+"""
+Trabajo en segundo plano del cliente sobre un único pool de hilos acotado.
+
+run_async, start_thread y delayed_call ya no crean un hilo (o un Timer)
+por llamada: encolan la tarea en un EjecutorAcotado compartido, con como
+mucho MAX_TRABAJADORES hilos y MAX_COLA tareas en espera, y devuelven un
+concurrent.futures.Future que se puede cancelar mientras no haya empezado.
+Las llamadas diferidas las guarda un único hilo planificador en un montículo
+ordenado por instante y, al vencer, pasan al pool; así una llamada lenta no
+retrasa a las demás.
+
+Los hilos son daemon, como antes: una sugerencia de la IA a medio generar
+no impide cerrar el juego. Como los hilos sueltos de antes, las tareas de
+run_async, start_thread y delayed_call que terminan con una excepción la
+muestran por sys.excepthook: quien las lanza no suele mirar su Future.
+estadisticas() muestra la cola, los hilos ocupados y la espera y duración
+de las tareas.
+"""
+import heapq
+import itertools
+import os
+import queue
+import sys
 import threading
-from typing import Any, Callable, Optional, Tuple
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Tuple
+
+# Hilos del pool compartido
+MAX_TRABAJADORES = int(os.environ.get("ARCADE_HILOS_CLIENTE", "4"))
+# Tareas esperando hilo como mucho; las que llegan con la cola llena fallan
+MAX_COLA = 256
+
+
+class ColaLlena(RuntimeError):
+    """El pool tiene MAX_COLA tareas esperando; la nueva no se ha encolado."""
+
+
+class EjecutorAcotado:
+    """
+    Pool de hilos daemon con cola acotada. Los hilos se crean según hacen
+    falta, hasta 'max_trabajadores', y se quedan esperando trabajo.
+    """
+
+    def __init__(self, max_trabajadores=MAX_TRABAJADORES, max_cola=MAX_COLA, nombre="cliente"):
+        self.max_trabajadores = max(1, max_trabajadores)
+        self.nombre = nombre
+        self._cola = queue.Queue(max_cola)
+        self._lock = threading.Lock()
+        self._hilos = []
+        self._libres = 0
+        self.activos = 0
+        self.completadas = 0
+        self.rechazadas = 0
+        self._espera_total = 0.0
+        self._espera_max = 0.0
+        self._ejecucion_total = 0.0
+
+    def enviar(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        """
+        Encola fn(*args, **kwargs) y devuelve su Future. Si la cola está
+        llena el Future ya viene con ColaLlena (no se lanza aquí, para que
+        las llamadas "dispara y olvida" del bucle de juego no fallen).
+        """
+        fut = Future()
+        self._encolar(fut, fn, args, kwargs)
+        return fut
+
+    def _encolar(self, fut, fn, args, kwargs):
+        try:
+            self._cola.put_nowait((fut, fn, args, kwargs, time.perf_counter()))
+        except queue.Full:
+            with self._lock:
+                self.rechazadas += 1
+            if fut.set_running_or_notify_cancel():
+                fut.set_exception(ColaLlena(f"Más de {self._cola.maxsize} tareas en espera"))
+            return
+        with self._lock:
+            # Un hilo más si hay más tareas esperando que hilos libres
+            if self._cola.qsize() > self._libres and len(self._hilos) < self.max_trabajadores:
+                hilo = threading.Thread(target=self._trabajar, daemon=True,
+                                        name=f"{self.nombre}-{len(self._hilos)}")
+                self._hilos.append(hilo)
+                self._libres += 1
+                hilo.start()
+
+    def _trabajar(self):
+        while True:
+            fut, fn, args, kwargs, encolada = self._cola.get()
+            if not fut.set_running_or_notify_cancel():
+                continue  # cancelada mientras esperaba
+            inicio = time.perf_counter()
+            with self._lock:
+                self._libres -= 1
+                self.activos += 1
+                espera = inicio - encolada
+                self._espera_total += espera
+                self._espera_max = max(self._espera_max, espera)
+            try:
+                fut.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                fut.set_exception(e)
+            finally:
+                with self._lock:
+                    self._libres += 1
+                    self.activos -= 1
+                    self.completadas += 1
+                    self._ejecucion_total += time.perf_counter() - inicio
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            completadas = self.completadas or 1
+            return {
+                "trabajadores": len(self._hilos),
+                "max_trabajadores": self.max_trabajadores,
+                "activos": self.activos,
+                "en_cola": self._cola.qsize(),
+                "completadas": self.completadas,
+                "rechazadas": self.rechazadas,
+                "espera_media_ms": self._espera_total / completadas * 1000,
+                "espera_max_ms": self._espera_max * 1000,
+                "ejecucion_media_ms": self._ejecucion_total / completadas * 1000,
+            }
+
+
+class Planificador:
+    """
+    Un único hilo que guarda las llamadas diferidas en un montículo por
+    instante de vencimiento y las pasa al ejecutor cuando vencen.
+    """
+
+    def __init__(self, ejecutor: EjecutorAcotado):
+        self.ejecutor = ejecutor
+        self._monticulo = []  # (instante, orden, Future, fn, args, kwargs)
+        self._orden = itertools.count()
+        self._cambio = threading.Condition()
+        self._hilo = None
+
+    def programar(self, delay: float, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        fut = Future()
+        vence = time.monotonic() + max(0.0, delay)
+        with self._cambio:
+            heapq.heappush(self._monticulo, (vence, next(self._orden), fut, fn, args, kwargs))
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._bucle, name="planificador", daemon=True)
+                self._hilo.start()
+            self._cambio.notify()
+        return fut
+
+    def pendientes(self) -> int:
+        with self._cambio:
+            return len(self._monticulo)
+
+    def _bucle(self):
+        while True:
+            with self._cambio:
+                while not self._monticulo or self._monticulo[0][0] > time.monotonic():
+                    espera = self._monticulo[0][0] - time.monotonic() if self._monticulo else None
+                    self._cambio.wait(espera)
+                _, _, fut, fn, args, kwargs = heapq.heappop(self._monticulo)
+            if not fut.cancelled():
+                self.ejecutor._encolar(fut, fn, args, kwargs)
+
+
+_ejecutor = EjecutorAcotado()
+_planificador = Planificador(_ejecutor)
+
+def ejecutor() -> EjecutorAcotado:
+    """El pool compartido del proceso."""
+    return _ejecutor
+
+def estadisticas() -> dict:
+    """Estado del pool compartido y de las llamadas diferidas pendientes."""
+    datos = _ejecutor.estadisticas()
+    datos["programadas"] = _planificador.pendientes()
+    return datos
+
+def _avisar_si_falla(fut: Future):
+    """Done-callback: muestra por sys.excepthook la excepción de la tarea."""
+    if fut.cancelled():
+        return
+    error = fut.exception()
+    if error is not None:
+        sys.excepthook(type(error), error, error.__traceback__)
+
+def _sin_perder_errores(fut: Future) -> Future:
+    fut.add_done_callback(_avisar_si_falla)
+    return fut
 
 def start_thread(
     target: Callable[..., Any],
-    args: Tuple[Any, ...] = (),
-    daemon: bool = True
-) -> threading.Thread:
+    args: Tuple[Any, ...] = ()
+) -> Future:
     """
-    Inicia una función en un hilo separado.
+    Ejecuta una función en el pool compartido (en un hilo daemon).
 
-    :param target: Función a ejecutar en el hilo.
+    :param target: Función a ejecutar.
     :param args: Tupla de argumentos a pasar a la función.
-    :param daemon: Si True, el hilo será daemon y no bloqueará el cierre de la app.
-    :return: El objeto Thread iniciado.
+    :return: Future con el resultado (cancelable mientras espera en la cola).
     """
-    thread = threading.Thread(target=target, args=args)
-    thread.daemon = daemon
-    thread.start()
-    return thread
+    return _sin_perder_errores(_ejecutor.enviar(target, *args))
 
 def run_async(
     func: Callable[..., Any]
-) -> Callable[..., threading.Thread]:
+) -> Callable[..., Future]:
     """
-    Decorador para ejecutar una función de forma asíncrona en un hilo daemon.
+    Decorador para ejecutar una función de forma asíncrona en el pool compartido.
 
     Uso:
         @run_async
         def mi_funcion_larga(param1, param2):
             …
 
-        # Llamada no bloqueante:
+        # Llamada no bloqueante; devuelve un Future
         mi_funcion_larga(x, y)
     """
-    def wrapper(*args: Any, **kwargs: Any) -> threading.Thread:
-        thread = threading.Thread(target=func, args=args, kwargs=kwargs)
-        thread.daemon = True
-        thread.start()
-        return thread
+    def wrapper(*args: Any, **kwargs: Any) -> Future:
+        return _sin_perder_errores(_ejecutor.enviar(func, *args, **kwargs))
     return wrapper
 
 def delayed_call(
     delay: float,
     callback: Callable[..., Any],
-    args: Tuple[Any, ...] = (),
-    daemon: bool = True
-) -> threading.Timer:
+    args: Tuple[Any, ...] = ()
+) -> Future:
     """
-    Ejecuta callback(*args) después de 'delay' segundos en un hilo separado.
+    Ejecuta callback(*args) en el pool después de 'delay' segundos.
 
     :param delay: Tiempo en segundos antes de ejecutar el callback.
     :param callback: Función a llamar tras el retraso.
     :param args: Argumentos para la función callback.
-    :param daemon: Si True, el Timer será daemon.
-    :return: El objeto Timer iniciado.
+    :return: Future del callback; cancel() lo anula si aún no ha empezado.
     """
-    timer = threading.Timer(delay, callback, args=args)
-    timer.daemon = daemon
-    timer.start()
-    return timer
+    return _sin_perder_errores(_planificador.programar(delay, callback, *args))
@@ -2,9 +2,8 @@
 
 import pygame
 import sys
-from datetime import datetime
-from client.common.communication import send_and_receive
-from client.common.threading_utils import run_async
+from client.common import outbox
+from client.common.mensajes import resultado_hanoi
 from client.common.ia_client import solicitar_sugerencia_async
 
 # — Configuración Pygame —
@@ -26,23 +25,12 @@ HIGHLIGHT    = (255,0,0)
 BUTTON_BG    = (50,50,200)
 BUTTON_FG    = (255,255,255)
 
-@run_async
 def enviar_resultado(discos, movimientos, completado):
-    """Envía el resultado al servidor sin bloquear la UI."""
-    msg = {
-        "juego": "hanoi",
-        "acción": "guardar_resultado",
-        "datosPartida": {
-            "discos": discos,
-            "movimientos": movimientos,
-            "completado": completado
-        },
-        "timestamp": datetime.utcnow().isoformat() + "Z"
-    }
-    try:
-        send_and_receive(msg)
-    except:
-        pass
+    """
+    Apunta el resultado en el buzón local; un hilo de fondo lo envía al
+    servidor (reintentando si no está disponible) sin bloquear la UI.
+    """
+    outbox.encolar(resultado_hanoi(discos, movimientos, completado))
 
 def generar_solucion(n, src, dst, aux, moves):
     """Genera la secuencia óptima de movimientos con backtracking."""
@@ -2,9 +2,8 @@
 
 import pygame
 import sys
-from datetime import datetime
-from client.common.communication import send_and_receive
-from client.common.threading_utils import run_async
+from client.common import outbox
+from client.common.mensajes import resultado_nreinas
 from client.common.ia_client import solicitar_sugerencia_async
 
 # — Configuración ventana y constantes —
@@ -21,19 +20,12 @@ BUTTON_BG       = (50,50,200)
 BUTTON_FG       = (255,255,255)
 HIGHLIGHT_COLOR = (255,0,0)
 
-@run_async
 def enviar_resultado(N, intentos, resuelto):
-    """Envía el resultado al servidor sin bloquear la UI."""
-    msg = {
-        "juego": "nreinas",
-        "acción": "guardar_resultado",
-        "datosPartida": {"N": N, "resuelto": resuelto, "intentos": intentos},
-        "timestamp": datetime.utcnow().isoformat() + "Z"
-    }
-    try:
-        send_and_receive(msg)
-    except:
-        pass
+    """
+    Apunta el resultado en el buzón local; un hilo de fondo lo envía al
+    servidor (reintentando si no está disponible) sin bloquear la UI.
+    """
+    outbox.encolar(resultado_nreinas(N, intentos, resuelto))
 
 def es_valido(pos, reinas):
     """Comprueba que una reina en pos no ataque a las existentes."""
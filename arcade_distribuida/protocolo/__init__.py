@@ -0,0 +1,3 @@
+# Entradas del top de cada juego que responde solicitar_mejores (la caché del
+# servidor); el cliente las usa como primera página del ranking
+TOP_MEJORES = 5
@@ -0,0 +1,329 @@
+"""
+Codificación binaria compacta, alternativa al JSON delimitado por '\\n'.
+
+Cada trama es: byte mágico 0xA7 + longitud (u32 big-endian) + contenido.
+El contenido empieza por un código de acción de un byte y sigue con campos
+de ancho fijo: juego como u8, timestamps como enteros de microsegundos
+desde epoch (UTC) y contadores como enteros sin signo. Los mensajes que no
+encajan en un formato fijo (acciones nuevas, campos extra, valores fuera
+de rango) viajan con el código JSON y su contenido JSON en UTF-8, así que
+cualquier mensaje puede enviarse por una conexión binaria.
+
+El servidor reconoce una conexión binaria por su primer byte (un mensaje
+JSON nunca empieza por 0xA7), de modo que los clientes JSON no cambian.
+"""
+import json
+import re
+import struct
+from datetime import datetime, timedelta, timezone
+
+from protocolo.framing import LectorTramas, TramaDemasiadoGrande
+
+MAGIA = 0xA7
+_CABECERA = struct.Struct(">BI")
+
+# Códigos de acción
+GUARDAR_RESULTADO = 0x01
+SOLICITAR_MEJORES = 0x02
+CONFIRMACION = 0x80
+ERROR = 0x81
+JSON = 0xFF
+
+# Subtipos de confirmación
+_CONF_GUARDADO = 0x00
+_CONF_MEJORES = 0x01
+_CONF_GUARDADO_PCT = 0x02  # guardado con "percentil" (partida completada)
+
+JUEGOS = {"nreinas": 1, "caballo": 2, "hanoi": 3}
+_JUEGOS_INV = {codigo: juego for juego, codigo in JUEGOS.items()}
+
+_TS = struct.Struct(">q")
+_ERR = struct.Struct(">H")
+# Percentil en décimas (el servidor lo redondea a un decimal)
+_PCT = struct.Struct(">H")
+
+# juego -> (struct de datosPartida, nombres de campo en el orden del struct,
+#           orden de las columnas en las entradas de "mejores")
+_DATOS = {
+    "nreinas": (struct.Struct(">HI?"), ("N", "intentos", "resuelto"),
+                ("N", "resuelto", "intentos")),
+    "caballo": (struct.Struct(">bbI?"), ("posicion_inicial", "movimientos", "completado"),
+                ("posicion_inicial", "movimientos", "completado")),
+    "hanoi":   (struct.Struct(">HI?"), ("discos", "movimientos", "completado"),
+                ("discos", "movimientos", "completado")),
+}
+
+# Struct de cada entrada de "mejores": id + datosPartida + timestamp
+_ENTRADAS = {
+    juego: struct.Struct(">I" + estructura.format.lstrip(">") + "q")
+    for juego, (estructura, _, _) in _DATOS.items()
+}
+
+_BOOLEANOS = ("resuelto", "completado")
+
+_POSICION = re.compile(r"^\((-?\d+), (-?\d+)\)$")
+
+_EPOCH = datetime(1970, 1, 1)
+_MICRO = timedelta(microseconds=1)
+
+
+class _NoRepresentable(Exception):
+    """El mensaje no encaja en un formato fijo: se envía como JSON."""
+
+
+def es_binario(primeros: bytes) -> bool:
+    """True si los primeros bytes de una conexión son de una trama binaria."""
+    return bool(primeros) and primeros[0] == MAGIA
+
+
+# — Campos —
+
+def _ts_a_micro(iso) -> int:
+    if not isinstance(iso, str):
+        raise _NoRepresentable
+    try:
+        dt = datetime.fromisoformat(iso.replace("Z", ""))
+    except ValueError:
+        raise _NoRepresentable
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return (dt - _EPOCH) // _MICRO
+
+
+def _micro_a_ts(micro: int) -> str:
+    return (_EPOCH + timedelta(microseconds=micro)).isoformat() + "Z"
+
+
+def _valores(juego, datos) -> list:
+    """Valores de datosPartida en el orden del struct del juego."""
+    _, campos, _ = _DATOS[juego]
+    if not isinstance(datos, dict) or len(datos) != len(campos):
+        raise _NoRepresentable
+    valores = []
+    try:
+        for campo in campos:
+            val = datos[campo]
+            if campo == "posicion_inicial":
+                m = _POSICION.match(val) if type(val) is str else None
+                if not m:
+                    raise _NoRepresentable
+                valores.append(int(m.group(1)))
+                valores.append(int(m.group(2)))
+            elif campo in _BOOLEANOS:
+                if type(val) is not bool:
+                    raise _NoRepresentable
+                valores.append(val)
+            else:
+                if type(val) is not int:
+                    raise _NoRepresentable
+                valores.append(val)
+    except KeyError:
+        raise _NoRepresentable
+    return valores
+
+
+def _empaquetar_percentil(percentil) -> bytes:
+    if type(percentil) is not float or round(percentil * 10) / 10 != percentil:
+        raise _NoRepresentable
+    try:
+        return _PCT.pack(round(percentil * 10))
+    except struct.error:
+        raise _NoRepresentable
+
+
+def _empaquetar_datos(juego, datos) -> bytes:
+    try:
+        return _DATOS[juego][0].pack(*_valores(juego, datos))
+    except struct.error:
+        raise _NoRepresentable
+
+
+def _a_dict(juego, valores, orden) -> dict:
+    """Inverso de _valores: reconstruye los campos en el orden pedido."""
+    if juego == "caballo":
+        x, y, movimientos, completado = valores
+        datos = {"posicion_inicial": f"({x}, {y})", "movimientos": movimientos,
+                 "completado": completado}
+    else:
+        datos = dict(zip(_DATOS[juego][1], valores))
+    return {campo: datos[campo] for campo in orden}
+
+
+def _desempaquetar_datos(juego, buf, pos) -> tuple:
+    estructura, campos, _ = _DATOS[juego]
+    return _a_dict(juego, estructura.unpack_from(buf, pos), campos), pos + estructura.size
+
+
+def _juego_de_entradas(entradas) -> str:
+    for juego, (_, campos, _) in _DATOS.items():
+        if set(entradas[0]) == {"id", "timestamp", *campos}:
+            return juego
+    raise _NoRepresentable
+
+
+# — Codificación —
+
+def _codificar_fijo(msg: dict) -> bytes:
+    acción = msg.get("acción")
+    claves = set(msg)
+
+    if acción == "guardar_resultado" and claves == {"acción", "juego", "datosPartida", "timestamp"}:
+        juego = msg["juego"]
+        if juego not in JUEGOS:
+            raise _NoRepresentable
+        return (bytes((GUARDAR_RESULTADO, JUEGOS[juego]))
+                + _TS.pack(_ts_a_micro(msg["timestamp"]))
+                + _empaquetar_datos(juego, msg["datosPartida"]))
+
+    if acción == "solicitar_mejores" and claves == {"acción", "juego", "timestamp"}:
+        if msg["juego"] not in JUEGOS:
+            raise _NoRepresentable
+        return (bytes((SOLICITAR_MEJORES, JUEGOS[msg["juego"]]))
+                + _TS.pack(_ts_a_micro(msg["timestamp"])))
+
+    if acción == "confirmación" and msg.get("status") == "ok":
+        ts = _TS.pack(_ts_a_micro(msg.get("timestamp")))
+        if claves == {"acción", "status", "timestamp", "mensaje"} \
+                and msg["mensaje"] == "Resultado guardado":
+            return bytes((CONFIRMACION, _CONF_GUARDADO)) + ts
+        if claves == {"acción", "status", "timestamp", "mensaje", "percentil"} \
+                and msg["mensaje"] == "Resultado guardado":
+            return (bytes((CONFIRMACION, _CONF_GUARDADO_PCT)) + ts
+                    + _empaquetar_percentil(msg["percentil"]))
+        if claves == {"acción", "status", "timestamp", "mejores"}:
+            entradas = msg["mejores"]
+            if not isinstance(entradas, list) or len(entradas) > 255:
+                raise _NoRepresentable
+            juego = _juego_de_entradas(entradas) if entradas else "nreinas"
+            partes = [bytes((CONFIRMACION, _CONF_MEJORES, JUEGOS[juego], len(entradas))), ts]
+            estructura = _ENTRADAS[juego]
+            for entry in entradas:
+                entry = dict(entry)
+                id_ = entry.pop("id", None)
+                ts_entry = _ts_a_micro(entry.pop("timestamp", None))
+                try:
+                    partes.append(estructura.pack(id_, *_valores(juego, entry), ts_entry))
+                except struct.error:
+                    raise _NoRepresentable
+            return b"".join(partes)
+
+    if acción == "error" and claves == {"acción", "error", "timestamp"}:
+        error = msg["error"]
+        if not isinstance(error, dict) or set(error) != {"code", "mensaje"}:
+            raise _NoRepresentable
+        try:
+            code = _ERR.pack(error["code"])
+        except struct.error:
+            raise _NoRepresentable
+        return (bytes((ERROR,)) + _TS.pack(_ts_a_micro(msg["timestamp"]))
+                + code + str(error["mensaje"]).encode("utf-8"))
+
+    raise _NoRepresentable
+
+
+def codificar(msg: dict) -> bytes:
+    """Codifica 'msg' como trama binaria completa (cabecera incluida)."""
+    try:
+        contenido = _codificar_fijo(msg)
+    except _NoRepresentable:
+        contenido = bytes((JSON,)) + json.dumps(msg, ensure_ascii=False).encode("utf-8")
+    return _CABECERA.pack(MAGIA, len(contenido)) + contenido
+
+
+# — Decodificación —
+
+def decodificar(contenido: bytes) -> dict:
+    """Reconstruye el mensaje (mismo dict que en JSON) a partir del contenido."""
+    codigo = contenido[0]
+
+    if codigo == JSON:
+        return json.loads(contenido[1:])
+
+    if codigo == GUARDAR_RESULTADO:
+        juego = _JUEGOS_INV[contenido[1]]
+        micro, = _TS.unpack_from(contenido, 2)
+        datos, _ = _desempaquetar_datos(juego, contenido, 2 + _TS.size)
+        return {
+            "juego": juego,
+            "acción": "guardar_resultado",
+            "datosPartida": datos,
+            "timestamp": _micro_a_ts(micro),
+        }
+
+    if codigo == SOLICITAR_MEJORES:
+        micro, = _TS.unpack_from(contenido, 2)
+        return {
+            "juego": _JUEGOS_INV[contenido[1]],
+            "acción": "solicitar_mejores",
+            "timestamp": _micro_a_ts(micro),
+        }
+
+    if codigo == CONFIRMACION:
+        if contenido[1] in (_CONF_GUARDADO, _CONF_GUARDADO_PCT):
+            micro, = _TS.unpack_from(contenido, 2)
+            resp = {
+                "acción": "confirmación",
+                "status": "ok",
+                "timestamp": _micro_a_ts(micro),
+                "mensaje": "Resultado guardado",
+            }
+            if contenido[1] == _CONF_GUARDADO_PCT:
+                decimas, = _PCT.unpack_from(contenido, 2 + _TS.size)
+                resp["percentil"] = decimas / 10
+            return resp
+        juego = _JUEGOS_INV[contenido[2]]
+        cuantas = contenido[3]
+        micro, = _TS.unpack_from(contenido, 4)
+        pos = 4 + _TS.size
+        _, _, columnas = _DATOS[juego]
+        estructura = _ENTRADAS[juego]
+        mejores = []
+        for _ in range(cuantas):
+            valores = estructura.unpack_from(contenido, pos)
+            pos += estructura.size
+            entry = {"id": valores[0]}
+            entry.update(_a_dict(juego, valores[1:-1], columnas))
+            entry["timestamp"] = _micro_a_ts(valores[-1])
+            mejores.append(entry)
+        return {
+            "acción": "confirmación",
+            "status": "ok",
+            "timestamp": _micro_a_ts(micro),
+            "mejores": mejores,
+        }
+
+    if codigo == ERROR:
+        micro, = _TS.unpack_from(contenido, 1)
+        code, = _ERR.unpack_from(contenido, 1 + _TS.size)
+        return {
+            "acción": "error",
+            "error": {"code": code, "mensaje": contenido[1 + _TS.size + _ERR.size:].decode("utf-8")},
+            "timestamp": _micro_a_ts(micro),
+        }
+
+    raise ValueError(f"Código de acción binario desconocido: {codigo}")
+
+
+class LectorBinario(LectorTramas):
+    """Como LectorTramas, pero para tramas binarias con prefijo de longitud."""
+
+    def alimentar(self, datos) -> list:
+        buf = self._buffer
+        buf += datos
+        tramas = []
+        pos = 0
+        while len(buf) - pos >= _CABECERA.size:
+            magia, longitud = _CABECERA.unpack_from(buf, pos)
+            if magia != MAGIA:
+                raise ValueError("Cabecera de trama binaria inválida")
+            if longitud > self.max_trama:
+                raise TramaDemasiadoGrande(f"Trama mayor de {self.max_trama} bytes")
+            fin = pos + _CABECERA.size + longitud
+            if fin > len(buf):
+                break
+            tramas.append(bytes(buf[pos + _CABECERA.size:fin]))
+            pos = fin
+        if pos:
+            del buf[:pos]
+        return tramas
+
@@ -0,0 +1,69 @@
+"""
+Separación de mensajes (framing) del protocolo JSON delimitado por '\\n'.
+
+Lo usan tanto el servidor como el cliente. Trabaja sobre bytes: los datos
+recibidos se acumulan en un bytearray, sólo se busca el separador en los
+bytes nuevos y únicamente se decodifican tramas completas, así que un
+carácter UTF-8 multibyte (la 'ó' de "acción") partido entre dos recv no
+rompe nada y el coste es lineal aunque lleguen mensajes grandes o muchos
+mensajes seguidos (pipelining).
+"""
+
+SEPARADOR = b"\n"
+# Tamaño máximo de una trama; protege la memoria frente a clientes que
+# envían datos sin separador
+MAX_TRAMA = 1024 * 1024
+BUFFER_SIZE = 4096
+
+
+class TramaDemasiadoGrande(ValueError):
+    """Se recibió una trama (o un resto sin separador) mayor que max_trama."""
+
+
+class LectorTramas:
+    def __init__(self, max_trama=MAX_TRAMA, buffer_size=BUFFER_SIZE):
+        self.max_trama = max_trama
+        self.buffer_size = buffer_size
+        self._buffer = bytearray()
+        # Hasta dónde se ha buscado ya el separador dentro de _buffer
+        self._revisado = 0
+        # Área fija para recv_into, sin reservar memoria en cada lectura
+        self._recepcion = bytearray(buffer_size)
+        self._vista = memoryview(self._recepcion)
+
+    def alimentar(self, datos) -> list:
+        """
+        Añade bytes recibidos y devuelve la lista de tramas completas
+        (bytes sin el separador), en orden de llegada.
+        """
+        buf = self._buffer
+        buf += datos
+        tramas = []
+        inicio = 0
+        pos = buf.find(SEPARADOR, self._revisado)
+        while pos != -1:
+            if pos - inicio > self.max_trama:
+                raise TramaDemasiadoGrande(f"Trama mayor de {self.max_trama} bytes")
+            tramas.append(bytes(buf[inicio:pos]))
+            inicio = pos + 1
+            pos = buf.find(SEPARADOR, inicio)
+        if inicio:
+            del buf[:inicio]
+        self._revisado = len(buf)
+        if len(buf) > self.max_trama:
+            raise TramaDemasiadoGrande(f"Trama mayor de {self.max_trama} bytes")
+        return tramas
+
+    def leer_de(self, sock):
+        """
+        Hace un recv sobre 'sock' y devuelve las tramas completas recibidas
+        (posiblemente ninguna). Devuelve None si el otro extremo cerró.
+        """
+        n = sock.recv_into(self._recepcion)
+        if not n:
+            return None
+        return self.alimentar(self._vista[:n])
+
+    def pendiente(self) -> int:
+        """Bytes recibidos que aún no forman una trama completa."""
+        return len(self._buffer)
@@ -0,0 +1,36 @@
+"""
+Capa de almacenamiento de resultados.
+
+El servidor guarda y consulta resultados siempre a través de un objeto
+Almacen; el backend concreto se elige al arrancar con ARCADE_ALMACEN:
+
+    sqlite   SQLite ajustado (WAL, synchronous=NORMAL, mmap, pool) — por defecto
+    memoria  sin persistencia, para tests y benchmarks
+    log      fichero de registro sólo-append, para el mayor ritmo de escritura
+"""
+from server import config
+from server.almacen.base import (
+    Almacen, COLUMNAS, CRITERIOS, JUEGOS, TAMAÑOS, crear_fila, a_entrada, columna_tamaño
+)
+
+
+def crear_almacen(tipo: str = None) -> Almacen:
+    """Instancia el backend 'tipo' (por defecto el configurado)."""
+    tipo = tipo or config.ALMACEN
+    if tipo == "sqlite":
+        # Importación diferida: los otros backends no necesitan SQLAlchemy
+        from server.almacen.sqlite import AlmacenSQLite
+        return AlmacenSQLite()
+    if tipo == "memoria":
+        from server.almacen.memoria import AlmacenMemoria
+        return AlmacenMemoria()
+    if tipo == "log":
+        from server.almacen.log import AlmacenLog
+        return AlmacenLog(config.LOG_RUTA, fsync=config.LOG_FSYNC)
+    raise ValueError(f"Almacén desconocido: {tipo}")
+
+
+__all__ = [
+    "Almacen", "COLUMNAS", "CRITERIOS", "JUEGOS", "TAMAÑOS",
+    "crear_fila", "a_entrada", "columna_tamaño", "crear_almacen",
+]
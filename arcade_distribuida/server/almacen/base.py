@@ -0,0 +1,227 @@
+"""
+Interfaz común de los backends de almacenamiento.
+
+Los backends trabajan con filas planas: una tupla (juego, columnas) donde
+'columnas' es un diccionario con los campos de la tabla del juego (sin id)
+y el timestamp como datetime. Lo que devuelven son "entradas": diccionarios
+listos para JSON con el id asignado, en el mismo formato que ve el cliente.
+
+'columnas' puede llevar además "clave", una clave de idempotencia elegida
+por el cliente: si ya se guardó un resultado con la misma clave, el backend
+no inserta otra fila y devuelve la entrada original marcada con
+"repetido": True (las repetidas no cuentan en el resumen ni en el top).
+"""
+from datetime import datetime
+
+# Columnas de cada juego, en el orden de la tabla
+COLUMNAS = {
+    "nreinas": ("N", "resuelto", "intentos", "timestamp"),
+    "caballo": ("posicion_inicial", "movimientos", "completado", "timestamp"),
+    "hanoi":   ("discos", "movimientos", "completado", "timestamp"),
+}
+
+# juego -> (columna que indica partida completada, columna por la que se ordena)
+CRITERIOS = {
+    "nreinas": ("resuelto", "intentos"),
+    "caballo": ("completado", "movimientos"),
+    "hanoi":   ("completado", "movimientos"),
+}
+
+# juego -> columna con el tamaño de la partida por la que se puede filtrar
+# el ranking (None si el juego no tiene tamaño variable)
+TAMAÑOS = {
+    "nreinas": "N",
+    "caballo": None,
+    "hanoi":   "discos",
+}
+
+JUEGOS = tuple(COLUMNAS)
+
+# Longitud máxima de una clave de idempotencia
+MAX_CLAVE = 64
+
+
+def _entero(datos: dict, campo: str) -> int:
+    if campo not in datos:
+        raise ValueError(f"Falta el campo '{campo}'")
+    val = datos[campo]
+    # bool es subclase de int: no se acepta como número
+    if isinstance(val, bool) or not isinstance(val, int):
+        raise ValueError(f"'{campo}' debe ser un entero")
+    return val
+
+
+def _booleano(datos: dict, campo: str) -> bool:
+    if campo not in datos:
+        raise ValueError(f"Falta el campo '{campo}'")
+    val = datos[campo]
+    if not isinstance(val, bool):
+        raise ValueError(f"'{campo}' debe ser true o false")
+    return val
+
+
+def crear_fila(juego: str, datos: dict, timestamp: str, clave: str = None) -> tuple:
+    """
+    Valida un resultado y construye su fila (juego, columnas).
+    Lanza ValueError con un mensaje legible si algo no es válido.
+    """
+    if clave is not None and (not isinstance(clave, str) or not 0 < len(clave) <= MAX_CLAVE):
+        raise ValueError(f"'clave' debe ser un texto de 1 a {MAX_CLAVE} caracteres")
+    if not isinstance(datos, dict):
+        raise ValueError("'datosPartida' debe ser un objeto")
+    # Convertir timestamp ISO -> datetime
+    try:
+        ts = datetime.fromisoformat(timestamp.replace("Z", ""))
+    except (AttributeError, ValueError):
+        raise ValueError("'timestamp' debe ser una fecha ISO 8601")
+
+    if juego == "nreinas":
+        columnas = {
+            "N": _entero(datos, "N"),
+            "resuelto": _booleano(datos, "resuelto"),
+            "intentos": _entero(datos, "intentos"),
+        }
+    elif juego == "caballo":
+        columnas = {
+            "posicion_inicial": str(datos.get("posicion_inicial", "")),
+            "movimientos": _entero(datos, "movimientos"),
+            "completado": _booleano(datos, "completado"),
+        }
+    elif juego == "hanoi":
+        columnas = {
+            "discos": _entero(datos, "discos"),
+            "movimientos": _entero(datos, "movimientos"),
+            "completado": _booleano(datos, "completado"),
+        }
+    else:
+        raise ValueError("Juego no reconocido")
+    columnas["timestamp"] = ts
+    if clave is not None:
+        columnas["clave"] = clave
+    return juego, columnas
+
+
+def separar_clave(columnas: dict) -> tuple:
+    """(columnas sin la clave de idempotencia, clave o None)."""
+    if "clave" not in columnas:
+        return columnas, None
+    columnas = dict(columnas)
+    return columnas, columnas.pop("clave")
+
+
+def a_entrada(id_: int, juego: str, columnas: dict) -> dict:
+    """Convierte una fila guardada en su entrada JSON (timestamp ISO + 'Z')."""
+    entry = {"id": id_}
+    for nombre in COLUMNAS[juego]:
+        val = columnas[nombre]
+        # Serializar datetime a ISO
+        if isinstance(val, datetime):
+            entry[nombre] = val.isoformat() + "Z"
+        else:
+            entry[nombre] = val
+    return entry
+
+
+# Campos acumulados de cada clave (juego, tamaño, dia) del resumen diario
+CAMPOS_RESUMEN = ("partidas", "completadas", "suma_valor", "suma_valor_completadas", "mejor_valor")
+
+
+def acumular_resumen(acumulado: dict, juego: str, entry: dict):
+    """
+    Suma una entrada guardada a 'acumulado', un diccionario
+    {(juego, tamaño, dia ISO): [valores de CAMPOS_RESUMEN]}.
+    """
+    completado, orden = CRITERIOS[juego]
+    columna = TAMAÑOS[juego]
+    clave = (juego, entry[columna] if columna else 0, entry["timestamp"][:10])
+    fila = acumulado.get(clave)
+    if fila is None:
+        fila = acumulado[clave] = [0, 0, 0, 0, None]
+    valor = entry[orden]
+    fila[0] += 1
+    fila[2] += valor
+    if entry[completado]:
+        fila[1] += 1
+        fila[3] += valor
+        if fila[4] is None or valor < fila[4]:
+            fila[4] = valor
+
+
+def a_resumen(juego: str, tamaño: int, dia: str, valores) -> dict:
+    """Fila del resumen diario lista para JSON, con las medias ya calculadas."""
+    partidas, completadas, suma, suma_completadas, mejor = valores
+    return {
+        "juego": juego,
+        "tamaño": tamaño,
+        "dia": dia,
+        "partidas": partidas,
+        "completadas": completadas,
+        "tasa_completadas": completadas / partidas if partidas else 0.0,
+        "media_valor": suma / partidas if partidas else None,
+        "media_valor_completadas": suma_completadas / completadas if completadas else None,
+        "mejor_valor": mejor,
+    }
+
+
+def comprobar_juego(juego: str):
+    if juego not in COLUMNAS:
+        raise ValueError("Juego no reconocido")
+
+
+def columna_tamaño(juego: str) -> str:
+    """Columna de tamaño del juego; ValueError si no admite ese filtro."""
+    comprobar_juego(juego)
+    columna = TAMAÑOS[juego]
+    if columna is None:
+        raise ValueError(f"El juego {juego} no se puede filtrar por tamaño")
+    return columna
+
+
+class Almacen:
+    """Backend de almacenamiento de resultados."""
+
+    nombre = "base"
+
+    def iniciar(self):
+        """Prepara el backend (crear tablas, abrir ficheros, cargar datos)."""
+
+    def cerrar(self):
+        """Libera los recursos del backend."""
+
+    def guardar_lote(self, filas: list) -> list:
+        """
+        Guarda de forma atómica una lista de filas (juego, columnas).
+        Devuelve las entradas guardadas, en el mismo orden (las de claves ya
+        vistas, con "repetido": True y el id original).
+        """
+        raise NotImplementedError
+
+    def top(self, juego: str, limit: int = 5) -> list:
+        """Mejores 'limit' entradas completadas del juego, de mejor a peor."""
+        raise NotImplementedError
+
+    def ranking(self, juego: str, limite: int = 10, tamaño: int = None,
+                despues: tuple = None) -> list:
+        """
+        Página del ranking: entradas completadas ordenadas por (valor, id),
+        sólo las del tamaño dado si 'tamaño' no es None, y empezando justo
+        después de la clave 'despues' = (valor, id) de la última entrada de
+        la página anterior (paginación por clave, sin OFFSET).
+        """
+        raise NotImplementedError
+
+    def resumen(self, juego: str, tamaño: int = None, desde: str = None,
+                hasta: str = None, limite: int = 1000) -> list:
+        """
+        Filas del resumen diario del juego (ver a_resumen), de la más reciente
+        a la más antigua y por tamaño. 'desde' y 'hasta' son días ISO
+        (AAAA-MM-DD), ambos incluidos.
+        """
+        raise NotImplementedError
+
+    def posicion(self, juego: str, id_: int, tamaño: int = None):
+        """
+        (posición desde 1, entrada) del resultado 'id_' en el ranking del
+        juego (del tamaño dado, si se indica), o None si no está en él.
+        """
+        raise NotImplementedError
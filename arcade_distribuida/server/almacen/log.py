@@ -0,0 +1,105 @@
+"""
+Backend de fichero de registro sólo-append.
+
+Cada lote se escribe como líneas JSON al final del fichero con una única
+escritura (y un fsync opcional); no hay índices ni transacciones, por lo
+que es el backend con mayor ritmo de escritura. Al arrancar se reproduce
+el fichero para reconstruir en memoria las consultas. Si un lote falla a
+mitad de escritura (disco lleno, por ejemplo) se corta lo que llegó a
+escribirse, para que el siguiente no quede pegado a una línea a medias.
+"""
+import json
+import os
+from server.almacen.memoria import AlmacenMemoria
+
+
+class AlmacenLog(AlmacenMemoria):
+    nombre = "log"
+
+    def __init__(self, ruta, fsync=True):
+        super().__init__()
+        self.ruta = ruta
+        self.fsync = fsync
+        self._fichero = None
+        # Tamaño al que hay que devolver el fichero tras un lote fallido cuyo
+        # recorte también falló (None si no queda nada a medias)
+        self._corte = None
+
+    def iniciar(self):
+        self._reproducir()
+        self._fichero = open(self.ruta, "ab")
+
+    def cerrar(self):
+        if self._fichero is not None:
+            self._fichero.close()
+            self._fichero = None
+
+    def guardar_lote(self, filas):
+        with self._lock:
+            preparadas = self._preparar(filas)
+            # Las repetidas no se escriben; la clave va en la línea para
+            # reconstruir la deduplicación al reproducir
+            datos = b"".join(
+                (json.dumps({"juego": juego, **entry, **({"clave": clave} if clave else {})})
+                 + "\n").encode("utf-8")
+                for juego, entry, clave in preparadas if not entry.get("repetido")
+            )
+            self._recortar()
+            inicio = self._fichero.tell()
+            try:
+                self._fichero.write(datos)
+                self._fichero.flush()
+                if self.fsync:
+                    os.fsync(self._fichero.fileno())
+            except BaseException:
+                self._corte = inicio
+                try:
+                    self._recortar()
+                except OSError:
+                    pass  # se reintenta antes del siguiente lote
+                raise
+            # Sólo se publican en memoria una vez escritas en el fichero
+            self._aplicar(preparadas)
+        return [entry for _, entry, _ in preparadas]
+
+    def _recortar(self):
+        """
+        Devuelve el fichero al tamaño que tenía antes de un lote fallido.
+        Se reabre para descartar lo que quedara en el búfer de escritura.
+        """
+        if self._corte is None:
+            return
+        try:
+            self._fichero.close()
+        except OSError:
+            pass  # el búfer sin escribir se descarta
+        self._fichero = open(self.ruta, "ab")
+        self._fichero.truncate(self._corte)
+        self._corte = None
+
+    def _reproducir(self):
+        if not os.path.exists(self.ruta):
+            return
+        entradas = []
+        completo = 0  # bytes hasta el último '\n'
+        with open(self.ruta, "rb") as f:
+            for linea in f:
+                if not linea.endswith(b"\n"):
+                    # Última línea a medio escribir tras una caída
+                    break
+                completo += len(linea)
+                try:
+                    entry = json.loads(linea)
+                except ValueError:
+                    continue
+                entradas.append((entry.pop("juego"), entry, entry.pop("clave", None)))
+        if completo < os.path.getsize(self.ruta):
+            # Se corta el resto antes de abrir en modo append: si no, la
+            # siguiente línea quedaría pegada a esos bytes y se perdería
+            # al volver a reproducir
+            with open(self.ruta, "r+b") as f:
+                f.truncate(completo)
+                f.flush()
+                os.fsync(f.fileno())
+        with self._lock:
+            self._aplicar(entradas)
@@ -0,0 +1,127 @@
+"""
+Backend en memoria: sin persistencia, pensado para tests y benchmarks.
+
+Los rankings se guardan en listas ordenadas: consultar es una búsqueda
+binaria, pero cada partida completada se inserta con list.insert, que
+desplaza los punteros siguientes (O(n)). Es un memmove: unos 30 µs con
+100.000 partidas por ranking y unos 0,3 ms con un millón; a partir de ahí
+conviene el backend sqlite, cuyo índice inserta en O(log n).
+"""
+import bisect
+import threading
+from server.almacen.base import (
+    Almacen, CRITERIOS, JUEGOS, TAMAÑOS, a_entrada, a_resumen, acumular_resumen,
+    comprobar_juego, columna_tamaño, separar_clave
+)
+
+
+class AlmacenMemoria(Almacen):
+    nombre = "memoria"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ultimo_id = {juego: 0 for juego in JUEGOS}
+        # (juego, tamaño o None) -> ([(valor, id)], [entrada]): las entradas
+        # completadas del ranking, ya ordenadas; se mantienen con bisect al
+        # guardar, así que consultar no vuelve a ordenar
+        self._ordenadas = {}
+        self._por_id = {juego: {} for juego in JUEGOS}
+        self._resumen = {}  # (juego, tamaño, dia) -> acumulados
+        self._claves = {}   # clave de idempotencia -> entrada guardada
+
+    def guardar_lote(self, filas):
+        with self._lock:
+            preparadas = self._preparar(filas)
+            self._aplicar(preparadas)
+        return [entry for _, entry, _ in preparadas]
+
+    def top(self, juego, limit=5):
+        return self.ranking(juego, limit)
+
+    def _filtro(self, juego, tamaño) -> tuple:
+        """Clave de _ordenadas del ranking de 'juego' (filtrado por 'tamaño')."""
+        comprobar_juego(juego)
+        if tamaño is not None:
+            columna_tamaño(juego)
+        return juego, tamaño
+
+    def ranking(self, juego, limite=10, tamaño=None, despues=None):
+        filtro = self._filtro(juego, tamaño)
+        with self._lock:
+            claves, entradas = self._ordenadas.get(filtro, ((), ()))
+            inicio = bisect.bisect_right(claves, tuple(despues)) if despues is not None else 0
+            return list(entradas[inicio:inicio + limite])
+
+    def posicion(self, juego, id_, tamaño=None):
+        filtro = self._filtro(juego, tamaño)
+        completado, orden = CRITERIOS[juego]
+        with self._lock:
+            e = self._por_id[juego].get(id_)
+            if e is None or not e[completado] or (tamaño is not None and e[TAMAÑOS[juego]] != tamaño):
+                return None
+            claves, _ = self._ordenadas[filtro]
+            return bisect.bisect_left(claves, (e[orden], id_)) + 1, e
+
+    def resumen(self, juego, tamaño=None, desde=None, hasta=None, limite=1000):
+        comprobar_juego(juego)
+        with self._lock:
+            filas = [
+                (clave, list(valores)) for clave, valores in self._resumen.items()
+                if clave[0] == juego
+                and (tamaño is None or clave[1] == tamaño)
+                and (desde is None or clave[2] >= desde)
+                and (hasta is None or clave[2] <= hasta)
+            ]
+        filas.sort(key=lambda item: (item[0][2], -item[0][1]), reverse=True)
+        return [a_resumen(*clave, valores) for clave, valores in filas[:limite]]
+
+    def _preparar(self, filas) -> list:
+        """
+        Valida el lote y asigna ids sin modificar el estado.
+        Devuelve [(juego, entrada, clave)]; las de claves ya guardadas (o
+        repetidas en el lote) llevan la entrada original con "repetido".
+        Debe llamarse con el lock tomado.
+        """
+        siguiente = dict(self._ultimo_id)
+        del_lote = {}
+        preparadas = []
+        for juego, columnas in filas:
+            comprobar_juego(juego)
+            columnas, clave = separar_clave(columnas)
+            original = self._claves.get(clave) or del_lote.get(clave)
+            if original is not None:
+                preparadas.append((juego, dict(original, repetido=True), clave))
+                continue
+            siguiente[juego] += 1
+            entry = a_entrada(siguiente[juego], juego, columnas)
+            if clave is not None:
+                del_lote[clave] = entry
+            preparadas.append((juego, entry, clave))
+        return preparadas
+
+    def _aplicar(self, preparadas):
+        """Incorpora entradas ya preparadas. Debe llamarse con el lock tomado."""
+        for juego, entry, clave in preparadas:
+            if entry.get("repetido"):
+                continue
+            self._por_id[juego][entry["id"]] = entry
+            self._ordenar(juego, entry)
+            acumular_resumen(self._resumen, juego, entry)
+            self._ultimo_id[juego] = max(self._ultimo_id[juego], entry["id"])
+            if clave is not None:
+                self._claves[clave] = entry
+
+    def _ordenar(self, juego, entry):
+        """Coloca 'entry' en los rankings ordenados. Debe llamarse con el lock tomado."""
+        completado, orden = CRITERIOS[juego]
+        if not entry[completado]:
+            return
+        clave = (entry[orden], entry["id"])
+        filtros = [(juego, None)]
+        if TAMAÑOS[juego] is not None:
+            filtros.append((juego, entry[TAMAÑOS[juego]]))
+        for filtro in filtros:
+            claves, entradas = self._ordenadas.setdefault(filtro, ([], []))
+            pos = bisect.bisect_left(claves, clave)
+            claves.insert(pos, clave)
+            entradas.insert(pos, entry)
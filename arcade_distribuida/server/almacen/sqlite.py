@@ -0,0 +1,203 @@
+"""
+Backend SQLite (vía SQLAlchemy) con el motor ajustado de server/db.py.
+"""
+from collections import defaultdict
+from datetime import date, datetime
+from sqlalchemy import func, insert, select, tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from server.db import engine, init_db
+from server.models import (
+    ResultadoNReinas, ResultadoKnightTour, ResultadoHanoi, ResumenDiario, ClaveIdempotencia
+)
+from server.almacen.base import (
+    Almacen, CAMPOS_RESUMEN, CRITERIOS, a_entrada, a_resumen, acumular_resumen, comprobar_juego,
+    columna_tamaño, separar_clave
+)
+
+MODELOS = {
+    "nreinas": ResultadoNReinas,
+    "caballo": ResultadoKnightTour,
+    "hanoi":   ResultadoHanoi,
+}
+
+
+class AlmacenSQLite(Almacen):
+    nombre = "sqlite"
+
+    def __init__(self, engine_=None):
+        self.engine = engine_ or engine
+
+    def iniciar(self):
+        init_db()  # crea tablas si no existen
+
+    def cerrar(self):
+        self.engine.dispose()
+
+    def guardar_lote(self, filas):
+        # Una sentencia INSERT ... RETURNING por tabla, todo en una transacción
+        separadas = []
+        for juego, columnas in filas:
+            comprobar_juego(juego)
+            separadas.append((juego, *separar_clave(columnas)))
+
+        entradas = [None] * len(filas)
+        with self.engine.begin() as conn:
+            # Las claves ya guardadas (o repetidas dentro del lote) no insertan
+            # fila: se devuelve la original
+            vistas = self._claves_guardadas(conn, {c for _, _, c in separadas if c is not None})
+            por_juego = defaultdict(list)
+            del_lote = {}
+            for pos, (juego, columnas, clave) in enumerate(separadas):
+                if clave in vistas:
+                    entradas[pos] = dict(vistas[clave], repetido=True)
+                elif clave in del_lote:
+                    del_lote[clave].append(pos)
+                else:
+                    por_juego[juego].append((pos, columnas, clave))
+                    if clave is not None:
+                        del_lote[clave] = []
+            nuevas = []
+            for juego, items in por_juego.items():
+                tabla = MODELOS[juego].__table__
+                stmt = insert(tabla).returning(tabla.c.id, sort_by_parameter_order=True)
+                res = conn.execute(stmt, [columnas for _, columnas, _ in items])
+                for (pos, columnas, clave), (id_,) in zip(items, res):
+                    entradas[pos] = a_entrada(id_, juego, columnas)
+                    nuevas.append((juego, entradas[pos]))
+                    if clave is not None:
+                        for repetida in del_lote[clave]:
+                            entradas[repetida] = dict(entradas[pos], repetido=True)
+                        del_lote[clave] = (juego, id_)
+            if del_lote:
+                ahora = datetime.utcnow()
+                conn.execute(insert(ClaveIdempotencia.__table__), [
+                    {"clave": clave, "juego": juego, "id_resultado": id_, "creado": ahora}
+                    for clave, (juego, id_) in del_lote.items()
+                ])
+            if nuevas:
+                self._actualizar_resumen(conn, nuevas)
+        return entradas
+
+    def _claves_guardadas(self, conn, claves) -> dict:
+        """{clave: entrada original} de las 'claves' que ya están guardadas."""
+        if not claves:
+            return {}
+        tabla = ClaveIdempotencia.__table__
+        vistas = {}
+        por_juego = defaultdict(dict)
+        for fila in conn.execute(select(tabla).where(tabla.c.clave.in_(claves))):
+            por_juego[fila.juego][fila.id_resultado] = fila.clave
+        for juego, ids in por_juego.items():
+            resultados = MODELOS[juego].__table__
+            for fila in conn.execute(select(resultados).where(resultados.c.id.in_(ids))):
+                vistas[ids[fila.id]] = a_entrada(fila.id, juego, fila._mapping)
+        # Si la retención ya borró la fila original, la clave sigue contando
+        # como vista: se devuelve sólo su id
+        for juego, ids in por_juego.items():
+            for id_, clave in ids.items():
+                vistas.setdefault(clave, {"id": id_})
+        return vistas
+
+    def _actualizar_resumen(self, conn, nuevas):
+        """
+        Suma las entradas nuevas del lote al resumen diario dentro de la
+        misma transacción: un UPSERT por clave (juego, tamaño, día) distinta.
+        """
+        acumulado = {}
+        for juego, entry in nuevas:
+            acumular_resumen(acumulado, juego, entry)
+        tabla = ResumenDiario.__table__
+        stmt = sqlite_insert(tabla)
+        nuevo = stmt.excluded
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[tabla.c.juego, tabla.c["tamaño"], tabla.c.dia],
+            set_={
+                "partidas": tabla.c.partidas + nuevo.partidas,
+                "completadas": tabla.c.completadas + nuevo.completadas,
+                "suma_valor": tabla.c.suma_valor + nuevo.suma_valor,
+                "suma_valor_completadas":
+                    tabla.c.suma_valor_completadas + nuevo.suma_valor_completadas,
+                # min() de SQLite devuelve NULL si algún argumento lo es
+                "mejor_valor": func.min(
+                    func.coalesce(tabla.c.mejor_valor, nuevo.mejor_valor),
+                    func.coalesce(nuevo.mejor_valor, tabla.c.mejor_valor),
+                ),
+            },
+        )
+        conn.execute(stmt, [
+            {"juego": juego, "tamaño": tamaño, "dia": date.fromisoformat(dia),
+             "partidas": v[0], "completadas": v[1], "suma_valor": v[2],
+             "suma_valor_completadas": v[3], "mejor_valor": v[4]}
+            for (juego, tamaño, dia), v in acumulado.items()
+        ])
+
+    def top(self, juego, limit=5):
+        comprobar_juego(juego)
+        tabla = MODELOS[juego].__table__
+        completado, orden = CRITERIOS[juego]
+        stmt = (
+            select(tabla)
+            .where(tabla.c[completado] == True)  # noqa: E712
+            .order_by(tabla.c[orden], tabla.c.id)
+            .limit(limit)
+        )
+        with self.engine.connect() as conn:
+            return [a_entrada(fila.id, juego, fila._mapping) for fila in conn.execute(stmt)]
+
+    def _filtro_ranking(self, juego, tamaño):
+        """(tabla, condiciones del ranking, columnas de orden (valor, id))."""
+        comprobar_juego(juego)
+        tabla = MODELOS[juego].__table__
+        completado, orden = CRITERIOS[juego]
+        condiciones = [tabla.c[completado] == True]  # noqa: E712
+        if tamaño is not None:
+            condiciones.append(tabla.c[columna_tamaño(juego)] == tamaño)
+        return tabla, condiciones, (tabla.c[orden], tabla.c.id)
+
+    def ranking(self, juego, limite=10, tamaño=None, despues=None):
+        # Con los índices (tamaño, completado, valor, id) y (completado,
+        # valor, id) cada página es una búsqueda en el índice más 'limite'
+        # filas, sea cual sea su profundidad
+        tabla, condiciones, clave = self._filtro_ranking(juego, tamaño)
+        if despues is not None:
+            condiciones.append(tuple_(*clave) > tuple_(*despues))
+        stmt = select(tabla).where(*condiciones).order_by(*clave).limit(limite)
+        with self.engine.connect() as conn:
+            return [a_entrada(fila.id, juego, fila._mapping) for fila in conn.execute(stmt)]
+
+    def resumen(self, juego, tamaño=None, desde=None, hasta=None, limite=1000):
+        comprobar_juego(juego)
+        tabla = ResumenDiario.__table__
+        condiciones = [tabla.c.juego == juego]
+        if tamaño is not None:
+            condiciones.append(tabla.c["tamaño"] == tamaño)
+        if desde is not None:
+            condiciones.append(tabla.c.dia >= date.fromisoformat(desde))
+        if hasta is not None:
+            condiciones.append(tabla.c.dia <= date.fromisoformat(hasta))
+        stmt = (
+            select(tabla).where(*condiciones)
+            .order_by(tabla.c.dia.desc(), tabla.c["tamaño"]).limit(limite)
+        )
+        with self.engine.connect() as conn:
+            return [
+                a_resumen(f.juego, f._mapping["tamaño"], f.dia.isoformat(),
+                          [f._mapping[c] for c in CAMPOS_RESUMEN])
+                for f in conn.execute(stmt)
+            ]
+
+    def posicion(self, juego, id_, tamaño=None):
+        tabla, condiciones, clave = self._filtro_ranking(juego, tamaño)
+        with self.engine.connect() as conn:
+            fila = conn.execute(
+                select(tabla).where(tabla.c.id == id_, *condiciones)
+            ).first()
+            if fila is None:
+                return None
+            # SQLite no guarda cuentas en los nodos del árbol: el COUNT
+            # recorre el índice hasta la clave (sólo el índice, sin la tabla)
+            delante = conn.execute(
+                select(func.count()).select_from(tabla)
+                .where(*condiciones, tuple_(*clave) < tuple_(fila._mapping[clave[0].name], id_))
+            ).scalar()
+        return delante + 1, a_entrada(fila.id, juego, fila._mapping)
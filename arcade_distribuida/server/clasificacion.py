@@ -0,0 +1,131 @@
+"""
+Caché en memoria de los mejores resultados (top-K) de cada juego.
+
+Se carga desde el almacén al arrancar y se actualiza en el propio escritor
+cada vez que se confirma un resultado, de modo que las consultas
+"solicitar_mejores" se responden sin tocar la base de datos. Además se guarda la
+respuesta JSON ya codificada: una lectura repetida cuesta un solo sendall.
+Cada top lleva un número de versión que sube con cada cambio; registrar()
+devuelve el cambio para difundirlo a los suscriptores (server/difusion.py).
+"""
+import bisect
+import json
+import threading
+from datetime import datetime
+from server.almacen import CRITERIOS
+from protocolo import binario
+
+SEPARATOR = "\n"
+
+
+class _TopJuego:
+    """Lista ordenada y acotada de los K mejores resultados de un juego."""
+
+    def __init__(self, k, columna_orden):
+        self.k = k
+        self.columna_orden = columna_orden
+        self.claves = []      # (valor, id) ordenadas ascendentemente
+        self.entradas = []    # diccionarios en el mismo orden que 'claves'
+        self.respuesta = None  # bytes de la respuesta JSON, None si hay que regenerarla
+        self.respuesta_binaria = None  # ídem con el protocolo binario
+        self.version = 0
+
+    def insertar(self, entry):
+        """
+        Inserta 'entry' si entra en el top-K. Devuelve None si el top no
+        cambió o el cambio: {"version", "posicion", "entra", "sale"}, donde
+        "sale" es el id del resultado que queda fuera del top (o None).
+        """
+        clave = (entry[self.columna_orden], entry["id"])
+        if len(self.claves) >= self.k and clave >= self.claves[-1]:
+            return None
+        pos = bisect.bisect_left(self.claves, clave)
+        # Idempotente: en modo multiproceso un resultado puede llegar dos
+        # veces (al cargar desde el almacén y por la difusión del escritor)
+        if pos < len(self.claves) and self.claves[pos] == clave:
+            return None
+        self.claves.insert(pos, clave)
+        self.entradas.insert(pos, entry)
+        sale = self.claves[self.k][1] if len(self.claves) > self.k else None
+        del self.claves[self.k:]
+        del self.entradas[self.k:]
+        self.respuesta = None
+        self.respuesta_binaria = None
+        self.version += 1
+        return {"version": self.version, "posicion": pos, "entra": entry, "sale": sale}
+
+
+class CacheClasificacion:
+    def __init__(self, k=5):
+        self.k = k
+        self._lock = threading.Lock()
+        self._tops = {
+            juego: _TopJuego(k, orden) for juego, (_, orden) in CRITERIOS.items()
+        }
+
+    def cargar(self, consultar):
+        """
+        Rellena la caché usando consultar(juego, limit) -> lista de diccionarios.
+        """
+        for juego, top in self._tops.items():
+            for entry in consultar(juego, self.k):
+                with self._lock:
+                    top.insertar(entry)
+
+    def registrar(self, juego, entry):
+        """
+        Actualiza el top del juego con un resultado recién confirmado.
+        Los resultados no completados se ignoran. Devuelve el cambio (ver
+        _TopJuego.insertar) o None si el top no cambió.
+        """
+        completado, _ = CRITERIOS[juego]
+        if not entry.get(completado):
+            return None
+        with self._lock:
+            return self._top(juego).insertar(entry)
+
+    def mejores(self, juego) -> list:
+        with self._lock:
+            return list(self._top(juego).entradas)
+
+    def instantanea(self, juego) -> tuple:
+        """(versión, entradas) del top del juego, leídos a la vez."""
+        with self._lock:
+            top = self._top(juego)
+            return top.version, list(top.entradas)
+
+    def respuesta(self, juego) -> bytes:
+        """
+        Respuesta JSON completa (terminada en separador) para solicitar_mejores.
+        El timestamp corresponde al momento en que se generó el contenido.
+        """
+        with self._lock:
+            top = self._top(juego)
+            if top.respuesta is None:
+                resp = {
+                    "acción": "confirmación",
+                    "status": "ok",
+                    "timestamp": datetime.utcnow().isoformat() + "Z",
+                    "mejores": top.entradas,
+                }
+                top.respuesta = (json.dumps(resp) + SEPARATOR).encode("utf-8")
+            return top.respuesta
+
+    def respuesta_binaria(self, juego) -> bytes:
+        """Como respuesta(), pero como trama del protocolo binario."""
+        with self._lock:
+            top = self._top(juego)
+            if top.respuesta_binaria is None:
+                top.respuesta_binaria = binario.codificar({
+                    "acción": "confirmación",
+                    "status": "ok",
+                    "timestamp": datetime.utcnow().isoformat() + "Z",
+                    "mejores": top.entradas,
+                })
+            return top.respuesta_binaria
+
+    def _top(self, juego) -> _TopJuego:
+        try:
+            return self._tops[juego]
+        except KeyError:
+            raise ValueError("Juego no reconocido")
@@ -0,0 +1,134 @@
+"""
+Parámetros de configuración del servidor.
+
+Cada valor tiene un defecto razonable y puede sobrescribirse con una
+variable de entorno ARCADE_<NOMBRE> (p. ej. ARCADE_PORT=6000).
+"""
+import os
+import socket
+
+
+def _env(nombre, defecto, tipo=str):
+    """
+    Lee ARCADE_<nombre> del entorno y lo convierte a 'tipo'.
+    Si no existe devuelve 'defecto'.
+    """
+    valor = os.environ.get(f"ARCADE_{nombre}")
+    if valor is None:
+        return defecto
+    if tipo is bool:
+        return valor.strip().lower() in ("1", "true", "si", "sí", "yes", "on")
+    return tipo(valor)
+
+
+# — Red —
+HOST = _env("HOST", "0.0.0.0")
+PORT = _env("PORT", 5000, int)
+
+# Modo de servidor: "asyncio" (bucle de eventos) o "hilos" (un hilo por conexión)
+MODO_SERVIDOR = _env("MODO", "asyncio")
+
+# Hilos del executor que ejecuta el trabajo bloqueante de SQLAlchemy en modo asyncio
+DB_WORKERS = _env("DB_WORKERS", 4, int)
+
+# — Límites de conexión —
+# Conexiones abiertas a la vez como máximo (0 = sin límite); las que pasan
+# del límite reciben un error 503 y se cierran al momento
+MAX_CONEXIONES = _env("MAX_CONEXIONES", 1000, int)
+# Segundos sin recibir nada (o sin poder enviar) antes de cerrar una conexión (0 = nunca)
+TIMEOUT_INACTIVIDAD = _env("TIMEOUT_INACTIVIDAD", 300.0, float)
+# Cola de conexiones pendientes de aceptar del socket de escucha (listen)
+BACKLOG = _env("BACKLOG", 128, int)
+# Bytes pendientes de enviar a un suscriptor (suscribir_mejores) a partir de
+# los cuales se le considera demasiado lento y se cierra su conexión
+MAX_BUFFER_SUSCRIPCION = _env("MAX_BUFFER_SUSCRIPCION", 1024 * 1024, int)
+
+# — Escritura por lotes (group commit) —
+# Máximo de filas confirmadas en un mismo commit
+LOTE_MAX = _env("LOTE_MAX", 64, int)
+# Espera máxima (ms) desde que llega la primera fila hasta confirmar el lote
+LOTE_LATENCIA_MS = _env("LOTE_LATENCIA_MS", 5.0, float)
+# Profundidad máxima de la cola de escritura
+COLA_MAX = _env("COLA_MAX", 10000, int)
+
+# — Almacenamiento —
+# Backend: "sqlite" (SQLite ajustado), "memoria" (tests y benchmarks)
+# o "log" (fichero de registro sólo-append, máximo ritmo de escritura)
+ALMACEN = _env("ALMACEN", "sqlite")
+
+# SQLite: URL de SQLAlchemy, tamaño del pool, mmap y eco de SQL (sólo depuración)
+DB_URL = _env("DB_URL", "sqlite:///resultados.db")
+DB_POOL = _env("DB_POOL", 8, int)
+DB_MMAP_MB = _env("DB_MMAP_MB", 256, int)
+DB_ECHO = _env("DB_ECHO", False, bool)
+
+# Log: ruta del fichero y si se hace fsync tras cada lote
+LOG_RUTA = _env("LOG_RUTA", "resultados.log")
+LOG_FSYNC = _env("LOG_FSYNC", True, bool)
+
+# Máximo de resultados aceptados en un único mensaje guardar_resultados
+RESULTADOS_POR_MENSAJE = _env("RESULTADOS_POR_MENSAJE", 1000, int)
+
+# Máximo de entradas por página de solicitar_ranking
+RANKING_MAX = _env("RANKING_MAX", 100, int)
+
+# Máximo de filas (juego, tamaño, día) devueltas por solicitar_resumen
+RESUMEN_MAX = _env("RESUMEN_MAX", 1000, int)
+
+# Tamaño máximo (bytes) de un mensaje recibido
+MAX_TRAMA = _env("MAX_TRAMA", 1024 * 1024, int)
+
+# — Modo multiproceso (server/multiproceso.py) —
+# Número de procesos trabajadores; por defecto uno por núcleo
+PROCESOS = _env("PROCESOS", os.cpu_count() or 1, int)
+# Cada trabajador abre su propio socket con SO_REUSEPORT (si el sistema lo
+# admite); si no, todos comparten el socket de escucha creado por el padre
+REUSEPORT = _env("REUSEPORT", hasattr(socket, "SO_REUSEPORT"), bool)
+# Segundos que se esperan a las conexiones abiertas en una parada ordenada
+GRACIA_PARADA = _env("GRACIA_PARADA", 5.0, float)
+# Política de reinicio: como mucho REINICIOS_MAX reinicios por trabajador
+# en REINICIOS_VENTANA segundos; si se supera, se para el servidor entero
+REINICIOS_MAX = _env("REINICIOS_MAX", 5, int)
+REINICIOS_VENTANA = _env("REINICIOS_VENTANA", 60.0, float)
+
+# — Retención del histórico (server/retencion.py) —
+# Antigüedad (días) a partir de la cual se borran los resultados que no están
+# en ningún top; 0 desactiva la tarea periódica del servidor (sólo sqlite)
+RETENCION_DIAS = _env("RETENCION_DIAS", 0, int)
+# Puestos que se conservan siempre por juego y tamaño
+RETENCION_TOP = _env("RETENCION_TOP", 100, int)
+# Filas por transacción de borrado y pausa (ms) entre transacciones, para
+# no retener el bloqueo de escritura de SQLite
+RETENCION_LOTE = _env("RETENCION_LOTE", 500, int)
+RETENCION_PAUSA_MS = _env("RETENCION_PAUSA_MS", 50.0, float)
+# Segundos entre dos pasadas de la tarea periódica
+RETENCION_INTERVALO = _env("RETENCION_INTERVALO", 6 * 3600.0, float)
+# Páginas devueltas al sistema en cada paso de incremental_vacuum
+RETENCION_VACUUM_PAGINAS = _env("RETENCION_VACUUM_PAGINAS", 1000, int)
+
+# — Percentiles (server/cuantiles.py) —
+# Parámetro k de los bocetos KLL (más k, más precisión y memoria)
+CUANTILES_K = _env("CUANTILES_K", 200, int)
+# Fichero donde se guardan los bocetos cada CUANTILES_INTERVALO segundos
+# (y al parar); se recargan al arrancar. 0 desactiva el guardado periódico
+CUANTILES_RUTA = _env("CUANTILES_RUTA", "cuantiles.json")
+CUANTILES_INTERVALO = _env("CUANTILES_INTERVALO", 60.0, float)
+
+# — Métricas (server/metricas.py) —
+# Histogramas de latencia por acción y juego; la acción "estadisticas" los devuelve
+METRICAS = _env("METRICAS", True, bool)
+# Fichero JSON donde se vuelcan periódicamente (cada METRICAS_INTERVALO
+# segundos; 0 desactiva el volcado)
+METRICAS_RUTA = _env("METRICAS_RUTA", "metricas.json")
+METRICAS_INTERVALO = _env("METRICAS_INTERVALO", 60.0, float)
+
+# — Registro (server/registro.py) —
+# Nivel mínimo (DEBUG, INFO, WARNING...) y fichero de destino ("" = salida estándar)
+REGISTRO_NIVEL = _env("REGISTRO_NIVEL", "INFO")
+REGISTRO_RUTA = _env("REGISTRO_RUTA", "")
+# Registros en espera como máximo; si la cola se llena se descartan
+REGISTRO_COLA = _env("REGISTRO_COLA", 10000, int)
+# Fracción de registros que se conservan por nivel, p. ej. "DEBUG=0.01"
+REGISTRO_MUESTREO = _env("REGISTRO_MUESTREO", "DEBUG=0.01")
+# Registro DEBUG de cada mensaje recibido y cada guardado (False = nunca)
+REGISTRO_MENSAJES = _env("REGISTRO_MENSAJES", True, bool)
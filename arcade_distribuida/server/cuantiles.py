@@ -0,0 +1,191 @@
+"""
+Bocetos de cuantiles (KLL) de intentos/movimientos por juego y tamaño.
+
+Cada par (juego, tamaño) mantiene un boceto KLL de los valores de las
+partidas completadas: ocupa O(k · log n) valores, se actualiza en O(1)
+amortizado y responde "¿qué fracción de resultados es menor que x?" con un
+error de rango de ~1,7/k sin mirar la base de datos. Los bocetos se pueden
+fusionar, así que procesos distintos podrían combinarlos.
+
+El servidor los actualiza con cada resultado confirmado (junto a la caché
+del top), los guarda periódicamente en un fichero JSON y los recarga al
+arrancar; lo guardado después del último volcado se pierde en una caída,
+lo que sólo resta precisión a la estimación. Con los bocetos se guarda el id
+del último resultado contado de cada juego: los ids crecen en el orden en
+que se confirman, así que un resultado que vuelva a llegar tras recargar
+(en modo multiproceso, los difundidos que esperaban en la cola de un
+trabajador reiniciado) no se cuenta dos veces.
+"""
+import json
+import os
+import random
+import threading
+
+from server.almacen import CRITERIOS, TAMAÑOS
+
+
+class KLL:
+    """Boceto KLL (Karnin, Lang y Liberty, 2016) de valores comparables."""
+
+    def __init__(self, k=200, c=2 / 3, semilla=None):
+        self.k = k
+        self.c = c
+        self.n = 0
+        self.compactores = [[]]
+        self._tamaño = 0
+        self._max_tamaño = self._capacidad(0)
+        self._azar = random.Random(semilla)
+
+    def _capacidad(self, nivel) -> int:
+        altura = len(self.compactores)
+        return int(self.k * self.c ** (altura - nivel - 1)) + 2
+
+    def _crecer(self):
+        self.compactores.append([])
+        self._max_tamaño = sum(self._capacidad(h) for h in range(len(self.compactores)))
+
+    def actualizar(self, valor):
+        self.compactores[0].append(valor)
+        self.n += 1
+        self._tamaño += 1
+        if self._tamaño >= self._max_tamaño:
+            self._comprimir()
+
+    def _comprimir(self):
+        for nivel in range(len(self.compactores)):
+            compactor = self.compactores[nivel]
+            if len(compactor) < self._capacidad(nivel):
+                continue
+            if nivel + 1 >= len(self.compactores):
+                self._crecer()
+            # Ordena, sube al nivel siguiente (peso doble) la mitad de los
+            # elementos empezando por uno al azar y descarta la otra mitad
+            compactor.sort()
+            resto = [compactor.pop()] if len(compactor) % 2 else []
+            self.compactores[nivel + 1].extend(compactor[self._azar.randint(0, 1)::2])
+            compactor[:] = resto
+            self._tamaño = sum(len(comp) for comp in self.compactores)
+            if self._tamaño < self._max_tamaño:
+                break
+
+    def fusionar(self, otro: "KLL"):
+        while len(self.compactores) < len(otro.compactores):
+            self._crecer()
+        for nivel, compactor in enumerate(otro.compactores):
+            self.compactores[nivel].extend(compactor)
+        self.n += otro.n
+        self._tamaño = sum(len(comp) for comp in self.compactores)
+        while self._tamaño >= self._max_tamaño:
+            self._comprimir()
+
+    def rango(self, valor) -> int:
+        """Número estimado de valores estrictamente menores que 'valor'."""
+        return sum(
+            sum(1 for v in compactor if v < valor) << nivel
+            for nivel, compactor in enumerate(self.compactores)
+        )
+
+    def cuantil(self, q):
+        """Valor estimado en la fracción 'q' (0..1) de la distribución."""
+        pesados = sorted(
+            (v, 1 << nivel) for nivel, compactor in enumerate(self.compactores) for v in compactor
+        )
+        if not pesados:
+            return None
+        objetivo = q * sum(peso for _, peso in pesados)
+        acumulado = 0
+        for v, peso in pesados:
+            acumulado += peso
+            if acumulado >= objetivo:
+                return v
+        return pesados[-1][0]
+
+    def a_dict(self) -> dict:
+        return {"k": self.k, "c": self.c, "n": self.n,
+                "compactores": [list(comp) for comp in self.compactores]}
+
+    @classmethod
+    def desde_dict(cls, datos: dict) -> "KLL":
+        boceto = cls(k=datos["k"], c=datos.get("c", 2 / 3))
+        boceto.compactores = [list(comp) for comp in datos["compactores"]] or [[]]
+        boceto.n = datos["n"]
+        boceto._tamaño = sum(len(comp) for comp in boceto.compactores)
+        boceto._max_tamaño = sum(boceto._capacidad(h) for h in range(len(boceto.compactores)))
+        return boceto
+
+
+class Cuantiles:
+    """Bocetos KLL por (juego, tamaño) de las partidas completadas."""
+
+    def __init__(self, k=200):
+        self.k = k
+        self._lock = threading.Lock()
+        self._bocetos = {}  # (juego, tamaño) -> KLL
+        self._ultimos = {}  # juego -> id del último resultado contado
+
+    @staticmethod
+    def _clave(juego, entry) -> tuple:
+        columna = TAMAÑOS[juego]
+        return juego, entry[columna] if columna else 0
+
+    def registrar(self, juego, entry):
+        """Añade un resultado confirmado (los no completados se ignoran)."""
+        completado, orden = CRITERIOS[juego]
+        if not entry.get(completado):
+            return
+        clave = self._clave(juego, entry)
+        with self._lock:
+            id_ = entry.get("id")
+            if id_ is not None:
+                if id_ <= self._ultimos.get(juego, 0):
+                    return
+                self._ultimos[juego] = id_
+            boceto = self._bocetos.get(clave)
+            if boceto is None:
+                boceto = self._bocetos[clave] = KLL(self.k)
+            boceto.actualizar(entry[orden])
+
+    def percentil(self, juego, entry):
+        """
+        Porcentaje (0-100) de las demás partidas completadas del mismo juego
+        y tamaño que este resultado iguala o mejora (menos intentos/movimientos
+        es mejor). El resultado ya está en el boceto (se registra al
+        confirmarse, antes de responder) y no se compara consigo mismo: no
+        cuenta en el total, y en rango() no cuenta porque no es menor que él.
+        None si no está completado o es la primera partida de su tamaño.
+        """
+        completado, orden = CRITERIOS[juego]
+        if not entry.get(completado):
+            return None
+        with self._lock:
+            boceto = self._bocetos.get(self._clave(juego, entry))
+            if boceto is None or boceto.n < 2:
+                return None
+            mejores = boceto.rango(entry[orden])
+            total = boceto.n - 1
+        return round(100 * (1 - min(mejores, total) / total), 1)
+
+    def a_dict(self) -> dict:
+        with self._lock:
+            return {
+                "bocetos": {
+                    f"{juego}:{tamaño}": boceto.a_dict()
+                    for (juego, tamaño), boceto in self._bocetos.items()
+                },
+                "ultimos": dict(self._ultimos),
+            }
+
+    def cargar(self, ruta) -> int:
+        """Carga los bocetos guardados en 'ruta' (si existe). Devuelve cuántos."""
+        if not os.path.exists(ruta):
+            return 0
+        with open(ruta, encoding="utf-8") as f:
+            datos = json.load(f)
+        bocetos = {}
+        for clave, boceto in datos.get("bocetos", {}).items():
+            juego, _, tamaño = clave.partition(":")
+            bocetos[(juego, int(tamaño))] = KLL.desde_dict(boceto)
+        with self._lock:
+            self._bocetos = bocetos
+            self._ultimos = dict(datos.get("ultimos", {}))
+        return len(bocetos)
@@ -1,8 +1,40 @@
-from sqlalchemy import create_engine
+import logging
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
+from server.config import DB_URL, DB_POOL, DB_MMAP_MB, DB_ECHO
 
-# Motor SQLite. El archivo de base de datos se llamará resultados.db en la raíz del proyecto.
-engine = create_engine('sqlite:///resultados.db', echo=True)
+# Motor SQLite. Por defecto el archivo de base de datos se llamará resultados.db
+# en la raíz del proyecto (configurable con ARCADE_DB_URL).
+engine = create_engine(
+    DB_URL,
+    pool_size=DB_POOL,
+    max_overflow=DB_POOL,
+    connect_args={"check_same_thread": False} if DB_URL.startswith("sqlite") else {},
+)
+
+# El SQL (sólo depuración) pasa por el registro asíncrono (server/registro.py)
+# en lugar de usar echo=True, que escribe en stdout desde el hilo de la consulta
+if DB_ECHO:
+    logging.getLogger("sqlalchemy.engine").setLevel(logging.INFO)
+
+@event.listens_for(engine, "connect")
+def _ajustar_sqlite(dbapi_conn, _registro):
+    """
+    Ajustes de cada conexión SQLite: WAL para que las lecturas no bloqueen
+    al escritor, synchronous=NORMAL (seguro con WAL, un fsync por checkpoint
+    en lugar de por commit) y mmap para las lecturas. auto_vacuum sólo
+    surte efecto en bases de datos nuevas (y debe ir antes que el WAL): deja
+    que server/retencion.py devuelva el espacio libre por tramos.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    cur = dbapi_conn.cursor()
+    cur.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    cur.execute("PRAGMA journal_mode=WAL")
+    cur.execute("PRAGMA synchronous=NORMAL")
+    cur.execute(f"PRAGMA mmap_size={DB_MMAP_MB * 1024 * 1024}")
+    cur.execute("PRAGMA busy_timeout=5000")
+    cur.close()
 
 # Fábrica de sesiones
 Session = sessionmaker(bind=engine)
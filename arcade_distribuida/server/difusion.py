@@ -0,0 +1,84 @@
+"""
+Difusión de los cambios del top a los clientes suscritos (suscribir_mejores).
+
+Un suscriptor es cualquier callable que recibe los bytes ya codificados de
+cada actualización. Cada publicación se codifica una sola vez por protocolo
+(JSON y, si hay suscriptores binarios, binario) y esos mismos bytes se
+entregan a todos: el coste de codificar no crece con los suscriptores.
+
+publicar() se llama desde el hilo del escritor (o el receptor en modo
+multiproceso); los suscriptores asociados a un bucle asyncio se invocan con
+loop.call_soon_threadsafe, así que un StreamWriter sólo se toca desde su
+propio bucle.
+"""
+import itertools
+import json
+import logging
+import threading
+
+from protocolo import binario
+
+log = logging.getLogger("arcade.difusion")
+
+SEPARATOR = "\n"
+
+
+class Difusor:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        # juego -> {ficha: (suscriptor, binaria, loop)}
+        self._suscriptores = {}
+
+    def suscribir(self, juego, suscriptor, binaria=False, loop=None) -> tuple:
+        """
+        Da de alta 'suscriptor' para las actualizaciones de 'juego'.
+        Devuelve la ficha con la que se cancela.
+        """
+        ficha = (juego, next(self._ids))
+        with self._lock:
+            self._suscriptores.setdefault(juego, {})[ficha] = (suscriptor, binaria, loop)
+        return ficha
+
+    def cancelar(self, ficha):
+        juego, _ = ficha
+        with self._lock:
+            suscriptores = self._suscriptores.get(juego)
+            if suscriptores is not None:
+                suscriptores.pop(ficha, None)
+                if not suscriptores:
+                    del self._suscriptores[juego]
+
+    def hay_suscriptores(self, juego) -> bool:
+        return juego in self._suscriptores
+
+    def total(self) -> int:
+        with self._lock:
+            return sum(len(s) for s in self._suscriptores.values())
+
+    def publicar(self, juego, mensaje: dict) -> int:
+        """Codifica 'mensaje' una vez y lo entrega a los suscriptores de 'juego'."""
+        with self._lock:
+            suscriptores = list(self._suscriptores.get(juego, {}).items())
+        if not suscriptores:
+            return 0
+        codificado = {}
+        for ficha, (suscriptor, binaria, loop) in suscriptores:
+            datos = codificado.get(binaria)
+            if datos is None:
+                if binaria:
+                    datos = binario.codificar(mensaje)
+                else:
+                    datos = (json.dumps(mensaje) + SEPARATOR).encode("utf-8")
+                codificado[binaria] = datos
+            try:
+                if loop is not None:
+                    loop.call_soon_threadsafe(suscriptor, datos)
+                else:
+                    suscriptor(datos)
+            except Exception:
+                # Bucle ya cerrado o suscriptor roto: se da de baja
+                log.exception("Error al entregar una actualización; se cancela la suscripción",
+                              extra={"datos": {"juego": juego}})
+                self.cancelar(ficha)
+        return len(suscriptores)
@@ -0,0 +1,160 @@
+"""
+Escritor por lotes (group commit) para los resultados de partidas.
+
+En lugar de abrir una transacción por cada resultado, los hilos que
+atienden conexiones encolan la fila y un único hilo escritor las agrupa y
+las guarda juntas en el almacén, con un solo commit (y fsync) por lote.
+El lote se vacía cuando alcanza 'tam_lote' filas o cuando el primer
+elemento lleva 'latencia_max' segundos esperando, lo que ocurra antes.
+Cada llamador recibe un Future que se resuelve tras el commit de su fila.
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+log = logging.getLogger("arcade.escritor")
+
+_FIN = object()
+
+
+class EscritorPorLotes:
+    def __init__(self, almacen, tam_lote=64, latencia_max=0.005, max_cola=10000,
+                 al_confirmar=None):
+        """
+        :param almacen: backend (server.almacen.Almacen) donde se guardan los lotes.
+        :param tam_lote: máximo de filas por commit (los grupos de encolar_lote
+            nunca se parten, aunque lo superen).
+        :param latencia_max: segundos máximos que espera un lote antes de confirmarse.
+        :param max_cola: profundidad máxima de la cola; encolar bloquea si se llena.
+        :param al_confirmar: callback([(fila, entrada)]) invocado tras cada
+            commit y antes de resolver los Future, para que quien recibe la
+            confirmación ya vea su fila en las estructuras derivadas (p. ej.
+            la caché del top).
+        """
+        self._almacen = almacen
+        self._al_confirmar = al_confirmar
+        self.tam_lote = tam_lote
+        self.latencia_max = latencia_max
+        self.max_cola = max_cola
+        self._cola = queue.Queue(maxsize=max_cola)
+        self._hilo = None
+        # Contadores para ajustar los parámetros
+        self._lotes = 0
+        self._filas = 0
+        self._errores = 0
+
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self._bucle, name="escritor-lotes", daemon=True)
+        self._hilo.start()
+
+    def detener(self, timeout=None):
+        """Vacía lo pendiente y termina el hilo escritor."""
+        if self._hilo is None:
+            return
+        self._cola.put(_FIN)
+        self._hilo.join(timeout)
+        self._hilo = None
+
+    def encolar(self, fila, bloquear=True) -> Future:
+        """
+        Encola una fila (juego, columnas) para guardarla.
+        Devuelve un Future que se resuelve con la entrada ya confirmada
+        (con su id) o con la excepción producida al guardarla.
+        Con bloquear=False lanza queue.Full si la cola está llena.
+        """
+        fut = Future()
+        self._cola.put(([fila], fut, True), block=bloquear)
+        return fut
+
+    def encolar_lote(self, filas, bloquear=True) -> Future:
+        """
+        Encola varias filas que se guardan juntas y de forma atómica
+        (siempre en el mismo commit). El Future se resuelve con la lista
+        de entradas confirmadas, en el mismo orden.
+        """
+        fut = Future()
+        self._cola.put((list(filas), fut, False), block=bloquear)
+        return fut
+
+    def guardar(self, fila):
+        """Versión bloqueante de encolar(): espera al commit de la fila."""
+        return self.encolar(fila).result()
+
+    def guardar_lote(self, filas):
+        """Versión bloqueante de encolar_lote()."""
+        return self.encolar_lote(filas).result()
+
+    def estadisticas(self) -> dict:
+        return {
+            "profundidad_cola": self._cola.qsize(),
+            "max_cola": self.max_cola,
+            "tam_lote": self.tam_lote,
+            "latencia_max_ms": self.latencia_max * 1000,
+            "lotes": self._lotes,
+            "filas": self._filas,
+            "filas_por_lote": (self._filas / self._lotes) if self._lotes else 0.0,
+            "errores": self._errores,
+        }
+
+    def _bucle(self):
+        terminar = False
+        while not terminar:
+            primero = self._cola.get()
+            if primero is _FIN:
+                break
+            lote = [primero]
+            num_filas = len(primero[0])
+            limite = time.monotonic() + self.latencia_max
+            while num_filas < self.tam_lote:
+                restante = limite - time.monotonic()
+                try:
+                    item = self._cola.get(timeout=restante) if restante > 0 else self._cola.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _FIN:
+                    terminar = True
+                    break
+                lote.append(item)
+                num_filas += len(item[0])
+            self._confirmar(lote)
+
+    def _confirmar(self, lote):
+        filas = [fila for grupo, _, _ in lote for fila in grupo]
+        try:
+            entradas = self._almacen.guardar_lote(filas)
+        except Exception:
+            # Reintenta grupo a grupo para que un registro inválido no tumbe al resto
+            self._confirmar_individual(lote)
+            return
+        self._lotes += 1
+        self._filas += len(filas)
+        self._notificar(list(zip(filas, entradas)))
+        pos = 0
+        for grupo, fut, unica in lote:
+            propias = entradas[pos:pos + len(grupo)]
+            pos += len(grupo)
+            fut.set_result(propias[0] if unica else propias)
+
+    def _confirmar_individual(self, lote):
+        for grupo, fut, unica in lote:
+            try:
+                entradas = self._almacen.guardar_lote(grupo)
+            except Exception as e:
+                self._errores += 1
+                fut.set_exception(e)
+            else:
+                self._lotes += 1
+                self._filas += len(grupo)
+                self._notificar(list(zip(grupo, entradas)))
+                fut.set_result(entradas[0] if unica else entradas)
+
+    def _notificar(self, guardadas):
+        if self._al_confirmar is None:
+            return
+        try:
+            self._al_confirmar(guardadas)
+        except Exception:
+            # Un fallo en la caché no debe impedir confirmar lo ya guardado
+            log.exception("Error en al_confirmar")
@@ -1,138 +1,737 @@
+import argparse
+import asyncio
 import socket
 import threading
 import json
-from server.db import init_db, Session
-from server.models import ResultadoNReinas, ResultadoKnightTour, ResultadoHanoi
-from datetime import datetime
+import logging
+import queue
+import os
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+from server.almacen import crear_almacen, crear_fila, CRITERIOS, JUEGOS, TAMAÑOS
+from server.escritor import EscritorPorLotes
+from server.clasificacion import CacheClasificacion
+from server.metricas import Metricas, VolcadoPeriodico
+from server.cuantiles import Cuantiles
+from server.difusion import Difusor
+from server import registro
+from protocolo.framing import LectorTramas, TramaDemasiadoGrande
+from protocolo import binario, TOP_MEJORES
+from server.config import (
+    HOST, PORT, MODO_SERVIDOR, DB_WORKERS, LOTE_MAX, LOTE_LATENCIA_MS, COLA_MAX,
+    RESULTADOS_POR_MENSAJE, RANKING_MAX, RESUMEN_MAX, MAX_TRAMA, GRACIA_PARADA, METRICAS, METRICAS_RUTA,
+    METRICAS_INTERVALO, CUANTILES_K, CUANTILES_RUTA, CUANTILES_INTERVALO, RETENCION_DIAS, MAX_CONEXIONES,
+    TIMEOUT_INACTIVIDAD, BACKLOG, MAX_BUFFER_SUSCRIPCION
+)
+from datetime import date, datetime
+
+log = logging.getLogger("arcade.servidor")
 
-HOST = "0.0.0.0"
-PORT = 5000
-BUFFER_SIZE = 4096
 SEPARATOR = "\n"
+# Bytes pedidos en cada lectura del modo asyncio. Las peticiones encadenadas
+# de una conexión se atienden en orden y no se vuelve a leer hasta haber
+# respondido (y drenado) las de la lectura anterior: lo que un cliente tenga
+# en vuelo espera en el buffer del socket y TCP frena al que envía de más
+MAX_LECTURA = 4096
+
+# Executor acotado para el trabajo bloqueante (SQLAlchemy) en modo asyncio
+_db_executor = None
+# Backend de almacenamiento (server/almacen), elegido al arrancar
+almacen = None
+# Hilo escritor que agrupa los resultados en commits por lotes
+escritor = None
+# Top-K de cada juego en memoria; responde solicitar_mejores sin tocar la BD
+clasificacion = CacheClasificacion(k=TOP_MEJORES)
+# Tareas de las conexiones abiertas en modo asyncio (para la parada ordenada)
+_conexiones_activas = set()
+# Latencias por fase, acción y juego; se consultan con la acción "estadisticas"
+metricas = Metricas(activas=METRICAS)
+_volcado_metricas = None
+# Bocetos de cuantiles por juego y tamaño: percentil de cada resultado guardado
+cuantiles = Cuantiles(k=CUANTILES_K)
+_volcado_cuantiles = None
+# Borrado periódico del histórico antiguo (server/retencion.py, sólo sqlite)
+_retencion = None
+# Conexiones suscritas a los cambios del top (suscribir_mejores, sólo asyncio)
+difusor = Difusor()
+
+# Acciones conocidas: el resto se agrupa en las métricas como "desconocida"
+ACCIONES = ("guardar_resultado", "guardar_resultados", "solicitar_mejores",
+            "solicitar_ranking", "solicitar_resumen", "estadisticas", "suscribir_mejores")
+
+class ServidorSaturado(RuntimeError):
+    """Sobrecarga: se responde con 503 en lugar de encolar más trabajo."""
+
+def etiquetas(msg: dict) -> tuple:
+    """(acción, juego) con los que se agrupan las métricas de un mensaje."""
+    acción = msg.get("acción")
+    juego = msg.get("juego")
+    return (acción if acción in ACCIONES else "desconocida",
+            juego if juego in JUEGOS else None)
+
+def procesar_mensaje(msg: dict) -> dict:
+    """
+    Ejecuta la acción pedida en 'msg' y devuelve el diccionario de respuesta.
+    Las excepciones se propagan para que el llamador responda con error 500.
+    """
+    acción = msg.get("acción")
+
+    if acción == "guardar_resultado":
+        return confirmacion_guardado(msg["juego"], salvar_resultado(msg))
+
+    if acción == "guardar_resultados":
+        filas, estados = validar_resultados(msg)
+        entradas = []
+        if filas:
+            inicio = time.perf_counter()
+            entradas = escritor.guardar_lote([fila for _, fila in filas])
+            metricas.observar("bd", acción, None, time.perf_counter() - inicio)
+        return respuesta_lote(filas, entradas, estados)
+
+    if acción == "solicitar_mejores":
+        top = clasificacion.mejores(msg["juego"])
+        return {
+            "acción": "confirmación",
+            "status": "ok",
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "mejores": top
+        }
+
+    if acción == "solicitar_ranking":
+        return consultar_ranking(msg)
+
+    if acción == "solicitar_resumen":
+        return consultar_resumen(msg)
+
+    if acción == "suscribir_mejores":
+        # Necesita empujar datos por la conexión sin que el cliente pregunte
+        raise ValueError("suscribir_mejores sólo está disponible en el modo asyncio")
+
+    if acción == "estadisticas":
+        return {
+            "acción": "confirmación",
+            "status": "ok",
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "estadisticas": estadisticas()
+        }
+
+    return {
+        "acción": "error",
+        "error": {"code":400, "mensaje":"Acción desconocida"},
+        "timestamp": datetime.utcnow().isoformat() + "Z"
+    }
+
+def estadisticas() -> dict:
+    """Métricas del proceso más el estado del escritor por lotes."""
+    datos = metricas.instantanea()
+    datos["almacen"] = almacen.nombre if almacen is not None else None
+    datos["escritor"] = escritor.estadisticas() if escritor is not None else None
+    datos["registros_descartados"] = registro.descartados()
+    datos["suscriptores"] = difusor.total()
+    return datos
+
+def confirmacion_guardado(juego: str, entry: dict) -> dict:
+    """
+    Respuesta de guardar_resultado. Si la partida está completada incluye
+    "percentil": porcentaje de partidas completadas del mismo juego y tamaño
+    que este resultado iguala o mejora (estimado con el boceto KLL), y
+    "repetido": True si su clave de idempotencia ya se había guardado.
+    """
+    resp = {
+        "acción": "confirmación",
+        "status": "ok",
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "mensaje": "Resultado guardado"
+    }
+    if entry.get("repetido"):
+        resp["mensaje"] = "Resultado ya guardado"
+        resp["repetido"] = True
+    percentil = cuantiles.percentil(juego, entry)
+    if percentil is not None:
+        resp["percentil"] = percentil
+    return resp
 
-def handle_client(conn, addr):
-    print(f"[+] Conexión entrante de {addr}")
-    buffer = ""
-    while True:
-        data = conn.recv(BUFFER_SIZE).decode("utf-8")
-        if not data:
-            break
-        buffer += data
-        while SEPARATOR in buffer:
-            line, buffer = buffer.split(SEPARATOR, 1)
+def codificar(resp: dict) -> bytes:
+    return (json.dumps(resp) + SEPARATOR).encode("utf-8")
+
+def codificar_medido(resp: dict, acción, juego, codificador=codificar) -> bytes:
+    inicio = time.perf_counter()
+    data = codificador(resp)
+    metricas.observar("codificar", acción, juego, time.perf_counter() - inicio)
+    return data
+
+def con_id(resp: dict, msg) -> dict:
+    """
+    Copia en la respuesta el "id_peticion" del mensaje, si lo trae, para que
+    un cliente con varias peticiones en vuelo sepa a cuál corresponde.
+    """
+    if msg is not None and "id_peticion" in msg:
+        resp["id_peticion"] = msg["id_peticion"]
+    return resp
+
+def responder(msg: dict, binaria: bool = False) -> bytes:
+    """
+    Devuelve la respuesta ya codificada. solicitar_mejores se sirve con los
+    bytes precalculados de la caché (salvo si lleva id_peticion, que hay que
+    devolver); el resto pasa por procesar_mensaje.
+    """
+    if msg.get("acción") == "solicitar_mejores" and "id_peticion" not in msg:
+        if binaria:
+            return clasificacion.respuesta_binaria(msg["juego"])
+        return clasificacion.respuesta(msg["juego"])
+    return codificar_medido(con_id(procesar_mensaje(msg), msg), *etiquetas(msg),
+                            binario.codificar if binaria else codificar)
+
+def respuesta_error(e: Exception, code: int = 500) -> dict:
+    return {
+        "acción": "error",
+        "error": {"code":code, "mensaje": str(e)},
+        "timestamp": datetime.utcnow().isoformat() + "Z"
+    }
+
+def codigo_error(e: Exception) -> int:
+    return 503 if isinstance(e, ServidorSaturado) else 500
+
+def respuesta_saturado(motivo: str, mensaje: str, codificador=codificar) -> bytes:
+    """Respuesta 503 ya codificada; cuenta el rechazo en rechazos.<motivo>."""
+    metricas.incrementar(f"rechazos.{motivo}")
+    return codificador(respuesta_error(ServidorSaturado(mensaje), code=503))
+
+def rechazar_conexion(conn):
+    """Responde 503 a una conexión que supera MAX_CONEXIONES y la cierra sin esperar."""
+    try:
+        conn.setblocking(False)
+        conn.send(respuesta_saturado("conexiones", "Demasiadas conexiones"))
+    except OSError:
+        pass
+    finally:
+        conn.close()
+
+def decodificar_trama(trama: bytes, binaria: bool) -> tuple:
+    """Decodifica una trama y registra el tiempo. Devuelve (msg, acción, juego)."""
+    inicio = time.perf_counter()
+    msg = binario.decodificar(trama) if binaria else json.loads(trama)
+    acción, juego = etiquetas(msg)
+    metricas.observar("decodificar", acción, juego, time.perf_counter() - inicio)
+    if registro.mensajes_activos(log):
+        log.debug("Mensaje recibido", extra={"datos": {"msg": msg, "binario": binaria}})
+    return msg, acción, juego
+
+def procesar_trama(trama: bytes, binaria: bool = False) -> bytes:
+    """Decodifica una trama completa y devuelve la respuesta codificada."""
+    inicio = time.perf_counter()
+    msg, acción, juego = None, "invalida", None
+    try:
+        msg, acción, juego = decodificar_trama(trama, binaria)
+        data = responder(msg, binaria)
+    except Exception as e:
+        metricas.incrementar(f"errores.{acción}")
+        data = (binario.codificar if binaria else codificar)(
+            con_id(respuesta_error(e, codigo_error(e)), msg))
+    metricas.observar("total", acción, juego, time.perf_counter() - inicio)
+    return data
+
+def procesar_trama_binaria(trama: bytes) -> bytes:
+    """Igual que procesar_trama, para conexiones con protocolo binario."""
+    return procesar_trama(trama, binaria=True)
+
+def handle_client(conn, addr, plazas=None):
+    """
+    Atiende una conexión en modo hilos. 'plazas' es el semáforo de
+    MAX_CONEXIONES que el bucle de accept adquirió para ella.
+    """
+    log.debug("Conexión entrante", extra={"datos": {"addr": addr}})
+    metricas.conexion_abierta()
+    codificar_resp = codificar
+    if TIMEOUT_INACTIVIDAD > 0:
+        conn.settimeout(TIMEOUT_INACTIVIDAD)
+    try:
+        # El primer byte decide el protocolo de toda la conexión (sin consumirlo)
+        if binario.es_binario(conn.recv(1, socket.MSG_PEEK)):
+            lector = binario.LectorBinario(max_trama=MAX_TRAMA)
+            procesar, codificar_resp = procesar_trama_binaria, binario.codificar
+        else:
+            lector = LectorTramas(max_trama=MAX_TRAMA)
+            procesar = procesar_trama
+        while True:
+            tramas = lector.leer_de(conn)
+            if tramas is None:
+                break
+            for trama in tramas:
+                conn.sendall(procesar(trama))
+    except TramaDemasiadoGrande as e:
+        conn.sendall(codificar_resp(respuesta_error(e, code=413)))
+    except ValueError as e:
+        # Cabecera de trama binaria corrupta
+        conn.sendall(codificar_resp(respuesta_error(e, code=400)))
+    except socket.timeout:
+        metricas.incrementar("cierres.inactividad")
+    except ConnectionError:
+        pass
+    finally:
+        metricas.conexion_cerrada()
+        conn.close()
+        if plazas is not None:
+            plazas.release()
+        log.debug("Conexión cerrada", extra={"datos": {"addr": addr}})
+
+async def procesar_mensaje_async(msg: dict) -> dict:
+    """
+    Versión asyncio de procesar_mensaje. Los guardados se esperan sobre el
+    Future del escritor sin ocupar un hilo del executor y el top se lee de
+    la caché en el propio bucle; el resto de acciones bloqueantes se
+    ejecutan en el executor acotado.
+    """
+    acción = msg.get("acción")
+    if acción == "solicitar_mejores":
+        return {
+            "acción": "confirmación",
+            "status": "ok",
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "mejores": clasificacion.mejores(msg["juego"])
+        }
+    if acción == "guardar_resultado":
+        # Sin bloquear el bucle: si la cola está llena se responde con error
+        try:
+            fila = crear_resultado(msg)
+            inicio = time.perf_counter()
+            fut = escritor.encolar(fila, bloquear=False)
+        except queue.Full:
+            raise ServidorSaturado("Cola de escritura llena")
+        entry = await asyncio.wrap_future(fut)
+        metricas.observar("bd", acción, fila[0], time.perf_counter() - inicio)
+        return confirmacion_guardado(fila[0], entry)
+    if acción == "guardar_resultados":
+        filas, estados = validar_resultados(msg)
+        entradas = []
+        if filas:
+            inicio = time.perf_counter()
             try:
-                msg = json.loads(line)
-                print(f"[DEBUG] Mensaje recibido: {msg}")
-                acción = msg.get("acción")
-                
-                if acción == "guardar_resultado":
-                    salvar_resultado(msg)
-                    resp = {
-                        "acción": "confirmación",
-                        "status": "ok",
-                        "timestamp": datetime.utcnow().isoformat() + "Z",
-                        "mensaje": "Resultado guardado"
-                    }
-
-                elif acción == "solicitar_mejores":
-                    top = consultar_top(msg["juego"])
-                    resp = {
-                        "acción": "confirmación",
-                        "status": "ok",
-                        "timestamp": datetime.utcnow().isoformat() + "Z",
-                        "mejores": top
-                    }
+                fut = escritor.encolar_lote([fila for _, fila in filas], bloquear=False)
+            except queue.Full:
+                raise ServidorSaturado("Cola de escritura llena")
+            entradas = await asyncio.wrap_future(fut)
+            metricas.observar("bd", acción, None, time.perf_counter() - inicio)
+        return respuesta_lote(filas, entradas, estados)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_db_executor, procesar_mensaje, msg)
+
+async def procesar_trama_async(trama: bytes, binaria: bool, suscribir=None) -> bytes:
+    """
+    Versión asyncio de procesar_trama: el top sale de los bytes de la caché.
+    'suscribir' (de handle_client_async) atiende suscribir_mejores.
+    """
+    inicio = time.perf_counter()
+    msg, acción, juego = None, "invalida", None
+    codificador = binario.codificar if binaria else codificar
+    try:
+        msg, acción, juego = decodificar_trama(trama, binaria)
+        if acción == "suscribir_mejores" and suscribir is not None:
+            # Sin await: la instantánea se escribe antes que cualquier
+            # actualización, que llega por call_soon_threadsafe
+            data = codificar_medido(con_id(suscribir(msg), msg), acción, juego, codificador)
+        elif acción == "solicitar_mejores" and "id_peticion" not in msg:
+            if binaria:
+                data = clasificacion.respuesta_binaria(msg["juego"])
+            else:
+                data = clasificacion.respuesta(msg["juego"])
+        else:
+            data = codificar_medido(con_id(await procesar_mensaje_async(msg), msg),
+                                    acción, juego, codificador)
+    except Exception as e:
+        metricas.incrementar(f"errores.{acción}")
+        data = codificador(con_id(respuesta_error(e, codigo_error(e)), msg))
+    metricas.observar("total", acción, juego, time.perf_counter() - inicio)
+    return data
+
+async def drenar(writer: asyncio.StreamWriter, espera):
+    """
+    writer.drain() con plazo: un cliente que no lee sus respuestas cuenta
+    como inactivo. Si el búfer de salida está vacío no hay nada que esperar.
+    """
+    if writer.transport.get_write_buffer_size():
+        await asyncio.wait_for(writer.drain(), espera)
 
+async def handle_client_async(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """
+    Equivalente a handle_client para el modo asyncio: mismos protocolos
+    (JSON delimitado por '\\n' o binario), pero el trabajo de base de datos
+    se delega en el executor acotado para no bloquear el bucle de eventos.
+    """
+    addr = writer.get_extra_info("peername")
+    if MAX_CONEXIONES > 0 and len(_conexiones_activas) >= MAX_CONEXIONES:
+        writer.write(respuesta_saturado("conexiones", "Demasiadas conexiones"))
+        writer.close()
+        return
+    log.debug("Conexión entrante", extra={"datos": {"addr": addr}})
+    tarea = asyncio.current_task()
+    _conexiones_activas.add(tarea)
+    metricas.conexion_abierta()
+    lector = None
+    es_binaria = False
+    codificar_resp = codificar
+    espera = TIMEOUT_INACTIVIDAD if TIMEOUT_INACTIVIDAD > 0 else None
+    suscripciones = {}  # juego -> ficha del difusor
+    loop = asyncio.get_running_loop()
+
+    def empujar(datos):
+        # En el bucle (call_soon_threadsafe): un suscriptor que no lee
+        # acumula bytes sin límite, así que pasado MAX_BUFFER_SUSCRIPCION se cierra
+        if writer.transport.is_closing():
+            return
+        if writer.transport.get_write_buffer_size() > MAX_BUFFER_SUSCRIPCION:
+            metricas.incrementar("rechazos.suscriptor_lento")
+            writer.transport.abort()
+            return
+        writer.write(datos)
+
+    def suscribir(msg):
+        nonlocal espera
+        juego = msg.get("juego")
+        if juego not in JUEGOS:
+            raise ValueError("Juego no reconocido")
+        if juego not in suscripciones:
+            suscripciones[juego] = difusor.suscribir(juego, empujar, es_binaria, loop)
+        # Un suscriptor sólo escucha: no se cierra por inactividad
+        espera = None
+        version, mejores = clasificacion.instantanea(juego)
+        return {
+            "acción": "confirmación",
+            "status": "ok",
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "juego": juego,
+            "version": version,
+            "mejores": mejores
+        }
+
+    try:
+        while True:
+            data = await asyncio.wait_for(reader.read(MAX_LECTURA), espera)
+            if not data:
+                break
+            if lector is None:
+                # El primer byte decide el protocolo de toda la conexión
+                es_binaria = binario.es_binario(data)
+                if es_binaria:
+                    lector = binario.LectorBinario(max_trama=MAX_TRAMA)
+                    codificar_resp = binario.codificar
                 else:
-                    resp = {
-                        "acción": "error",
-                        "error": {"code":400, "mensaje":"Acción desconocida"},
-                        "timestamp": datetime.utcnow().isoformat() + "Z"
-                    }
-            except Exception as e:
-                resp = {
-                    "acción": "error",
-                    "error": {"code":500, "mensaje": str(e)},
-                    "timestamp": datetime.utcnow().isoformat() + "Z"
-                }
-            conn.sendall((json.dumps(resp) + SEPARATOR).encode('utf-8'))
-    conn.close()
-    print(f"[-] Conexión cerrada {addr}")
+                    lector = LectorTramas(max_trama=MAX_TRAMA)
+            for trama in lector.alimentar(data):
+                writer.write(await procesar_trama_async(trama, es_binaria, suscribir))
+                await drenar(writer, espera)
+    except TramaDemasiadoGrande as e:
+        writer.write(codificar_resp(respuesta_error(e, code=413)))
+    except ValueError as e:
+        # Cabecera de trama binaria corrupta
+        writer.write(codificar_resp(respuesta_error(e, code=400)))
+    except asyncio.TimeoutError:
+        metricas.incrementar("cierres.inactividad")
+    except ConnectionError:
+        pass
+    except asyncio.CancelledError:
+        # Parada con conexiones aún abiertas (p. ej. las libres del pool de
+        # un cliente): sin esto asyncio registra la cancelación como error
+        pass
+    finally:
+        for ficha in suscripciones.values():
+            difusor.cancelar(ficha)
+        _conexiones_activas.discard(tarea)
+        metricas.conexion_cerrada()
+        writer.close()
+        log.debug("Conexión cerrada", extra={"datos": {"addr": addr}})
 
-def salvar_resultado(msg: dict):
-    juego = msg["juego"]
-    datos = msg["datosPartida"]
-    sesión = Session()
-
-    # Convertir timestamp ISO -> datetime
-    ts = datetime.fromisoformat(msg["timestamp"].replace("Z", ""))
-
-    if juego == "nreinas":
-        r = ResultadoNReinas(
-            N=datos["N"],
-            resuelto=datos["resuelto"],
-            intentos=datos["intentos"],
-            timestamp=ts
-        )
-    elif juego == "caballo":
-        r = ResultadoKnightTour(
-            posicion_inicial=datos.get("posicion_inicial", ""),
-            movimientos=datos["movimientos"],
-            completado=datos["completado"],
-            timestamp=ts
-        )
-    elif juego == "hanoi":
-        r = ResultadoHanoi(
-            discos=datos["discos"],
-            movimientos=datos["movimientos"],
-            completado=datos["completado"],
-            timestamp=ts
-        )
-    else:
-        sesión.close()
+def consultar_resumen(msg: dict) -> dict:
+    """
+    Acción solicitar_resumen: agregados diarios ya calculados (partidas,
+    completadas, tasa, medias y mejor valor) por tamaño y día. Campos:
+      juego    (obligatorio)
+      N/discos filtra por tamaño (nreinas/hanoi)
+      desde    primer día (AAAA-MM-DD), incluido
+      hasta    último día (AAAA-MM-DD), incluido
+      limite   máximo de filas (RESUMEN_MAX por defecto)
+    """
+    juego = msg.get("juego")
+    if juego not in JUEGOS:
         raise ValueError("Juego no reconocido")
+    columna = TAMAÑOS[juego]
+    tamaño = _entero_opcional(msg, columna, minimo=1) if columna else None
+    for campo in ("desde", "hasta"):
+        if msg.get(campo) is not None:
+            try:
+                date.fromisoformat(msg[campo])
+            except (TypeError, ValueError):
+                raise ValueError(f"'{campo}' debe ser un día AAAA-MM-DD")
+    limite = min(_entero_opcional(msg, "limite", minimo=1) or RESUMEN_MAX, RESUMEN_MAX)
+    return {
+        "acción": "confirmación",
+        "status": "ok",
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "juego": juego,
+        "resumen": almacen.resumen(juego, tamaño, msg.get("desde"), msg.get("hasta"), limite)
+    }
+
+def crear_resultado(msg: dict) -> tuple:
+    """Construye la fila (juego, columnas) de un mensaje guardar_resultado."""
+    return crear_fila(msg["juego"], msg["datosPartida"], msg["timestamp"], msg.get("clave"))
+
+def salvar_resultado(msg: dict):
+    """Encola el resultado en el escritor por lotes y espera a su commit."""
+    fila = crear_resultado(msg)
+    if registro.mensajes_activos(log):
+        log.debug("Guardando", extra={"datos": {"juego": fila[0], "columnas": fila[1]}})
+    inicio = time.perf_counter()
+    entry = escritor.guardar(fila)
+    metricas.observar("bd", "guardar_resultado", fila[0], time.perf_counter() - inicio)
+    return entry
 
-    print(f"[DEBUG] Guardando en DB: {r}")
-    sesión.add(r)
-    sesión.commit()
-    sesión.close()
+def validar_resultados(msg: dict) -> tuple:
+    """
+    Valida cada elemento de un mensaje guardar_resultados.
+    Devuelve ([(índice, fila)] de los válidos, [estado] de todos), donde
+    los estados de los válidos se completan tras guardarlos.
+    """
+    resultados = msg.get("resultados")
+    if not isinstance(resultados, list):
+        raise ValueError("'resultados' debe ser una lista")
+    if len(resultados) > RESULTADOS_POR_MENSAJE:
+        raise ValueError(f"Máximo {RESULTADOS_POR_MENSAJE} resultados por mensaje")
+    filas, estados = [], []
+    for i, item in enumerate(resultados):
+        try:
+            if not isinstance(item, dict):
+                raise ValueError("Cada resultado debe ser un objeto")
+            fila = crear_fila(item.get("juego"), item.get("datosPartida"), item.get("timestamp"),
+                              item.get("clave"))
+        except ValueError as e:
+            estados.append({"indice": i, "status": "error", "mensaje": str(e)})
+        else:
+            filas.append((i, fila))
+            estados.append(None)
+    return filas, estados
+
+def respuesta_lote(filas: list, entradas: list, estados: list) -> dict:
+    for (i, _), entry in zip(filas, entradas):
+        estados[i] = {"indice": i, "status": "ok", "id": entry["id"]}
+        if entry.get("repetido"):
+            estados[i]["repetido"] = True
+    return {
+        "acción": "confirmación",
+        "status": "ok",
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "guardados": len(entradas),
+        "errores": len(estados) - len(entradas),
+        "resultados": estados
+    }
 
 def consultar_top(juego: str, limit: int = 5):
-    sesión = Session()
-    if juego == "nreinas":
-        q = sesión.query(ResultadoNReinas).filter_by(resuelto=True).order_by(ResultadoNReinas.intentos).limit(limit)
-    elif juego == "caballo":
-        q = sesión.query(ResultadoKnightTour).filter_by(completado=True).order_by(ResultadoKnightTour.movimientos).limit(limit)
-    elif juego == "hanoi":
-        q = sesión.query(ResultadoHanoi).filter_by(completado=True).order_by(ResultadoHanoi.movimientos).limit(limit)
-    else:
-        sesión.close()
+    return almacen.top(juego, limit)
+
+def _entero_opcional(msg: dict, campo: str, minimo: int = None):
+    val = msg.get(campo)
+    if val is None:
+        return None
+    if isinstance(val, bool) or not isinstance(val, int) or (minimo is not None and val < minimo):
+        raise ValueError(f"'{campo}' debe ser un entero" + (f" >= {minimo}" if minimo is not None else ""))
+    return val
+
+def consultar_ranking(msg: dict) -> dict:
+    """
+    Acción solicitar_ranking. Campos del mensaje:
+      juego    (obligatorio)
+      N/discos filtra por tamaño (nreinas/hanoi)
+      limite   entradas por página (1..RANKING_MAX, 10 por defecto)
+      despues  [valor, id] de la última entrada de la página anterior
+      id       en lugar de una página, devuelve la posición de ese resultado
+    """
+    juego = msg.get("juego")
+    if juego not in JUEGOS:
         raise ValueError("Juego no reconocido")
+    columna = TAMAÑOS[juego]
+    tamaño = _entero_opcional(msg, columna, minimo=1) if columna else None
+    respuesta = {
+        "acción": "confirmación",
+        "status": "ok",
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "juego": juego,
+    }
 
-    resultado = []
-    for r in q:
-        entry = {}
-        for col in r.__table__.columns:
-            val = getattr(r, col.name)
-            # Serializar datetime a ISO
-            if isinstance(val, datetime):
-                entry[col.name] = val.isoformat() + "Z"
-            else:
-                entry[col.name] = val
-        resultado.append(entry)
+    id_ = _entero_opcional(msg, "id", minimo=1)
+    if id_ is not None:
+        encontrado = almacen.posicion(juego, id_, tamaño)
+        if encontrado is None:
+            return respuesta_error(LookupError("Resultado no encontrado en el ranking"), code=404)
+        respuesta["posicion"], respuesta["entrada"] = encontrado
+        return respuesta
+
+    limite = _entero_opcional(msg, "limite", minimo=1) or 10
+    if limite > RANKING_MAX:
+        raise ValueError(f"Máximo {RANKING_MAX} entradas por página")
+    despues = msg.get("despues")
+    if despues is not None:
+        if (not isinstance(despues, list) or len(despues) != 2
+                or not all(isinstance(v, int) and not isinstance(v, bool) for v in despues)):
+            raise ValueError("'despues' debe ser [valor, id]")
+    entradas = almacen.ranking(juego, limite, tamaño, despues)
+    _, orden = CRITERIOS[juego]
+    respuesta["ranking"] = entradas
+    # Cursor de la página siguiente (None si ésta es la última)
+    respuesta["siguiente"] = (
+        [entradas[-1][orden], entradas[-1]["id"]] if len(entradas) == limite else None
+    )
+    return respuesta
+
+def actualizar_clasificacion(guardadas):
+    """
+    Callback del escritor: lleva los resultados recién confirmados a la caché
+    del top y a los bocetos de cuantiles. Los repetidos (clave de
+    idempotencia ya guardada) ya se contaron la primera vez.
+    """
+    for (juego, _), entry in guardadas:
+        if entry.get("repetido"):
+            continue
+        cambio = clasificacion.registrar(juego, entry)
+        if cambio is not None and difusor.hay_suscriptores(juego):
+            difusor.publicar(juego, mensaje_cambio(juego, cambio))
+        cuantiles.registrar(juego, entry)
 
-    sesión.close()
-    return resultado
+def mensaje_cambio(juego: str, cambio: dict) -> dict:
+    """
+    Actualización que reciben los suscriptores de 'juego': el resultado que
+    entra en el top, su posición, el id que sale (o None) y la versión del
+    top tras el cambio.
+    """
+    return {
+        "acción": "actualizacion_mejores",
+        "juego": juego,
+        **cambio,
+        "timestamp": datetime.utcnow().isoformat() + "Z"
+    }
+
+def iniciar_servicios(escritor_externo=None, ruta_metricas=METRICAS_RUTA,
+                      ruta_cuantiles=CUANTILES_RUTA):
+    """
+    Prepara el almacén, carga la caché del top y arranca el escritor.
+    'escritor_externo' sustituye al escritor por lotes local (lo usan los
+    procesos trabajadores de server/multiproceso.py, que delegan las
+    escrituras en un único proceso escritor).
+    """
+    global almacen, escritor, _volcado_metricas, _volcado_cuantiles, _retencion
+    registro.configurar()
+    almacen = crear_almacen()
+    almacen.iniciar()
+    log.info("Almacén iniciado", extra={"datos": {"almacen": almacen.nombre}})
+    clasificacion.cargar(consultar_top)
+    # Un trabajador sin fichero propio (primer arranque en modo multiproceso)
+    # parte de los bocetos del modo de un proceso
+    origen = ruta_cuantiles if os.path.exists(ruta_cuantiles) else CUANTILES_RUTA
+    try:
+        cargados = cuantiles.cargar(origen)
+    except (OSError, ValueError, KeyError):
+        log.exception("No se pudieron cargar los cuantiles; se empieza de cero")
+    else:
+        log.info("Cuantiles cargados", extra={"datos": {"bocetos": cargados, "ruta": origen}})
+    if escritor_externo is None:
+        escritor = EscritorPorLotes(
+            almacen,
+            tam_lote=LOTE_MAX,
+            latencia_max=LOTE_LATENCIA_MS / 1000,
+            max_cola=COLA_MAX,
+            al_confirmar=actualizar_clasificacion
+        )
+    else:
+        escritor = escritor_externo
+    escritor.iniciar()
+    if METRICAS and METRICAS_INTERVALO > 0:
+        _volcado_metricas = VolcadoPeriodico(estadisticas, ruta_metricas, METRICAS_INTERVALO)
+        _volcado_metricas.iniciar()
+    if CUANTILES_INTERVALO > 0:
+        _volcado_cuantiles = VolcadoPeriodico(cuantiles.a_dict, ruta_cuantiles, CUANTILES_INTERVALO)
+        _volcado_cuantiles.iniciar()
+    # En modo multiproceso la retención la ejecuta el proceso escritor
+    if RETENCION_DIAS > 0 and almacen.nombre == "sqlite" and escritor_externo is None:
+        from server.retencion import RetencionPeriodica
+        _retencion = RetencionPeriodica(almacen.engine)
+        _retencion.iniciar()
+
+def detener_servicios():
+    if _retencion is not None:
+        _retencion.detener()
+    if _volcado_metricas is not None:
+        _volcado_metricas.detener()
+    if escritor is not None:
+        escritor.detener()
+    # Después del escritor, para que el último volcado incluya lo confirmado
+    if _volcado_cuantiles is not None:
+        _volcado_cuantiles.detener()
+    if almacen is not None:
+        almacen.cerrar()
+    registro.detener()
 
 def start_server():
-    init_db()  # crea tablas si no existen
+    """Modo clásico: un hilo por conexión."""
+    iniciar_servicios()
     serv = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     serv.bind((HOST, PORT))
-    serv.listen()
-    print(f"Servidor escuchando en {HOST}:{PORT}")
-    while True:
-        conn, addr = serv.accept()
-        threading.Thread(target=handle_client, args=(conn, addr), daemon=True).start()
+    serv.listen(BACKLOG)
+    log.info("Servidor escuchando", extra={"datos": {"host": HOST, "port": PORT, "modo": "hilos"}})
+    plazas = threading.BoundedSemaphore(MAX_CONEXIONES) if MAX_CONEXIONES > 0 else None
+    try:
+        while True:
+            conn, addr = serv.accept()
+            if plazas is not None and not plazas.acquire(blocking=False):
+                rechazar_conexion(conn)
+                continue
+            threading.Thread(target=handle_client, args=(conn, addr, plazas), daemon=True).start()
+    finally:
+        serv.close()
+        detener_servicios()
+
+async def _serve_async(sock=None, reuse_port=False):
+    if sock is not None:
+        server = await asyncio.start_server(handle_client_async, sock=sock)
+    else:
+        server = await asyncio.start_server(
+            handle_client_async, HOST, PORT, reuse_port=reuse_port or None, backlog=BACKLOG
+        )
+    # Parada ordenada con SIGTERM: deja de aceptar conexiones, espera a las
+    # abiertas como mucho GRACIA_PARADA segundos y termina
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, server.close)
+    log.info("Servidor escuchando", extra={"datos": {"host": HOST, "port": PORT, "modo": "asyncio"}})
+    async with server:
+        try:
+            await server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+    if _conexiones_activas:
+        await asyncio.wait(set(_conexiones_activas), timeout=GRACIA_PARADA)
+
+def start_async_server(sock=None, reuse_port=False, escritor_externo=None,
+                       ruta_metricas=METRICAS_RUTA, ruta_cuantiles=CUANTILES_RUTA):
+    """
+    Modo asyncio: un único bucle de eventos y un executor acotado para la BD.
+    'sock' (socket de escucha ya creado) y 'reuse_port' los usa el modo
+    multiproceso para que varios procesos atiendan el mismo puerto.
+    """
+    global _db_executor
+    iniciar_servicios(escritor_externo, ruta_metricas, ruta_cuantiles)
+    _db_executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="db")
+    try:
+        asyncio.run(_serve_async(sock, reuse_port))
+    finally:
+        _db_executor.shutdown(wait=True)
+        detener_servicios()
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor de la Máquina Arcade Distribuida")
+    parser.add_argument("--modo", choices=("asyncio", "hilos"), default=MODO_SERVIDOR,
+                        help="asyncio (por defecto) o hilos (un hilo por conexión)")
+    args = parser.parse_args()
+    if args.modo == "hilos":
+        start_server()
+    else:
+        start_async_server()
 
 if __name__ == "__main__":
-    start_server()
+    main()
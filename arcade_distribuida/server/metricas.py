@@ -0,0 +1,171 @@
+"""
+Contadores e histogramas de latencia del servidor.
+
+Cada mensaje registra cuánto tardó en cada fase (decodificar, bd,
+codificar y total), agrupado por acción y juego, en histogramas de
+cubetas logarítmicas fijas: registrar cuesta una búsqueda binaria y un
+incremento, sin guardar muestras, así que puede dejarse activo en
+producción. Los percentiles se estiman con el límite superior de la
+cubeta (error menor del 19 %).
+
+Las cifras se consultan con la acción "estadisticas" y se vuelcan
+periódicamente a un fichero JSON (METRICAS_RUTA cada METRICAS_INTERVALO
+segundos).
+"""
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+
+log = logging.getLogger("arcade.metricas")
+
+# Límites de las cubetas en microsegundos: 4 por cada potencia de 2,
+# de 1 µs a ~100 s. Lo que pase del último límite cae en una cubeta extra.
+LIMITES_US = [2 ** (i / 4) for i in range(4 * 27)]
+
+FASES = ("decodificar", "bd", "codificar", "total")
+
+
+class Histograma:
+    __slots__ = ("cuentas", "total", "suma", "maximo")
+
+    def __init__(self):
+        self.cuentas = [0] * (len(LIMITES_US) + 1)
+        self.total = 0
+        self.suma = 0.0
+        self.maximo = 0.0
+
+    def registrar(self, segundos):
+        us = segundos * 1e6
+        self.cuentas[bisect.bisect_left(LIMITES_US, us)] += 1
+        self.total += 1
+        self.suma += us
+        if us > self.maximo:
+            self.maximo = us
+
+    def percentil(self, p) -> float:
+        """Estimación en microsegundos (límite superior de la cubeta)."""
+        if not self.total:
+            return 0.0
+        objetivo = self.total * p / 100
+        acumulado = 0
+        for i, cuenta in enumerate(self.cuentas):
+            acumulado += cuenta
+            if acumulado >= objetivo:
+                return LIMITES_US[i] if i < len(LIMITES_US) else self.maximo
+        return self.maximo
+
+    def resumen(self) -> dict:
+        return {
+            "cuenta": self.total,
+            "media_ms": (self.suma / self.total / 1000) if self.total else 0.0,
+            "p50_ms": self.percentil(50) / 1000,
+            "p95_ms": self.percentil(95) / 1000,
+            "p99_ms": self.percentil(99) / 1000,
+            "max_ms": self.maximo / 1000,
+            # Sólo las cubetas con datos: [límite superior µs, cuenta]
+            "cubetas": [
+                [round(LIMITES_US[i], 1) if i < len(LIMITES_US) else None, cuenta]
+                for i, cuenta in enumerate(self.cuentas) if cuenta
+            ],
+        }
+
+
+class Metricas:
+    def __init__(self, activas=True):
+        self.activas = activas
+        self._lock = threading.Lock()
+        self._histogramas = {}   # (fase, acción, juego) -> Histograma
+        self._contadores = {}    # nombre -> entero
+        self.conexiones_abiertas = 0
+        self.conexiones_totales = 0
+        self.inicio = time.time()
+
+    def observar(self, fase, accion, juego, segundos):
+        if not self.activas:
+            return
+        clave = (fase, accion, juego or "-")
+        with self._lock:
+            hist = self._histogramas.get(clave)
+            if hist is None:
+                hist = self._histogramas[clave] = Histograma()
+            hist.registrar(segundos)
+
+    def incrementar(self, nombre, n=1):
+        if not self.activas:
+            return
+        with self._lock:
+            self._contadores[nombre] = self._contadores.get(nombre, 0) + n
+
+    def conexion_abierta(self):
+        with self._lock:
+            self.conexiones_abiertas += 1
+            self.conexiones_totales += 1
+
+    def conexion_cerrada(self):
+        with self._lock:
+            self.conexiones_abiertas -= 1
+
+    def instantanea(self) -> dict:
+        """Estado actual: {"conexiones", "contadores", "latencias": {fase: {acción: {juego: resumen}}}}."""
+        with self._lock:
+            histogramas = list(self._histogramas.items())
+            contadores = dict(self._contadores)
+            conexiones = {"abiertas": self.conexiones_abiertas, "totales": self.conexiones_totales}
+        latencias = {}
+        for (fase, accion, juego), hist in sorted(histogramas):
+            latencias.setdefault(fase, {}).setdefault(accion, {})[juego] = hist.resumen()
+        return {
+            "pid": os.getpid(),
+            "activo_s": time.time() - self.inicio,
+            "conexiones": conexiones,
+            "contadores": contadores,
+            "latencias": latencias,
+        }
+
+
+def volcar(datos: dict, ruta: str):
+    """Escribe 'datos' como JSON de forma atómica (fichero temporal + rename)."""
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(datos, f, indent=2)
+    os.replace(temporal, ruta)
+
+
+class VolcadoPeriodico:
+    """
+    Hilo que llama a volcar(obtener(), ruta) cada 'intervalo' segundos
+    (lo usan las métricas y los bocetos de server/cuantiles.py).
+    """
+
+    def __init__(self, obtener, ruta, intervalo):
+        self._obtener = obtener
+        self.ruta = ruta
+        self.intervalo = intervalo
+        self._parar = threading.Event()
+        self._hilo = None
+
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self._bucle, name="volcado-metricas", daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        """Para el hilo y hace un último volcado."""
+        if self._hilo is None:
+            return
+        self._parar.set()
+        self._hilo.join()
+        self._hilo = None
+        self._volcar()
+
+    def _bucle(self):
+        while not self._parar.wait(self.intervalo):
+            self._volcar()
+
+    def _volcar(self):
+        try:
+            volcar(self._obtener(), self.ruta)
+        except Exception:
+            log.exception("Error en el volcado periódico", extra={"datos": {"ruta": self.ruta}})
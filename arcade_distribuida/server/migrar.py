@@ -0,0 +1,175 @@
+"""
+Migración en caliente de resultados.db.
+
+Añade a una base de datos existente los índices declarados en
+server/models.py, o los recrea si su definición cambió (sin tocar los
+datos), y muestra el plan de las consultas de clasificación antes y
+después, para comprobar que los recorridos completos (SCAN) pasan a ser
+búsquedas por índice (SEARCH). También rellena resumen_diario con los
+resultados ya guardados de cada día que tenga más partidas en su tabla que
+las sumadas en el resumen (el servidor la mantiene al guardar cada lote,
+pero sólo desde que se actualizó), así que puede ejecutarse antes o después
+de arrancar el servidor nuevo.
+
+Uso (desde la raíz del proyecto):
+    python -m server.migrar
+    python -m server.migrar --solo-informe
+"""
+import argparse
+import os
+from sqlalchemy.exc import OperationalError
+from server.db import engine, Base
+import server.models  # noqa: F401  (registra los modelos en Base.metadata)
+
+# Consultas representativas del servidor, con parámetros de ejemplo
+CONSULTAS = {
+    "top nreinas":
+        "SELECT * FROM nreinas WHERE resuelto = 1 ORDER BY intentos, id LIMIT 5",
+    "top nreinas por N":
+        "SELECT * FROM nreinas WHERE N = 8 AND resuelto = 1 ORDER BY intentos, id LIMIT 5",
+    "top caballo":
+        "SELECT * FROM knight_tour WHERE completado = 1 ORDER BY movimientos, id LIMIT 5",
+    "top hanoi":
+        "SELECT * FROM hanoi WHERE completado = 1 ORDER BY movimientos, id LIMIT 5",
+    "top hanoi por discos":
+        "SELECT * FROM hanoi WHERE discos = 3 AND completado = 1 ORDER BY movimientos, id LIMIT 5",
+    "ranking nreinas por N (página)":
+        "SELECT * FROM nreinas WHERE N = 8 AND resuelto = 1 AND (intentos, id) > (10, 100) "
+        "ORDER BY intentos, id LIMIT 10",
+    "posición en ranking hanoi":
+        "SELECT count(*) FROM hanoi WHERE discos = 3 AND completado = 1 AND (movimientos, id) < (10, 100)",
+}
+
+
+def plan_consultas(conn) -> dict:
+    """Devuelve {nombre: [líneas de EXPLAIN QUERY PLAN]} para cada consulta."""
+    planes = {}
+    for nombre, sql in CONSULTAS.items():
+        try:
+            filas = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql).fetchall()
+        except OperationalError as e:
+            # Con --solo-informe no se crean las tablas que falten
+            planes[nombre] = [f"ERROR: {e.orig}"]
+            continue
+        planes[nombre] = [fila[-1] for fila in filas]
+    return planes
+
+
+def columnas_indice(conn, nombre) -> list:
+    """Columnas de un índice existente, en orden ([] si no existe)."""
+    filas = conn.exec_driver_sql(f"PRAGMA index_info({nombre})").fetchall()
+    return [fila[2] for fila in sorted(filas)]
+
+
+def crear_indices(conn) -> list:
+    """
+    Crea los índices que falten y recrea los que existan con otras columnas.
+    Devuelve los nombres de los creados.
+    """
+    creados = []
+    for tabla in Base.metadata.sorted_tables:
+        for indice in tabla.indexes:
+            declaradas = [col.name for col in indice.columns]
+            actuales = columnas_indice(conn, indice.name)
+            if actuales == declaradas:
+                continue
+            if actuales:
+                indice.drop(conn)
+            indice.create(conn)
+            creados.append(indice.name)
+    # Estadísticas para que el planificador elija bien entre índices
+    conn.exec_driver_sql("ANALYZE")
+    return creados
+
+
+# Agregado de cada tabla de resultados: (tabla, juego, expresión del tamaño,
+# columna de completado, columna de valor)
+_RESUMEN_ORIGEN = (
+    ("nreinas", "nreinas", "N", "resuelto", "intentos"),
+    ("knight_tour", "caballo", "0", "completado", "movimientos"),
+    ("hanoi", "hanoi", "discos", "completado", "movimientos"),
+)
+
+
+def rellenar_resumen(conn) -> int:
+    """
+    Rellena resumen_diario con los resultados existentes: recalcula cada
+    juego, tamaño y día cuya tabla tenga más partidas que las sumadas (o que
+    no tenga fila). No basta con los días anteriores al primero resumido: un
+    resultado con fecha antigua guardado después de actualizar (un buzón que
+    se reenvía, un reloj atrasado) crea una fila de resumen temprana y los
+    días siguientes seguirían sin resumir. Los días con menos partidas en la
+    tabla que en el resumen (la retención ya borró parte) no se tocan.
+    Devuelve el número de filas creadas o corregidas; una segunda ejecución
+    no cambia nada.
+    """
+    creadas = 0
+    for tabla, juego, tamaño, completado, valor in _RESUMEN_ORIGEN:
+        creadas += conn.exec_driver_sql(
+            f"INSERT INTO resumen_diario (juego, tamaño, dia, partidas, completadas, "
+            f"suma_valor, suma_valor_completadas, mejor_valor) "
+            f"SELECT '{juego}', {tamaño}, date(timestamp), count(*), "
+            f"sum({completado} = 1), sum({valor}), "
+            f"coalesce(sum(CASE WHEN {completado} = 1 THEN {valor} END), 0), "
+            f"min(CASE WHEN {completado} = 1 THEN {valor} END) "
+            # SQLite exige un WHERE en un INSERT ... SELECT con ON CONFLICT
+            f"FROM {tabla} WHERE true "
+            # Agrupa por las columnas 2 y 3 del SELECT (tamaño y día)
+            f"GROUP BY 2, 3 "
+            f"ON CONFLICT (juego, tamaño, dia) DO UPDATE SET "
+            f"partidas = excluded.partidas, completadas = excluded.completadas, "
+            f"suma_valor = excluded.suma_valor, "
+            f"suma_valor_completadas = excluded.suma_valor_completadas, "
+            f"mejor_valor = excluded.mejor_valor "
+            f"WHERE excluded.partidas > resumen_diario.partidas"
+        ).rowcount
+    return creadas
+
+
+def imprimir_informe(antes: dict, despues: dict):
+    for nombre in CONSULTAS:
+        print(f"\n=== {nombre} ===")
+        print("  antes:   " + " | ".join(antes[nombre]))
+        print("  después: " + " | ".join(despues[nombre]))
+        if any(linea.startswith("SCAN") for linea in despues[nombre]):
+            print("  AVISO: la consulta sigue recorriendo la tabla completa")
+
+
+def migrar(solo_informe=False):
+    if solo_informe:
+        # Sólo lee: ni tablas, ni índices, ni (en sqlite) un fichero nuevo
+        ruta = engine.url.database
+        if (engine.url.get_backend_name() == "sqlite" and ruta and ruta != ":memory:"
+                and not os.path.exists(ruta)):
+            print(f"No existe la base de datos {ruta}.")
+            return
+        with engine.connect() as conn:
+            planes = plan_consultas(conn)
+        imprimir_informe(planes, planes)
+        return
+    # Crea las tablas que falten (con sus índices) en bases de datos vacías
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        antes = plan_consultas(conn)
+        creados = crear_indices(conn)
+        resumen = rellenar_resumen(conn)
+        despues = plan_consultas(conn)
+    if creados:
+        print("Índices creados: " + ", ".join(creados))
+    else:
+        print("No había índices pendientes.")
+    if resumen:
+        print(f"Resumen diario rellenado: {resumen} filas")
+    imprimir_informe(antes, despues)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migra resultados.db añadiendo los índices")
+    parser.add_argument("--solo-informe", action="store_true",
+                        help="no crea nada; sólo muestra el plan de consulta actual")
+    args = parser.parse_args()
+    migrar(solo_informe=args.solo_informe)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,12 @@
-from sqlalchemy import Column, Integer, Boolean, String, DateTime
+from sqlalchemy import Column, Integer, Boolean, String, Date, DateTime, Index
 from server.db import Base
 
+# Los índices siguen el patrón de las consultas de clasificación: primero la
+# columna de filtro (y el tamaño del tablero en los índices por tamaño),
+# después la columna de orden con el id como desempate y al final el resto
+# de columnas, para que el índice sea "covering" y SQLite no tenga que
+# visitar la tabla ni ordenar.
+
 class ResultadoNReinas(Base):
     __tablename__ = 'nreinas'
     id = Column(Integer, primary_key=True)
@@ -9,6 +15,11 @@ class ResultadoNReinas(Base):
     intentos = Column(Integer, nullable=False)
     timestamp = Column(DateTime, nullable=False)
 
+    __table_args__ = (
+        Index('ix_nreinas_resuelto_intentos', 'resuelto', 'intentos', 'id', 'N', 'timestamp'),
+        Index('ix_nreinas_n_resuelto_intentos', 'N', 'resuelto', 'intentos', 'id', 'timestamp'),
+    )
+
 class ResultadoKnightTour(Base):
     __tablename__ = 'knight_tour'
     id = Column(Integer, primary_key=True)
@@ -17,6 +28,11 @@ class ResultadoKnightTour(Base):
     completado = Column(Boolean, nullable=False)
     timestamp = Column(DateTime, nullable=False)
 
+    __table_args__ = (
+        Index('ix_knight_tour_completado_movimientos',
+              'completado', 'movimientos', 'id', 'posicion_inicial', 'timestamp'),
+    )
+
 class ResultadoHanoi(Base):
     __tablename__ = 'hanoi'
     id = Column(Integer, primary_key=True)
@@ -24,3 +40,39 @@ class ResultadoHanoi(Base):
     movimientos = Column(Integer, nullable=False)
     completado = Column(Boolean, nullable=False)
     timestamp = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index('ix_hanoi_completado_movimientos', 'completado', 'movimientos', 'id', 'discos', 'timestamp'),
+        Index('ix_hanoi_discos_completado_movimientos', 'discos', 'completado', 'movimientos', 'id', 'timestamp'),
+    )
+
+class ResumenDiario(Base):
+    """
+    Agregados por juego, tamaño (N o discos; 0 en el caballo) y día, que el
+    almacén actualiza en la misma transacción que guarda cada lote. 'valor'
+    son los intentos (N-Reinas) o los movimientos (caballo y Hanói).
+    """
+    __tablename__ = 'resumen_diario'
+    juego = Column(String, primary_key=True)
+    tamaño = Column(Integer, primary_key=True)
+    dia = Column(Date, primary_key=True)
+    partidas = Column(Integer, nullable=False, default=0)
+    completadas = Column(Integer, nullable=False, default=0)
+    suma_valor = Column(Integer, nullable=False, default=0)
+    suma_valor_completadas = Column(Integer, nullable=False, default=0)
+    mejor_valor = Column(Integer, nullable=True)
+
+class ClaveIdempotencia(Base):
+    """
+    Claves de idempotencia de los resultados guardados: qué fila creó cada
+    clave, para devolverla en lugar de insertar otra si el cliente reintenta.
+    """
+    __tablename__ = 'claves_idempotencia'
+    clave = Column(String, primary_key=True)
+    juego = Column(String, nullable=False)
+    id_resultado = Column(Integer, nullable=False)
+    creado = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index('ix_claves_idempotencia_creado', 'creado'),
+    )
@@ -0,0 +1,347 @@
+"""
+Modo multiproceso: varios procesos trabajadores atienden el mismo puerto.
+
+Cada trabajador ejecuta el servidor asyncio completo (server/main.py) en su
+propio proceso, con su propia caché del top, de modo que el análisis de
+JSON y la codificación de respuestas se reparten entre núcleos en lugar de
+competir por el GIL. El reparto de conexiones lo hace el núcleo: con
+SO_REUSEPORT cada trabajador abre su propio socket en el mismo puerto; si
+el sistema no lo admite, todos heredan el socket de escucha del padre.
+
+Las escrituras no se reparten: un único proceso escritor ejecuta el
+EscritorPorLotes (group commit) y los trabajadores le envían sus filas por
+una cola. Tras cada commit el escritor difunde los resultados confirmados
+a todos los trabajadores, que actualizan su caché antes de recibir el
+acuse de su petición, así que quien guarda un resultado lo ve en
+"solicitar_mejores" en cualquier trabajador que lo atienda después.
+
+El proceso padre sólo supervisa: reinicia los trabajadores que mueren
+(como mucho REINICIOS_MAX veces en REINICIOS_VENTANA segundos) y, con
+SIGTERM o Ctrl+C, para los trabajadores de forma ordenada, deja que el
+escritor vacíe su cola y termina.
+
+Uso (desde la raíz del proyecto):
+    python -m server.multiproceso
+    python -m server.multiproceso --procesos 4
+"""
+import argparse
+import collections
+import itertools
+import logging
+import multiprocessing as mp
+import os
+import queue
+import signal
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing.connection import wait
+
+from server.config import (
+    HOST, PORT, ALMACEN, LOTE_MAX, LOTE_LATENCIA_MS, COLA_MAX, PROCESOS, REUSEPORT,
+    GRACIA_PARADA, REINICIOS_MAX, REINICIOS_VENTANA, METRICAS_RUTA, CUANTILES_RUTA, BACKLOG,
+    RETENCION_DIAS
+)
+from server import registro
+
+log = logging.getLogger("arcade.multiproceso")
+
+
+class EscritorRemoto:
+    """
+    Sustituto de EscritorPorLotes dentro de un trabajador: misma interfaz,
+    pero las filas se guardan en el proceso escritor. Un hilo receptor
+    aplica los resultados difundidos y resuelve los Future pendientes.
+    """
+
+    def __init__(self, cola_escritura, cola_propia, indice, al_confirmar=None,
+                 max_cola=10000):
+        self._cola_escritura = cola_escritura
+        self._cola_propia = cola_propia
+        self._indice = indice
+        self._al_confirmar = al_confirmar
+        self.max_cola = max_cola
+        # Los ids incluyen el pid para no confundir acuses dirigidos a un
+        # trabajador anterior que ocupaba el mismo hueco
+        self._ids = itertools.count()
+        self._pendientes = {}
+        self._lock = threading.Lock()
+        self._vacio = threading.Condition(self._lock)
+        self._hilo = None
+
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self._recibir, name="receptor-escritor", daemon=True)
+        self._hilo.start()
+
+    def detener(self, timeout=GRACIA_PARADA):
+        """Espera a los acuses pendientes y termina el hilo receptor."""
+        if self._hilo is None:
+            return
+        with self._vacio:
+            self._vacio.wait_for(lambda: not self._pendientes, timeout)
+        self._cola_propia.put(None)
+        self._hilo.join(timeout)
+        self._hilo = None
+
+    def encolar(self, fila, bloquear=True) -> Future:
+        return self._enviar([fila], True, bloquear)
+
+    def encolar_lote(self, filas, bloquear=True) -> Future:
+        return self._enviar(list(filas), False, bloquear)
+
+    def guardar(self, fila):
+        return self.encolar(fila).result()
+
+    def guardar_lote(self, filas):
+        return self.encolar_lote(filas).result()
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            pendientes = len(self._pendientes)
+        return {"pendientes": pendientes, "max_cola": self.max_cola}
+
+    def _enviar(self, filas, unica, bloquear) -> Future:
+        fut = Future()
+        peticion = (os.getpid(), next(self._ids))
+        with self._lock:
+            if not bloquear and len(self._pendientes) >= self.max_cola:
+                raise queue.Full
+            self._pendientes[peticion] = fut
+        self._cola_escritura.put((self._indice, peticion, filas, unica))
+        return fut
+
+    def _recibir(self):
+        while True:
+            item = self._cola_propia.get()
+            if item is None:
+                break
+            if item[0] == "nuevas":
+                if self._al_confirmar is not None:
+                    try:
+                        self._al_confirmar(item[1])
+                    except Exception:
+                        log.exception("Error en al_confirmar")
+                continue
+            _, peticion, resultado, error = item
+            with self._lock:
+                fut = self._pendientes.pop(peticion, None)
+                self._vacio.notify_all()
+            if fut is None:
+                continue
+            if error is not None:
+                fut.set_exception(RuntimeError(error))
+            else:
+                fut.set_result(resultado)
+
+
+def _ignorar_interrupciones():
+    # Ctrl+C llega a todo el grupo de procesos; sólo el padre lo atiende
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _proceso_escritor(cola_escritura, colas, listo):
+    """Único proceso que escribe en el almacén."""
+    from server.almacen import crear_almacen
+    from server.escritor import EscritorPorLotes
+
+    _ignorar_interrupciones()
+    registro.configurar()
+    almacen = crear_almacen()
+    almacen.iniciar()
+
+    def difundir(guardadas):
+        for cola in colas:
+            cola.put(("nuevas", guardadas))
+
+    escritor = EscritorPorLotes(
+        almacen,
+        tam_lote=LOTE_MAX,
+        latencia_max=LOTE_LATENCIA_MS / 1000,
+        max_cola=COLA_MAX,
+        al_confirmar=difundir
+    )
+    escritor.iniciar()
+    retencion = None
+    if RETENCION_DIAS > 0:
+        from server.retencion import RetencionPeriodica
+        retencion = RetencionPeriodica(almacen.engine)
+        retencion.iniciar()
+    listo.set()
+
+    def acusar(indice, peticion, fut):
+        try:
+            resultado, error = fut.result(), None
+        except Exception as e:
+            resultado, error = None, str(e) or type(e).__name__
+        colas[indice].put(("ack", peticion, resultado, error))
+
+    try:
+        while True:
+            item = cola_escritura.get()
+            if item is None:
+                break
+            indice, peticion, filas, unica = item
+            fut = escritor.encolar(filas[0]) if unica else escritor.encolar_lote(filas)
+            fut.add_done_callback(lambda f, i=indice, p=peticion: acusar(i, p, f))
+    finally:
+        if retencion is not None:
+            retencion.detener()
+        escritor.detener()
+        almacen.cerrar()
+        registro.detener()
+
+
+def _proceso_trabajador(indice, cola_escritura, cola_propia, sock):
+    from server import main as servidor
+
+    _ignorar_interrupciones()
+    escritor = EscritorRemoto(
+        cola_escritura, cola_propia, indice,
+        al_confirmar=servidor.actualizar_clasificacion,
+        max_cola=COLA_MAX
+    )
+    # Cada trabajador vuelca sus métricas y sus bocetos de cuantiles en su
+    # propio fichero (metricas-<i>.json, cuantiles-<i>.json): al reiniciarse
+    # recarga los suyos y no los de otro trabajador que ya contó resultados
+    # que a él aún le esperan en la cola
+    servidor.start_async_server(sock=sock, reuse_port=sock is None, escritor_externo=escritor,
+                                ruta_metricas=_ruta_trabajador(METRICAS_RUTA, indice),
+                                ruta_cuantiles=_ruta_trabajador(CUANTILES_RUTA, indice))
+
+
+def _ruta_trabajador(ruta, indice) -> str:
+    base, extension = os.path.splitext(ruta)
+    return f"{base}-{indice}{extension}"
+
+
+class _Parada(Exception):
+    """Señal de parada recibida por el supervisor."""
+
+
+def _senal_parada(signum, frame):
+    raise _Parada
+
+
+def _socket_compartido():
+    """Socket de escucha que heredan los trabajadores cuando no hay SO_REUSEPORT."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((HOST, PORT))
+    sock.listen(BACKLOG)
+    sock.setblocking(False)
+    return sock
+
+
+def ejecutar(procesos=PROCESOS, reuse_port=REUSEPORT) -> int:
+    """Arranca escritor y trabajadores y los supervisa. Devuelve el código de salida."""
+    registro.configurar()
+    if ALMACEN != "sqlite":
+        log.error("El modo multiproceso necesita ALMACEN=sqlite "
+                  "(los demás backends no se comparten entre procesos)",
+                  extra={"datos": {"almacen": ALMACEN}})
+        registro.detener()
+        return 2
+
+    cola_escritura = mp.Queue()
+    colas = [mp.Queue() for _ in range(procesos)]
+    listo = mp.Event()
+    escritor = mp.Process(target=_proceso_escritor, args=(cola_escritura, colas, listo),
+                          name="arcade-escritor")
+    escritor.start()
+    while not listo.wait(0.1):
+        if not escritor.is_alive():
+            log.error("El proceso escritor no pudo arrancar")
+            return 1
+
+    sock = None if reuse_port else _socket_compartido()
+
+    def lanzar(indice):
+        proc = mp.Process(target=_proceso_trabajador,
+                          args=(indice, cola_escritura, colas[indice], sock),
+                          name=f"arcade-trabajador-{indice}")
+        proc.start()
+        return proc
+
+    trabajadores = [lanzar(i) for i in range(procesos)]
+    reinicios = [collections.deque() for _ in range(procesos)]
+    modo = "SO_REUSEPORT" if reuse_port else "socket compartido"
+    log.info("Supervisor iniciado", extra={"datos": {
+        "procesos": procesos, "host": HOST, "port": PORT, "modo": modo,
+        "pid_escritor": escritor.pid}})
+
+    signal.signal(signal.SIGTERM, _senal_parada)
+    signal.signal(signal.SIGINT, _senal_parada)
+    codigo = 0
+    try:
+        while True:
+            vivos = {proc.sentinel: i for i, proc in enumerate(trabajadores)}
+            listos = wait(list(vivos) + [escritor.sentinel])
+            if escritor.sentinel in listos:
+                log.error("El proceso escritor terminó",
+                          extra={"datos": {"codigo": escritor.exitcode}})
+                codigo = 1
+                break
+            ahora = time.monotonic()
+            for sentinel in listos:
+                i = vivos[sentinel]
+                trabajadores[i].join()
+                log.warning("Trabajador terminado",
+                            extra={"datos": {"trabajador": i, "codigo": trabajadores[i].exitcode}})
+                recientes = reinicios[i]
+                while recientes and ahora - recientes[0] > REINICIOS_VENTANA:
+                    recientes.popleft()
+                if len(recientes) >= REINICIOS_MAX:
+                    log.error("Demasiados reinicios; se detiene el servidor", extra={"datos": {
+                        "trabajador": i, "reinicios_max": REINICIOS_MAX,
+                        "ventana_s": REINICIOS_VENTANA}})
+                    codigo = 1
+                    break
+                recientes.append(ahora)
+                trabajadores[i] = lanzar(i)
+            if codigo:
+                break
+    except _Parada:
+        log.info("Parando servidor")
+    finally:
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        _parar(trabajadores, escritor, cola_escritura)
+        if sock is not None:
+            sock.close()
+        registro.detener()
+    return codigo
+
+
+def _parar(trabajadores, escritor, cola_escritura):
+    # Primero los trabajadores (cierran sus conexiones y esperan sus acuses),
+    # después el escritor, que vacía lo que quede en su cola
+    for proc in trabajadores:
+        if proc.is_alive():
+            proc.terminate()
+    for proc in trabajadores:
+        proc.join(GRACIA_PARADA + 5)
+        if proc.is_alive():
+            proc.kill()
+            proc.join()
+    if escritor.is_alive():
+        cola_escritura.put(None)
+        escritor.join(GRACIA_PARADA + 5)
+        if escritor.is_alive():
+            escritor.kill()
+            escritor.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor multiproceso de la Máquina Arcade Distribuida")
+    parser.add_argument("--procesos", type=int, default=PROCESOS,
+                        help=f"número de trabajadores (por defecto {PROCESOS})")
+    parser.add_argument("--sin-reuseport", action="store_true",
+                        help="comparte el socket del padre aunque haya SO_REUSEPORT")
+    args = parser.parse_args()
+    sys.exit(ejecutar(max(1, args.procesos), REUSEPORT and not args.sin_reuseport))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Registro (logging) asíncrono en líneas JSON para el servidor.
+
+Los hilos que atienden peticiones sólo crean el LogRecord y lo dejan en una
+cola acotada sin esperar; un único hilo de fondo (QueueListener) lo
+formatea como JSON y lo escribe en la salida estándar o en REGISTRO_RUTA.
+Si la cola se llena, el registro se descarta y se cuenta: la petición
+nunca se bloquea por la E/S del log.
+
+Los mensajes DEBUG (uno por petición) se muestrean según REGISTRO_MUESTREO
+(p. ej. "DEBUG=0.01" deja pasar uno de cada cien) y REGISTRO_MENSAJES=0
+los elimina por completo antes incluso de construirlos.
+
+Cada línea tiene "ts", "nivel", "origen", "mensaje", el pid y los campos
+pasados en extra={"datos": {...}}.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+
+from server.config import (
+    REGISTRO_NIVEL, REGISTRO_RUTA, REGISTRO_COLA, REGISTRO_MUESTREO, REGISTRO_MENSAJES
+)
+
+# Si es False, el camino de cada petición no registra nada (ver mensajes_activos)
+MENSAJES = REGISTRO_MENSAJES
+
+_listener = None
+_manejador = None
+
+
+class FormatoJSON(logging.Formatter):
+    def format(self, record) -> str:
+        linea = {
+            "ts": datetime.utcfromtimestamp(record.created).isoformat() + "Z",
+            "nivel": record.levelname,
+            "origen": record.name,
+            "pid": record.process,
+            "mensaje": record.getMessage(),
+        }
+        datos = getattr(record, "datos", None)
+        if datos:
+            linea.update(datos)
+        if record.exc_info:
+            linea["excepcion"] = self.formatException(record.exc_info)
+        return json.dumps(linea, ensure_ascii=False, default=str)
+
+
+class Muestreo(logging.Filter):
+    """Deja pasar cada registro con la probabilidad configurada para su nivel."""
+
+    def __init__(self, tasas: dict):
+        super().__init__()
+        self.tasas = tasas
+
+    def filter(self, record) -> bool:
+        tasa = self.tasas.get(record.levelno)
+        return tasa is None or tasa >= 1 or random.random() < tasa
+
+
+class ManejadorCola(QueueHandler):
+    """QueueHandler que nunca bloquea: si la cola está llena, descarta."""
+
+    def __init__(self, cola):
+        super().__init__(cola)
+        self.descartados = 0
+
+    def prepare(self, record):
+        # El listener está en el mismo proceso: el formateo (lo caro) se
+        # hace allí, no en el hilo de la petición
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.descartados += 1
+
+
+class _Escritor(QueueListener):
+    def enqueue_sentinel(self):
+        # Con la cola llena, put_nowait fallaría: se espera a que el hilo la vacíe
+        self.queue.put(self._sentinel)
+
+
+def leer_muestreo(texto: str) -> dict:
+    """'DEBUG=0.01,INFO=1' -> {logging.DEBUG: 0.01, logging.INFO: 1.0}."""
+    tasas = {}
+    for parte in filter(None, (p.strip() for p in texto.split(","))):
+        nivel, _, tasa = parte.partition("=")
+        tasas[logging.getLevelName(nivel.strip().upper())] = float(tasa)
+    return tasas
+
+
+def configurar():
+    """
+    Instala el manejador de cola en el logger raíz y arranca el hilo
+    escritor. Es idempotente; también recoge los logs de SQLAlchemy.
+    """
+    global _listener, _manejador
+    if _listener is not None:
+        return
+    if REGISTRO_RUTA:
+        destino = logging.FileHandler(REGISTRO_RUTA, encoding="utf-8")
+    else:
+        destino = logging.StreamHandler(sys.stdout)
+    destino.setFormatter(FormatoJSON())
+
+    cola = queue.Queue(maxsize=REGISTRO_COLA)
+    _manejador = ManejadorCola(cola)
+    _manejador.addFilter(Muestreo(leer_muestreo(REGISTRO_MUESTREO)))
+
+    raiz = logging.getLogger()
+    raiz.handlers[:] = [_manejador]
+    raiz.setLevel(REGISTRO_NIVEL.upper())
+
+    _listener = _Escritor(cola, destino, respect_handler_level=True)
+    _listener.start()
+    atexit.register(detener)
+
+
+def detener():
+    """Escribe lo pendiente y para el hilo escritor."""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for destino in _listener.handlers:
+        destino.close()
+    _listener = None
+
+
+def _tras_fork():
+    # El hilo escritor no sobrevive a fork(): el hijo debe volver a configurar
+    global _listener, _manejador
+    _listener = None
+    _manejador = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_tras_fork)
+
+
+def descartados() -> int:
+    """Registros perdidos porque la cola estaba llena."""
+    return _manejador.descartados if _manejador is not None else 0
+
+
+def mensajes_activos(log: logging.Logger) -> bool:
+    """True si merece la pena construir el registro DEBUG de una petición."""
+    return MENSAJES and log.isEnabledFor(logging.DEBUG)
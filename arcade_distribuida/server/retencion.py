@@ -0,0 +1,272 @@
+"""
+Retención del histórico de resultados (sólo backend sqlite).
+
+Los resultados con más de 'dias' días se borran de nreinas, knight_tour y
+hanoi salvo los que siguen en el top-'top' de su juego y tamaño, de modo
+que el top en memoria, los primeros puestos de solicitar_ranking y los
+percentiles no cambian. Lo borrado no se pierde para las estadísticas: cada
+partida ya está sumada en resumen_diario desde que se guardó. Si algún día
+a borrar tiene más resultados que partidas sumadas (una base de datos
+anterior a resumen_diario que aún no ha pasado por server.migrar) no se
+borra nada de ese juego.
+
+Para no frenar al escritor por lotes, los ids candidatos se leen sin
+bloquear y se borran en transacciones cortas de 'lote' filas con una pausa
+entre ellas. Después, si la base de datos tiene auto_vacuum=INCREMENTAL, se
+devuelven al sistema las páginas libres también por tramos; --vacuum hace un
+VACUUM completo (bloquea las escrituras mientras dura) y de paso activa el
+modo incremental en bases de datos antiguas. Las claves de idempotencia con
+la misma antigüedad también se borran: ningún cliente reintenta tan tarde.
+
+La tarea se ejecuta periódicamente dentro del servidor si RETENCION_DIAS > 0,
+o a mano (desde la raíz del proyecto):
+    python -m server.retencion --dias 90
+    python -m server.retencion --dias 90 --top 50 --simular
+    python -m server.retencion --dias 365 --vacuum
+"""
+import argparse
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, delete, func, literal, select
+
+from server.almacen import CRITERIOS, TAMAÑOS
+from server.almacen.sqlite import MODELOS
+from server.config import (
+    RETENCION_DIAS, RETENCION_TOP, RETENCION_LOTE, RETENCION_PAUSA_MS, RETENCION_INTERVALO,
+    RETENCION_VACUUM_PAGINAS
+)
+from server.db import engine, init_db
+from server.models import ClaveIdempotencia, ResumenDiario
+from server import registro
+
+log = logging.getLogger("arcade.retencion")
+
+
+def protegidos(conn, juego, top) -> set:
+    """
+    Ids del top-'top' de cada tamaño del juego (del juego entero en el
+    caballo). Cada top es un ORDER BY ... LIMIT que recorre sólo 'top'
+    entradas del índice de clasificación; los tamaños salen de resumen_diario.
+    """
+    tabla = MODELOS[juego].__table__
+    completado, orden = CRITERIOS[juego]
+    columna = TAMAÑOS[juego]
+    consulta = (select(tabla.c.id).where(tabla.c[completado] == True)  # noqa: E712
+                .order_by(tabla.c[orden], tabla.c.id).limit(top))
+    if columna is None:
+        return set(conn.execute(consulta).scalars())
+    resumen = ResumenDiario.__table__
+    tamaños = conn.execute(
+        select(resumen.c.tamaño).where(resumen.c.juego == juego).distinct()
+    ).scalars().all()
+    ids = set()
+    for tamaño in tamaños:
+        ids.update(conn.execute(consulta.where(tabla.c[columna] == tamaño)).scalars())
+    return ids
+
+
+def resumen_completo(conn, juego, hasta) -> bool:
+    """
+    True si resumen_diario cubre los resultados del juego anteriores a
+    'hasta', es decir, si ningún tamaño y día tiene en la tabla más partidas
+    que las sumadas en su fila de resumen (o no tiene fila). Se comprueba
+    día a día: un resultado con fecha antigua guardado después de actualizar
+    crea una fila de resumen temprana aunque los días siguientes sigan sin
+    resumir. Sólo lee: rellenar lo que falte es cosa de server.migrar.
+    """
+    tabla = MODELOS[juego].__table__
+    resumen = ResumenDiario.__table__
+    columna = TAMAÑOS[juego]
+    tamaño = tabla.c[columna] if columna else literal(0)
+    dia = func.date(tabla.c.timestamp)
+    por_dia = (
+        select(tamaño.label("tamaño"), dia.label("dia"), func.count().label("partidas"))
+        .where(tabla.c.timestamp < hasta)
+        .group_by(tamaño, dia)
+        .subquery()
+    )
+    sin_resumir = conn.execute(
+        select(por_dia.c.dia)
+        .select_from(por_dia.outerjoin(resumen, and_(
+            resumen.c.juego == juego, resumen.c.tamaño == por_dia.c.tamaño,
+            resumen.c.dia == por_dia.c.dia)))
+        .where(por_dia.c.partidas > func.coalesce(resumen.c.partidas, 0))
+        .limit(1)
+    ).first()
+    return sin_resumir is None
+
+
+def compactar(engine, dias=RETENCION_DIAS, top=RETENCION_TOP, lote=RETENCION_LOTE,
+              pausa=RETENCION_PAUSA_MS / 1000, simular=False, parar=None) -> dict:
+    """
+    Borra los resultados anteriores a 'dias' días que no están en ningún
+    top-'top'. Devuelve {juego: filas borradas (o que se borrarían si
+    'simular')}. 'parar' (threading.Event) interrumpe entre lotes.
+    """
+    limite = datetime.utcnow() - timedelta(days=dias)
+    borradas = {}
+    for juego, modelo in MODELOS.items():
+        tabla = modelo.__table__
+        # Sólo lecturas: no bloquea al escritor
+        with engine.connect() as conn:
+            if not resumen_completo(conn, juego, limite):
+                log.warning("resumen_diario no cubre todo el histórico (ejecuta server.migrar); "
+                            "no se borra nada del juego", extra={"datos": {"juego": juego}})
+                continue
+            conservar = protegidos(conn, juego, top)
+        total = ultimo = 0
+        while parar is None or not parar.is_set():
+            with engine.connect() as conn:
+                ids = conn.execute(
+                    select(tabla.c.id)
+                    .where(tabla.c.timestamp < limite, tabla.c.id > ultimo)
+                    .order_by(tabla.c.id).limit(lote)
+                ).scalars().all()
+            if not ids:
+                break
+            ultimo = ids[-1]
+            borrar = [id_ for id_ in ids if id_ not in conservar]
+            if borrar and not simular:
+                with engine.begin() as conn:
+                    conn.execute(delete(tabla).where(tabla.c.id.in_(borrar)))
+            total += len(borrar)
+            if len(ids) < lote:
+                break
+            time.sleep(pausa)
+        borradas[juego] = total
+    if not simular:
+        borrar_claves(engine, limite, lote, pausa, parar)
+    return borradas
+
+
+def borrar_claves(engine, limite, lote, pausa, parar=None) -> int:
+    """Borra, 'lote' cada vez, las claves de idempotencia anteriores a 'limite'."""
+    tabla = ClaveIdempotencia.__table__
+    total = 0
+    while parar is None or not parar.is_set():
+        viejas = select(tabla.c.clave).where(tabla.c.creado < limite).limit(lote).scalar_subquery()
+        with engine.begin() as conn:
+            n = conn.execute(delete(tabla).where(tabla.c.clave.in_(viejas))).rowcount
+        total += n
+        if n < lote:
+            break
+        time.sleep(pausa)
+    return total
+
+
+def recuperar_espacio(engine, paginas=RETENCION_VACUUM_PAGINAS, pausa=RETENCION_PAUSA_MS / 1000,
+                      parar=None) -> int:
+    """
+    Devuelve al sistema las páginas libres, 'paginas' cada vez, si la base
+    de datos está en auto_vacuum=INCREMENTAL. Devuelve cuántas se liberaron.
+    """
+    conn = engine.raw_connection()
+    try:
+        sqlite = conn.driver_connection
+        if sqlite.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            log.info("La base de datos no tiene auto_vacuum=INCREMENTAL; usa --vacuum una vez")
+            return 0
+        liberadas = 0
+        while parar is None or not parar.is_set():
+            libres = sqlite.execute("PRAGMA freelist_count").fetchone()[0]
+            if not libres:
+                break
+            # Con execute() cada paso libera una sola página; executescript
+            # ejecuta el PRAGMA hasta el final
+            sqlite.executescript(f"PRAGMA incremental_vacuum({paginas});")
+            liberadas += min(libres, paginas)
+            time.sleep(pausa)
+        sqlite.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        return liberadas
+    finally:
+        conn.close()
+
+
+def vacuum_completo(engine):
+    """VACUUM completo; de paso deja la base de datos en auto_vacuum=INCREMENTAL."""
+    conn = engine.raw_connection()
+    try:
+        conn.driver_connection.executescript("PRAGMA auto_vacuum=INCREMENTAL; VACUUM;")
+    finally:
+        conn.close()
+
+
+def ejecutar(engine, parar=None, **opciones) -> dict:
+    """compactar() + recuperar_espacio(), con una línea de registro del resultado."""
+    inicio = time.perf_counter()
+    borradas = compactar(engine, parar=parar, **opciones)
+    liberadas = 0 if opciones.get("simular") else recuperar_espacio(engine, parar=parar)
+    log.info("Retención completada", extra={"datos": {
+        "borradas": borradas, "paginas_liberadas": liberadas,
+        "simulada": bool(opciones.get("simular")), "interrumpida": parar is not None and parar.is_set(),
+        "duracion_s": time.perf_counter() - inicio}})
+    return borradas
+
+
+class RetencionPeriodica:
+    """Hilo que ejecuta la retención cada 'intervalo' segundos."""
+
+    def __init__(self, engine_=None, intervalo=RETENCION_INTERVALO):
+        self.engine = engine_ or engine
+        self.intervalo = intervalo
+        self._parar = threading.Event()
+        self._hilo = None
+
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self._bucle, name="retencion", daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        """Interrumpe la pasada en curso (entre lotes) y para el hilo."""
+        if self._hilo is None:
+            return
+        self._parar.set()
+        self._hilo.join()
+        self._hilo = None
+
+    def _bucle(self):
+        # La primera pasada poco después de arrancar: con reinicios más
+        # frecuentes que 'intervalo' nunca llegaría a ejecutarse
+        espera = min(60.0, self.intervalo)
+        while not self._parar.wait(espera):
+            try:
+                ejecutar(self.engine, parar=self._parar)
+            except Exception:
+                log.exception("Error en la retención del histórico")
+            espera = self.intervalo
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Borra el histórico antiguo conservando los tops")
+    parser.add_argument("--dias", type=int, default=RETENCION_DIAS or 90,
+                        help="antigüedad mínima (días) de lo que se borra")
+    parser.add_argument("--top", type=int, default=RETENCION_TOP,
+                        help=f"puestos que se conservan por juego y tamaño (por defecto {RETENCION_TOP})")
+    parser.add_argument("--lote", type=int, default=RETENCION_LOTE,
+                        help=f"filas por transacción de borrado (por defecto {RETENCION_LOTE})")
+    parser.add_argument("--simular", action="store_true", help="sólo cuenta lo que se borraría")
+    parser.add_argument("--vacuum", action="store_true",
+                        help="VACUUM completo al final (bloquea las escrituras mientras dura)")
+    args = parser.parse_args()
+
+    registro.configurar()
+    # Bases de datos anteriores a resumen_diario: se crea la tabla (vacía, así
+    # que no se borra nada hasta pasar server.migrar)
+    init_db()
+    try:
+        borradas = ejecutar(engine, dias=args.dias, top=max(args.top, 1), lote=args.lote,
+                            simular=args.simular)
+        if args.vacuum and not args.simular:
+            vacuum_completo(engine)
+        verbo = "se borrarían" if args.simular else "borradas"
+        for juego, total in borradas.items():
+            print(f"{juego}: {total} filas {verbo}")
+    finally:
+        registro.detener()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Utilidades comunes de los tests (se ejecutan desde la raíz del proyecto
+con `python -m pytest`).
+"""
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+
+def puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Servidor:
+    """Servidor real en un subproceso, con su base de datos en un directorio temporal."""
+
+    def __init__(self, directorio, modulo="server.main", args=(), **entorno):
+        self.directorio = directorio
+        self.modulo = modulo
+        self.args = list(args)
+        self.port = puerto_libre()
+        self.entorno = dict(os.environ)
+        self.entorno.update({
+            "PYTHONPATH": RAIZ,
+            "ARCADE_HOST": "127.0.0.1",
+            "ARCADE_PORT": str(self.port),
+            "ARCADE_REGISTRO_NIVEL": "WARNING",
+            "ARCADE_METRICAS_INTERVALO": "0",
+        })
+        self.entorno.update({f"ARCADE_{k}": str(v) for k, v in entorno.items()})
+        self.proceso = None
+
+    def arrancar(self, espera=10.0):
+        self.proceso = subprocess.Popen(
+            [sys.executable, "-m", self.modulo, *self.args], cwd=self.directorio, env=self.entorno)
+        limite = time.monotonic() + espera
+        while time.monotonic() < limite:
+            try:
+                socket.create_connection(("127.0.0.1", self.port), timeout=0.2).close()
+                return self
+            except OSError:
+                if self.proceso.poll() is not None:
+                    raise RuntimeError(f"El servidor terminó con código {self.proceso.returncode}")
+                time.sleep(0.05)
+        raise RuntimeError("El servidor no empezó a escuchar")
+
+    def parar(self):
+        if self.proceso is not None and self.proceso.poll() is None:
+            self.proceso.send_signal(signal.SIGTERM)
+            try:
+                self.proceso.wait(15)
+            except subprocess.TimeoutExpired:
+                self.proceso.kill()
+                self.proceso.wait()
+        self.proceso = None
+
+
+@pytest.fixture
+def servidor(tmp_path):
+    """Fábrica de servidores: servidor(**ARCADE_*) lo arranca; se paran al terminar."""
+    creados = []
+
+    def crear(modulo="server.main", args=(), **entorno):
+        srv = Servidor(str(tmp_path), modulo, args, **entorno).arrancar()
+        creados.append(srv)
+        return srv
+
+    yield crear
+    # Sin conexiones del pool abiertas, la parada no espera la gracia
+    from client.common import communication
+    communication.cerrar_conexiones()
+    for srv in creados:
+        srv.parar()
+
+
+@pytest.fixture(autouse=True)
+def _sin_pools():
+    """Cada test empieza sin conexiones reutilizadas de otro servidor."""
+    yield
+    from client.common import communication
+    communication.cerrar_conexiones()
@@ -0,0 +1,87 @@
+import errno
+
+import pytest
+
+from server.almacen import crear_fila
+from server.almacen.log import AlmacenLog
+
+
+def fila(movimientos):
+    return crear_fila("hanoi", {"discos": 3, "movimientos": movimientos, "completado": True},
+                      "2024-05-01T12:00:00Z")
+
+
+def abrir(ruta):
+    almacen = AlmacenLog(str(ruta), fsync=False)
+    almacen.iniciar()
+    return almacen
+
+
+def test_linea_cortada_no_se_come_la_siguiente_escritura(tmp_path):
+    ruta = tmp_path / "resultados.log"
+    almacen = abrir(ruta)
+    almacen.guardar_lote([fila(7)])
+    almacen.cerrar()
+    # Caída a mitad de escribir una línea
+    with open(ruta, "ab") as f:
+        f.write(b'{"juego": "hanoi", "id": 2, "disc')
+
+    almacen = abrir(ruta)
+    [entry] = almacen.guardar_lote([fila(9)])
+    assert entry["id"] == 2
+    almacen.cerrar()
+
+    almacen = abrir(ruta)
+    assert [e["movimientos"] for e in almacen.ranking("hanoi", 10)] == [7, 9]
+    assert ruta.read_bytes().endswith(b"\n")
+    almacen.cerrar()
+
+
+def test_claves_repetidas_sobreviven_al_reinicio(tmp_path):
+    ruta = tmp_path / "resultados.log"
+    almacen = abrir(ruta)
+    juego, columnas = fila(7)
+    almacen.guardar_lote([(juego, dict(columnas, clave="k1"))])
+    almacen.cerrar()
+
+    almacen = abrir(ruta)
+    [entry] = almacen.guardar_lote([(juego, dict(columnas, clave="k1"))])
+    assert entry["repetido"] and entry["id"] == 1
+    assert len(almacen.ranking("hanoi", 10)) == 1
+    almacen.cerrar()
+
+
+class DiscoLleno:
+    """Fichero que escribe la mitad de los datos y falla como con el disco lleno."""
+
+    def __init__(self, fichero):
+        self.fichero = fichero
+
+    def tell(self):
+        return self.fichero.tell()
+
+    def write(self, datos):
+        self.fichero.write(datos[:len(datos) // 2])
+        self.fichero.flush()
+        raise OSError(errno.ENOSPC, "No queda espacio en el dispositivo")
+
+    def close(self):
+        self.fichero.close()
+
+
+def test_lote_fallido_no_deja_una_linea_a_medias(tmp_path):
+    ruta = tmp_path / "resultados.log"
+    almacen = abrir(ruta)
+    almacen.guardar_lote([fila(7)])
+    tamaño = ruta.stat().st_size
+
+    almacen._fichero = DiscoLleno(almacen._fichero)
+    with pytest.raises(OSError):
+        almacen.guardar_lote([fila(8), fila(9)])
+    assert ruta.stat().st_size == tamaño
+
+    almacen.guardar_lote([fila(10)])
+    almacen.cerrar()
+    almacen = abrir(ruta)
+    assert [e["movimientos"] for e in almacen.ranking("hanoi", 10)] == [7, 10]
+    almacen.cerrar()
@@ -0,0 +1,42 @@
+import random
+
+from server.almacen import crear_fila
+from server.almacen.memoria import AlmacenMemoria
+
+
+def test_ranking_y_posicion_como_ordenar_cada_vez():
+    aleatorio = random.Random(1)
+    almacen = AlmacenMemoria()
+    filas = [
+        crear_fila("hanoi", {
+            "discos": aleatorio.randint(3, 5),
+            "movimientos": aleatorio.randint(7, 40),
+            "completado": aleatorio.random() < 0.8,
+        }, "2024-05-01T12:00:00Z")
+        for _ in range(300)
+    ]
+    guardadas = []
+    for inicio in range(0, len(filas), 7):
+        guardadas += almacen.guardar_lote(filas[inicio:inicio + 7])
+
+    for tamaño in (None, 3, 4, 5):
+        esperado = sorted(
+            (e for e in guardadas
+             if e["completado"] and (tamaño is None or e["discos"] == tamaño)),
+            key=lambda e: (e["movimientos"], e["id"]))
+
+        paginas, despues = [], None
+        while True:
+            pagina = almacen.ranking("hanoi", 10, tamaño, despues)
+            paginas += pagina
+            if len(pagina) < 10:
+                break
+            despues = [pagina[-1]["movimientos"], pagina[-1]["id"]]
+        assert paginas == esperado
+
+        for pos, e in enumerate(esperado, 1):
+            assert almacen.posicion("hanoi", e["id"], tamaño) == (pos, e)
+
+    incompleta = next(e for e in guardadas if not e["completado"])
+    assert almacen.posicion("hanoi", incompleta["id"]) is None
+    assert almacen.top("hanoi", 3) == almacen.ranking("hanoi", 3)
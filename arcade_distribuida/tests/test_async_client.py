@@ -0,0 +1,31 @@
+import asyncio
+import json
+
+from client.common.async_client import ClienteAsync
+
+
+async def servidor_en_orden():
+    """Servidor que responde en orden y sin id_peticion (como un error sin id)."""
+    async def atender(reader, writer):
+        while linea := await reader.readline():
+            eco = json.loads(linea)["n"]
+            writer.write((json.dumps({"acción": "confirmación", "eco": eco}) + "\n").encode())
+        writer.close()
+
+    srv = await asyncio.start_server(atender, "127.0.0.1", 0)
+    return srv, srv.sockets[0].getsockname()[1]
+
+
+def test_cancelar_esperando_turno_no_desalinea_las_respuestas():
+    async def probar():
+        srv, port = await servidor_en_orden()
+        async with srv, ClienteAsync("127.0.0.1", port, binario=False, timeout=2) as cliente:
+            async with cliente._escritura:
+                tarea = asyncio.create_task(cliente.peticion({"n": 1}))
+                await asyncio.sleep(0.05)
+                tarea.cancel()
+            assert not cliente._pendientes
+            resp = await cliente.peticion({"n": 2})
+            assert resp["eco"] == 2
+
+    asyncio.run(probar())
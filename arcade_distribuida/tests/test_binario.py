@@ -0,0 +1,87 @@
+import socket
+
+import pytest
+
+from client.common import mensajes
+from client.common.communication import PoolConexiones
+from protocolo import binario
+
+TS = "2024-05-01T10:20:30.123456Z"
+
+
+def ida_y_vuelta(msg):
+    trama = binario.codificar(msg)
+    assert binario.es_binario(trama)
+    contenidos = binario.LectorBinario().alimentar(trama)
+    assert len(contenidos) == 1
+    return contenidos[0], binario.decodificar(contenidos[0])
+
+
+@pytest.mark.parametrize("msg", [
+    dict(mensajes.resultado_nreinas(8, 120, True), timestamp=TS),
+    dict(mensajes.resultado_caballo((-1, 4), 63, False), timestamp=TS),
+    dict(mensajes.resultado_hanoi(5, 31, True), timestamp=TS),
+    dict(mensajes.solicitar_mejores("caballo"), timestamp=TS),
+    {"acción": "confirmación", "status": "ok", "timestamp": TS, "mensaje": "Resultado guardado"},
+    {"acción": "confirmación", "status": "ok", "timestamp": TS, "mensaje": "Resultado guardado",
+     "percentil": 87.5},
+    {"acción": "confirmación", "status": "ok", "timestamp": TS, "mensaje": "Resultado guardado",
+     "percentil": 33.3},
+    {"acción": "confirmación", "status": "ok", "timestamp": TS, "mensaje": "Resultado guardado",
+     "percentil": 100.0},
+    {"acción": "confirmación", "status": "ok", "timestamp": TS, "mejores": [
+        {"id": 7, "N": 8, "resuelto": True, "intentos": 3, "timestamp": TS},
+        {"id": 9, "N": 6, "resuelto": False, "intentos": 40, "timestamp": TS},
+    ]},
+    {"acción": "error", "error": {"code": 400, "mensaje": "Petición inválida"}, "timestamp": TS},
+])
+def test_los_formatos_fijos_se_reconstruyen_igual(msg):
+    contenido, decodificado = ida_y_vuelta(msg)
+    assert contenido[0] != binario.JSON
+    assert decodificado == msg
+
+
+@pytest.mark.parametrize("msg", [
+    mensajes.solicitar_ranking("hanoi", 10, tamaño=3),
+    dict(mensajes.resultado_hanoi(3, 7, True), clave="abc"),
+    dict(mensajes.resultado_hanoi(3, 2 ** 40, True), timestamp=TS),
+    {"acción": "confirmación", "status": "ok", "timestamp": TS, "mensaje": "Resultado guardado",
+     "percentil": 12.345},
+])
+def test_lo_que_no_encaja_viaja_como_json(msg):
+    contenido, decodificado = ida_y_vuelta(msg)
+    assert contenido[0] == binario.JSON
+    assert decodificado == msg
+
+
+def test_el_servidor_detecta_el_protocolo_de_cada_conexion(servidor):
+    srv = servidor(ALMACEN="memoria")
+    con_binario = PoolConexiones("127.0.0.1", srv.port, binario=True)
+    con_json = PoolConexiones("127.0.0.1", srv.port, binario=False)
+    try:
+        assert con_binario.peticion(mensajes.resultado_hanoi(3, 7, True))["status"] == "ok"
+        assert con_json.peticion(mensajes.resultado_hanoi(3, 9, True))["status"] == "ok"
+
+        mejores = con_binario.peticion(mensajes.solicitar_mejores("hanoi"))["mejores"]
+        assert mejores == con_json.peticion(mensajes.solicitar_mejores("hanoi"))["mejores"]
+        assert [m["movimientos"] for m in mejores] == [7, 9]
+
+        # Una acción sin formato fijo por la misma conexión binaria
+        ranking = con_binario.peticion(mensajes.solicitar_ranking("hanoi", 10))["ranking"]
+        assert [e["movimientos"] for e in ranking] == [7, 9]
+    finally:
+        con_binario.cerrar()
+        con_json.cerrar()
+
+
+def test_la_confirmacion_con_percentil_va_en_formato_fijo(servidor):
+    srv = servidor(ALMACEN="memoria")
+    with socket.create_connection(("127.0.0.1", srv.port), timeout=5) as sock:
+        lector = binario.LectorBinario()
+        for movimientos in (9, 7):
+            sock.sendall(binario.codificar(mensajes.resultado_hanoi(3, movimientos, True)))
+            contenidos = []
+            while not contenidos:
+                contenidos = lector.alimentar(sock.recv(4096))
+    assert contenidos[0][:2] == bytes((binario.CONFIRMACION, binario._CONF_GUARDADO_PCT))
+    assert binario.decodificar(contenidos[0])["percentil"] == 100.0
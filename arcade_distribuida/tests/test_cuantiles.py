@@ -0,0 +1,40 @@
+import json
+
+from server.cuantiles import Cuantiles
+
+
+def partida(id_, movimientos):
+    return {"id": id_, "discos": 3, "movimientos": movimientos, "completado": True}
+
+
+def test_no_cuenta_dos_veces_lo_recargado(tmp_path):
+    ruta = tmp_path / "cuantiles.json"
+    antes = Cuantiles(k=50)
+    for id_ in range(1, 11):
+        antes.registrar("hanoi", partida(id_, 7 + id_))
+    ruta.write_text(json.dumps(antes.a_dict()))
+
+    despues = Cuantiles(k=50)
+    despues.cargar(str(ruta))
+    # Lo que aún esperaba en la cola de un trabajador reiniciado: ya contado
+    # hasta el id 10, nuevo a partir del 11
+    for id_ in range(8, 13):
+        despues.registrar("hanoi", partida(id_, 7 + id_))
+
+    assert despues.a_dict()["bocetos"]["hanoi:3"]["n"] == 12
+
+
+def test_el_percentil_no_compara_el_resultado_consigo_mismo():
+    cuantiles = Cuantiles(k=50)
+    primera = partida(1, 20)
+    cuantiles.registrar("hanoi", primera)
+    assert cuantiles.percentil("hanoi", primera) is None
+
+    # Peor que la única otra partida: no mejora a nadie
+    peor = partida(2, 30)
+    cuantiles.registrar("hanoi", peor)
+    assert cuantiles.percentil("hanoi", peor) == 0.0
+
+    mejor = partida(3, 10)
+    cuantiles.registrar("hanoi", mejor)
+    assert cuantiles.percentil("hanoi", mejor) == 100.0
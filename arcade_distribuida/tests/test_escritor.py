@@ -0,0 +1,77 @@
+import time
+
+import pytest
+
+from server.escritor import EscritorPorLotes
+
+
+class AlmacenFalso:
+    """Guarda filas (texto) y falla el lote entero si alguna es "mala"."""
+
+    def __init__(self):
+        self.commits = []
+
+    def guardar_lote(self, filas):
+        if "mala" in filas:
+            raise ValueError("fila inválida")
+        self.commits.append(list(filas))
+        return [{"id": fila} for fila in filas]
+
+
+def test_un_solo_commit_resuelve_cada_future():
+    almacen = AlmacenFalso()
+    escritor = EscritorPorLotes(almacen, tam_lote=10, latencia_max=0.2)
+    futuros = [escritor.encolar(f"f{i}") for i in range(3)] + [escritor.encolar_lote(["g1", "g2"])]
+    escritor.iniciar()
+    try:
+        assert [f.result(timeout=5) for f in futuros] == [
+            {"id": "f0"}, {"id": "f1"}, {"id": "f2"}, [{"id": "g1"}, {"id": "g2"}]]
+        assert almacen.commits == [["f0", "f1", "f2", "g1", "g2"]]
+    finally:
+        escritor.detener()
+
+
+def test_al_confirmar_se_llama_antes_de_resolver():
+    vistos = []
+    escritor = EscritorPorLotes(AlmacenFalso(), latencia_max=0.2,
+                                al_confirmar=lambda guardadas: vistos.append(
+                                    (guardadas, [f.done() for f in futuros])))
+    futuros = [escritor.encolar("a"), escritor.encolar("b")]
+    escritor.iniciar()
+    try:
+        for f in futuros:
+            f.result(timeout=5)
+        assert vistos == [([("a", {"id": "a"}), ("b", {"id": "b"})], [False, False])]
+    finally:
+        escritor.detener()
+
+
+def test_un_grupo_invalido_no_tumba_a_los_demas():
+    almacen = AlmacenFalso()
+    escritor = EscritorPorLotes(almacen, latencia_max=0.2)
+    buena = escritor.encolar("a")
+    mala = escritor.encolar_lote(["b", "mala"])
+    otra = escritor.encolar("c")
+    escritor.iniciar()
+    try:
+        assert buena.result(timeout=5) == {"id": "a"}
+        assert otra.result(timeout=5) == {"id": "c"}
+        with pytest.raises(ValueError):
+            mala.result(timeout=5)
+        assert almacen.commits == [["a"], ["c"]]
+        assert escritor.estadisticas()["errores"] == 1
+    finally:
+        escritor.detener()
+
+
+def test_detener_vacia_la_cola():
+    almacen = AlmacenFalso()
+    # Con esta latencia el lote sólo se confirmaría antes por la parada
+    escritor = EscritorPorLotes(almacen, latencia_max=30)
+    escritor.iniciar()
+    futuros = [escritor.encolar(f"f{i}") for i in range(5)]
+    inicio = time.monotonic()
+    escritor.detener(timeout=10)
+    assert time.monotonic() - inicio < 5
+    assert all(f.done() and f.exception() is None for f in futuros)
+    assert sum(almacen.commits, []) == [f"f{i}" for i in range(5)]
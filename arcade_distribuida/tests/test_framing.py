@@ -0,0 +1,48 @@
+import json
+import socket
+
+import pytest
+
+from protocolo.framing import LectorTramas, TramaDemasiadoGrande
+
+MENSAJE = json.dumps({"acción": "confirmación"}, ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+def test_caracter_multibyte_partido_entre_dos_recv():
+    corte = MENSAJE.index("ó".encode("utf-8")) + 1
+    a, b = socket.socketpair()
+    with a, b:
+        lector = LectorTramas()
+        a.sendall(MENSAJE[:corte])
+        assert lector.leer_de(b) == []
+        a.sendall(MENSAJE[corte:])
+        tramas = lector.leer_de(b)
+        a.close()
+        assert lector.leer_de(b) is None
+    assert [json.loads(t) for t in tramas] == [{"acción": "confirmación"}]
+
+
+def test_varias_tramas_en_un_mismo_bloque():
+    lector = LectorTramas()
+    assert lector.alimentar(b"uno\ndos\ntr") == [b"uno", b"dos"]
+    assert lector.pendiente() == 2
+    assert lector.alimentar(b"es\n") == [b"tres"]
+    assert lector.pendiente() == 0
+
+
+def test_trama_recibida_byte_a_byte():
+    lector = LectorTramas()
+    tramas = []
+    for i in range(len(MENSAJE)):
+        tramas += lector.alimentar(MENSAJE[i:i + 1])
+    assert tramas == [MENSAJE[:-1]]
+
+
+def test_trama_demasiado_grande():
+    with pytest.raises(TramaDemasiadoGrande):
+        LectorTramas(max_trama=8).alimentar(b"0123456789\n")
+    # Sin separador también: no se acumula sin límite
+    lector = LectorTramas(max_trama=8)
+    assert lector.alimentar(b"01234567") == []
+    with pytest.raises(TramaDemasiadoGrande):
+        lector.alimentar(b"8")
@@ -0,0 +1,28 @@
+import threading
+
+from client.common import ia_client
+from client.common.threading_utils import ejecutor
+
+
+def test_el_chat_espera_al_modelo_sin_ocupar_el_pool(monkeypatch):
+    listo = threading.Event()
+
+    def cargar_despacio():
+        listo.wait(5)
+        return lambda prompt, **_: [{"generated_text": "hola"}]
+
+    monkeypatch.setattr(ia_client, "_get_pipe", cargar_despacio)
+    monkeypatch.setattr(ia_client, "_precarga", None)
+
+    respuestas = []
+    sugerencias = [ia_client.solicitar_sugerencia_async("pregunta", respuestas.append)
+                   for _ in range(2 * ejecutor().max_trabajadores)]
+
+    # Con el modelo aún cargando el pool sigue libre para el resto del cliente
+    assert ejecutor().enviar(lambda: "libre").result(timeout=2) == "libre"
+    assert ejecutor().estadisticas()["activos"] == 0
+
+    listo.set()
+    for sugerencia in sugerencias:
+        sugerencia.result(timeout=5)
+    assert respuestas == ["hola"] * len(sugerencias)
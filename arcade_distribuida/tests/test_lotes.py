@@ -0,0 +1,58 @@
+from client.common import communication, mensajes
+
+
+def lote(*resultados):
+    return communication.construir_lote(list(resultados))
+
+
+def enviar(srv, msg):
+    return communication.send_and_receive(msg, "127.0.0.1", srv.port)
+
+
+def test_los_invalidos_no_impiden_guardar_el_resto(servidor):
+    srv = servidor(ALMACEN="memoria")
+    msg = lote(mensajes.resultado_hanoi(3, 7, True), mensajes.resultado_nreinas(8, 20, True))
+    msg["resultados"][1:1] = ["no es un objeto", {"juego": "ajedrez", "datosPartida": {}}]
+
+    resp = enviar(srv, msg)
+
+    assert (resp["guardados"], resp["errores"]) == (2, 2)
+    assert [e["indice"] for e in resp["resultados"]] == [0, 1, 2, 3]
+    assert [e["status"] for e in resp["resultados"]] == ["ok", "error", "error", "ok"]
+    assert resp["resultados"][0]["id"] and resp["resultados"][3]["id"]
+    assert "mensaje" in resp["resultados"][1] and "mensaje" in resp["resultados"][2]
+
+
+def test_lote_mayor_que_el_limite_se_rechaza_entero(servidor):
+    srv = servidor(ALMACEN="memoria", RESULTADOS_POR_MENSAJE=3)
+    resp = enviar(srv, lote(*[mensajes.resultado_hanoi(3, 7, True)] * 4))
+    assert resp["acción"] == "error"
+
+    resp = enviar(srv, lote(*[mensajes.resultado_hanoi(3, 7, True)] * 3))
+    assert resp["guardados"] == 3
+
+
+def test_las_claves_repetidas_devuelven_el_mismo_id(servidor):
+    srv = servidor(ALMACEN="memoria")
+    partidas = [dict(mensajes.resultado_hanoi(3, m, True), clave=f"clave-{m}") for m in (7, 9)]
+
+    primera = enviar(srv, lote(*partidas))
+    segunda = enviar(srv, lote(*partidas))
+
+    assert [e["id"] for e in segunda["resultados"]] == [e["id"] for e in primera["resultados"]]
+    assert not any(e.get("repetido") for e in primera["resultados"])
+    assert all(e["repetido"] for e in segunda["resultados"])
+    ranking = enviar(srv, mensajes.solicitar_ranking("hanoi", 10))["ranking"]
+    assert [e["movimientos"] for e in ranking] == [7, 9]
+
+
+def test_enviar_lote_trocea_y_conserva_los_indices(servidor):
+    srv = servidor(ALMACEN="memoria")
+    partidas = [mensajes.resultado_hanoi(3, m, True) for m in (7, 8, 9, 10, 11)]
+    partidas[3] = {"juego": "ajedrez", "datosPartida": {}}
+
+    estados = communication.enviar_lote(partidas, "127.0.0.1", srv.port, tam_max=2)
+
+    assert [e["indice"] for e in estados] == [0, 1, 2, 3, 4]
+    assert [e["status"] for e in estados] == ["ok", "ok", "ok", "error", "ok"]
+    assert len({e["id"] for e in estados if "id" in e}) == 4
@@ -0,0 +1,96 @@
+from datetime import date, datetime
+
+from sqlalchemy import create_engine, insert, inspect, select
+
+from server.db import Base
+from server import migrar
+from server.migrar import rellenar_resumen
+from server.models import ResultadoHanoi, ResumenDiario
+
+
+def partida(dia, hora, discos, movimientos):
+    return {"discos": discos, "movimientos": movimientos, "completado": True,
+            "timestamp": datetime(2024, 5, dia, hora)}
+
+
+def resumen_hanoi(conn):
+    resumen = ResumenDiario.__table__
+    filas = conn.execute(
+        select(resumen.c.tamaño, resumen.c.dia, resumen.c.partidas, resumen.c.suma_valor,
+               resumen.c.mejor_valor)
+        .where(resumen.c.juego == "hanoi").order_by(resumen.c.tamaño, resumen.c.dia)
+    ).all()
+    return [tuple(f) for f in filas]
+
+
+def test_rellena_los_dias_anteriores_al_primero_resumido(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'resultados.db'}")
+    Base.metadata.create_all(engine)
+    hanoi, resumen = ResultadoHanoi.__table__, ResumenDiario.__table__
+    with engine.begin() as conn:
+        # Guardadas antes de actualizar el servidor: sin resumir
+        conn.execute(insert(hanoi), [
+            partida(1, 10, 3, 9), partida(1, 11, 4, 20), partida(2, 9, 3, 8),
+        ])
+        # El servidor nuevo arrancó el día 2 a mediodía y ya resumió lo suyo
+        conn.execute(insert(hanoi), [partida(2, 15, 3, 7), partida(3, 10, 3, 7)])
+        conn.execute(insert(resumen), [
+            {"juego": "hanoi", "tamaño": 3, "dia": date(2024, 5, 2), "partidas": 1,
+             "completadas": 1, "suma_valor": 7, "suma_valor_completadas": 7, "mejor_valor": 7},
+            {"juego": "hanoi", "tamaño": 3, "dia": date(2024, 5, 3), "partidas": 1,
+             "completadas": 1, "suma_valor": 7, "suma_valor_completadas": 7, "mejor_valor": 7},
+        ])
+
+    with engine.begin() as conn:
+        assert rellenar_resumen(conn) == 3
+    with engine.begin() as conn:
+        assert rellenar_resumen(conn) == 0
+        filas = resumen_hanoi(conn)
+    assert filas == [
+        (3, date(2024, 5, 1), 1, 9, 9),
+        (3, date(2024, 5, 2), 2, 15, 7),
+        (3, date(2024, 5, 3), 1, 7, 7),
+        (4, date(2024, 5, 1), 1, 20, 20),
+    ]
+
+
+def test_un_resultado_antiguo_guardado_tarde_no_deja_dias_sin_rellenar(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'resultados.db'}")
+    Base.metadata.create_all(engine)
+    hanoi, resumen = ResultadoHanoi.__table__, ResumenDiario.__table__
+    with engine.begin() as conn:
+        conn.execute(insert(hanoi), [partida(3, 10, 3, 9), partida(4, 10, 3, 8)])
+        # Tras actualizar, un buzón reenvía una partida del día 1: el servidor
+        # la resume en su día y ese pasa a ser el primero resumido
+        conn.execute(insert(hanoi), [partida(1, 10, 3, 7)])
+        conn.execute(insert(resumen), [
+            {"juego": "hanoi", "tamaño": 3, "dia": date(2024, 5, 1), "partidas": 1,
+             "completadas": 1, "suma_valor": 7, "suma_valor_completadas": 7, "mejor_valor": 7},
+        ])
+
+    with engine.begin() as conn:
+        assert rellenar_resumen(conn) == 2
+        assert resumen_hanoi(conn) == [
+            (3, date(2024, 5, 1), 1, 7, 7),
+            (3, date(2024, 5, 3), 1, 9, 9),
+            (3, date(2024, 5, 4), 1, 8, 8),
+        ]
+
+
+def test_solo_informe_no_crea_nada(tmp_path, monkeypatch, capsys):
+    ruta = tmp_path / "resultados.db"
+    engine = create_engine(f"sqlite:///{ruta}")
+    monkeypatch.setattr(migrar, "engine", engine)
+
+    migrar.migrar(solo_informe=True)
+    assert not ruta.exists()
+
+    # Base de datos antigua: la tabla hanoi sin índices ni resumen_diario
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE hanoi (id INTEGER PRIMARY KEY, discos INTEGER, "
+                             "movimientos INTEGER, completado BOOLEAN, timestamp DATETIME)")
+    migrar.migrar(solo_informe=True)
+
+    assert "top hanoi" in capsys.readouterr().out
+    assert inspect(engine).get_table_names() == ["hanoi"]
+    assert inspect(engine).get_indexes("hanoi") == []
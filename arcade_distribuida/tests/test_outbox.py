@@ -0,0 +1,73 @@
+import json
+
+from client.common import communication, mensajes, outbox
+from client.common.outbox import Buzon
+
+
+def ranking_hanoi(srv):
+    resp = communication.send_and_receive(
+        mensajes.solicitar_ranking("hanoi", 10), "127.0.0.1", srv.port)
+    return [e["movimientos"] for e in resp["ranking"]]
+
+
+def test_reenviar_un_lote_no_duplica_resultados(servidor, tmp_path):
+    srv = servidor(ALMACEN="memoria")
+    partidas = [mensajes.resultado_hanoi(3, movimientos, True) for movimientos in (7, 9, 11)]
+
+    buzon = Buzon(str(tmp_path / "buzon.jsonl"), "127.0.0.1", srv.port)
+    buzon.iniciar()
+    claves = buzon.encolar_lote(partidas)
+    assert buzon.vaciar(5)
+    buzon.detener()
+    assert (tmp_path / "buzon.jsonl").read_text() == ""
+
+    # El lote llegó pero la respuesta no: otro arranque lo reenvía tal cual
+    otro = Buzon(str(tmp_path / "otro.jsonl"), "127.0.0.1", srv.port)
+    otro.iniciar()
+    otro.encolar_lote([dict(p, clave=c) for p, c in zip(partidas, claves)])
+    assert otro.vaciar(5)
+    otro.detener()
+
+    assert ranking_hanoi(srv) == [7, 9, 11]
+
+
+def test_sin_fichero_usable_se_envia_directamente(monkeypatch, tmp_path):
+    enviados = []
+    monkeypatch.setattr(outbox, "RUTA", str(tmp_path / "no-existe" / "buzon.jsonl"))
+    monkeypatch.setattr(outbox, "enviar_lote", enviados.extend)
+
+    clave = outbox.encolar(mensajes.resultado_hanoi(3, 7, True))
+    with outbox._apuntados:
+        assert outbox._apuntados.wait_for(lambda: not outbox._sin_apuntar, 5)
+
+    assert [m["clave"] for m in enviados] == [clave]
+    assert outbox._buzon is None
+
+
+def test_registros_con_otra_forma_se_saltan(tmp_path):
+    ruta = tmp_path / "buzon.jsonl"
+    buena = dict(mensajes.resultado_hanoi(3, 7, True), clave="buena")
+    ruta.write_text("\n".join([
+        '{"r": {}}', '[1, 2]', '"texto"', '{"r": "x", "hechas": 3}', '{"hechas": [["a"]]}',
+        json.dumps({"r": buena}), '{"r": {"clave": "a medias"',
+    ]) + "\n")
+
+    assert list(Buzon(str(ruta))._pendientes) == ["buena"]
+
+
+def test_un_error_inesperado_no_para_el_hilo_de_entrada(monkeypatch):
+    enviados = []
+
+    def buzon_roto():
+        raise KeyError("clave")
+
+    monkeypatch.setattr(outbox, "obtener_buzon", buzon_roto)
+    monkeypatch.setattr(outbox, "enviar_lote", enviados.extend)
+
+    claves = []
+    for movimientos in (7, 9):
+        claves.append(outbox.encolar(mensajes.resultado_hanoi(3, movimientos, True)))
+        with outbox._apuntados:
+            assert outbox._apuntados.wait_for(lambda: not outbox._sin_apuntar, 5)
+
+    assert [m["clave"] for m in enviados] == claves
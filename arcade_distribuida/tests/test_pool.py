@@ -0,0 +1,59 @@
+import json
+import socket
+import threading
+
+import pytest
+
+from client.common import mensajes
+from client.common.communication import PoolConexiones
+
+
+class ServidorQueCorta:
+    """Responde al primer mensaje de cada conexión y corta con el segundo."""
+
+    def __init__(self):
+        self.recibidos = []
+        self._sock = socket.create_server(("127.0.0.1", 0))
+        self.port = self._sock.getsockname()[1]
+        threading.Thread(target=self._aceptar, daemon=True).start()
+
+    def _aceptar(self):
+        while True:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._atender, args=(conn,), daemon=True).start()
+
+    def _atender(self, conn):
+        with conn, conn.makefile("rb") as lineas:
+            for n, linea in enumerate(lineas):
+                self.recibidos.append(json.loads(linea))
+                if n:
+                    return
+                respuesta = {"acción": "confirmación", "status": "ok"}
+                conn.sendall((json.dumps(respuesta) + "\n").encode())
+
+    def cerrar(self):
+        self._sock.close()
+
+
+@pytest.mark.parametrize("mensaje, repite", [
+    (mensajes.solicitar_mejores("hanoi"), True),
+    (dict(mensajes.resultado_hanoi(3, 7, True), clave="abc"), True),
+    (mensajes.resultado_hanoi(3, 7, True), False),
+])
+def test_solo_se_repite_lo_idempotente(mensaje, repite):
+    srv = ServidorQueCorta()
+    pool = PoolConexiones("127.0.0.1", srv.port, timeout=2)
+    try:
+        pool.peticion(mensajes.solicitar_mejores("hanoi"))
+        if repite:
+            assert pool.peticion(mensaje)["status"] == "ok"
+        else:
+            with pytest.raises(ConnectionError):
+                pool.peticion(mensaje)
+        assert srv.recibidos[1:] == [mensaje] * (2 if repite else 1)
+    finally:
+        pool.cerrar()
+        srv.cerrar()
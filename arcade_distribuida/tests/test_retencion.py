@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert, select
+
+from server.db import Base
+from server.migrar import rellenar_resumen
+from server.models import ResultadoHanoi, ResumenDiario
+from server.retencion import compactar, protegidos
+
+
+def crear_base(ruta):
+    engine = create_engine(f"sqlite:///{ruta}")
+    Base.metadata.create_all(engine)
+    viejo = datetime.utcnow() - timedelta(days=30)
+    with engine.begin() as conn:
+        conn.execute(insert(ResultadoHanoi.__table__), [
+            {"discos": discos, "movimientos": movimientos, "completado": True, "timestamp": viejo}
+            for discos in (3, 4) for movimientos in (30, 10, 20, 40)
+        ] + [{"discos": 3, "movimientos": 50, "completado": True, "timestamp": datetime.utcnow()}])
+    return engine
+
+
+def movimientos_por_discos(engine):
+    tabla = ResultadoHanoi.__table__
+    with engine.connect() as conn:
+        filas = conn.execute(select(tabla.c.discos, tabla.c.movimientos)
+                             .order_by(tabla.c.discos, tabla.c.movimientos)).all()
+    return [tuple(f) for f in filas]
+
+
+def test_conserva_el_top_de_cada_tamaño_y_lo_reciente(tmp_path):
+    engine = crear_base(tmp_path / "resultados.db")
+    with engine.begin() as conn:
+        rellenar_resumen(conn)
+    with engine.connect() as conn:
+        assert len(protegidos(conn, "hanoi", 2)) == 4
+
+    borradas = compactar(engine, dias=7, top=2, lote=3, pausa=0)
+
+    assert borradas["hanoi"] == 4
+    assert movimientos_por_discos(engine) == [(3, 10), (3, 20), (3, 50), (4, 10), (4, 20)]
+
+
+def test_sin_resumen_no_borra_nada(tmp_path):
+    engine = crear_base(tmp_path / "resultados.db")
+
+    assert compactar(engine, dias=7, top=2, lote=3, pausa=0).get("hanoi") is None
+    assert len(movimientos_por_discos(engine)) == 9
+
+
+def test_un_resultado_antiguo_guardado_tarde_no_adelanta_el_borrado(tmp_path):
+    engine = crear_base(tmp_path / "resultados.db")
+    antiguo = datetime.utcnow() - timedelta(days=40)
+    with engine.begin() as conn:
+        # Con el resumen ya activo llega una partida de hace 40 días (un buzón
+        # que se reenvía): se resume en su día, pero el de hace 30 sigue sin resumir
+        conn.execute(insert(ResultadoHanoi.__table__), [
+            {"discos": discos, "movimientos": 60, "completado": True, "timestamp": antiguo}
+            for discos in (3, 4)])
+        conn.execute(insert(ResumenDiario.__table__), [
+            {"juego": "hanoi", "tamaño": discos, "dia": antiguo.date(), "partidas": 1,
+             "completadas": 1, "suma_valor": 60, "suma_valor_completadas": 60,
+             "mejor_valor": 60}
+            for discos in (3, 4)])
+
+    assert compactar(engine, dias=7, top=2, lote=3, pausa=0).get("hanoi") is None
+    assert len(movimientos_por_discos(engine)) == 11
+
+    with engine.begin() as conn:
+        rellenar_resumen(conn)
+    assert compactar(engine, dias=7, top=2, lote=3, pausa=0)["hanoi"] == 6
@@ -0,0 +1,34 @@
+import socket
+
+import pytest
+
+from client.common import communication, mensajes
+from protocolo import binario
+
+
+@pytest.mark.parametrize("modo", ["asyncio", "hilos"])
+def test_peticiones_encadenadas_se_atienden_todas(servidor, modo):
+    srv = servidor(args=("--modo", modo))
+    # Tramas binarias de pocos bytes: cientos por cada lectura del servidor
+    peticiones = 2000
+    datos = binario.codificar(mensajes.solicitar_mejores("hanoi")) * peticiones
+    respuestas = []
+    with socket.create_connection(("127.0.0.1", srv.port), timeout=5) as sock:
+        sock.sendall(datos)
+        lector = binario.LectorBinario()
+        while len(respuestas) < peticiones:
+            recibido = sock.recv(65536)
+            assert recibido, "el servidor cerró la conexión"
+            respuestas += [binario.decodificar(t) for t in lector.alimentar(recibido)]
+    assert len(respuestas) == peticiones
+    assert all(r["acción"] == "confirmación" for r in respuestas)
+
+
+def test_multiproceso_guarda_los_cuantiles_de_cada_trabajador(servidor, tmp_path):
+    srv = servidor("server.multiproceso", ("--procesos", "2"))
+    resp = communication.send_and_receive(mensajes.resultado_hanoi(3, 7, True), "127.0.0.1", srv.port)
+    assert resp["status"] == "ok"
+    communication.cerrar_conexiones()
+    srv.parar()
+    assert sorted(p.name for p in tmp_path.glob("cuantiles*.json")) == [
+        "cuantiles-0.json", "cuantiles-1.json"]
@@ -0,0 +1,57 @@
+import threading
+import time
+
+from client.common import communication, mensajes
+
+
+def test_suscripcion_inactiva_no_caduca(servidor):
+    srv = servidor()
+    # Plazo corto para no alargar el test: sólo cubre la conexión y la instantánea
+    tops = communication.escuchar_mejores("hanoi", "127.0.0.1", srv.port, timeout=0.5)
+    assert next(tops) == []
+
+    recibido = []
+    hilo = threading.Thread(target=lambda: recibido.append(next(tops)), daemon=True)
+    hilo.start()
+    # Más que el plazo sin que cambie el top
+    time.sleep(1.5)
+    assert hilo.is_alive()
+
+    communication.send_and_receive(mensajes.resultado_hanoi(3, 7, True), "127.0.0.1", srv.port)
+    hilo.join(5)
+    assert [e["movimientos"] for e in recibido[0]] == [7]
+    tops.close()
+
+
+def test_la_suscripcion_recibe_cada_cambio_del_top(servidor):
+    srv = servidor(ALMACEN="memoria")
+
+    def guardar(movimientos, completado=True):
+        communication.send_and_receive(
+            mensajes.resultado_hanoi(3, movimientos, completado), "127.0.0.1", srv.port)
+
+    sock = communication.connect("127.0.0.1", srv.port)
+    try:
+        communication.send_message(mensajes.suscribir_mejores("hanoi"), sock)
+        instantanea = communication.receive_message(sock)
+        assert instantanea["mejores"] == []
+        version = instantanea["version"]
+
+        for movimientos in (50, 10, 40, 20, 30):
+            guardar(movimientos)
+        cambios = [communication.receive_message(sock) for _ in range(5)]
+        assert [c["acción"] for c in cambios] == ["actualizacion_mejores"] * 5
+        assert [c["version"] for c in cambios] == list(range(version + 1, version + 6))
+        assert [(c["posicion"], c["entra"]["movimientos"], c["sale"]) for c in cambios] == [
+            (0, 50, None), (0, 10, None), (1, 40, None), (1, 20, None), (2, 30, None)]
+        peor = cambios[0]["entra"]["id"]
+
+        # Ni un resultado peor que el top lleno ni uno sin completar lo cambian
+        guardar(60)
+        guardar(1, completado=False)
+        guardar(15)
+        cambio = communication.receive_message(sock)
+        assert cambio["version"] == version + 6
+        assert (cambio["posicion"], cambio["entra"]["movimientos"], cambio["sale"]) == (1, 15, peor)
+    finally:
+        sock.close()
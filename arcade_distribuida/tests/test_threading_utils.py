@@ -0,0 +1,55 @@
+import sys
+import threading
+
+from client.common import threading_utils
+from client.common.threading_utils import ColaLlena, EjecutorAcotado, Planificador
+
+
+def test_la_cola_llena_rechaza_sin_lanzar():
+    pool = EjecutorAcotado(max_trabajadores=1, max_cola=2, nombre="prueba")
+    suelta = threading.Event()
+    ocupado = pool.enviar(suelta.wait, 5)
+    # Espera a que el único hilo tome la tarea y deje la cola vacía
+    while pool.estadisticas()["activos"] == 0:
+        suelta.wait(0.01)
+    en_cola = [pool.enviar(lambda: "ok") for _ in range(2)]
+    rechazada = pool.enviar(lambda: "no")
+
+    assert isinstance(rechazada.exception(timeout=1), ColaLlena)
+    assert pool.estadisticas()["rechazadas"] == 1
+    suelta.set()
+    assert ocupado.result(timeout=5)
+    assert [f.result(timeout=5) for f in en_cola] == ["ok", "ok"]
+
+
+def test_el_planificador_respeta_el_instante_de_cada_llamada():
+    planificador = Planificador(EjecutorAcotado(max_trabajadores=1, nombre="prueba"))
+    orden = []
+    futuros = [planificador.programar(delay, orden.append, nombre)
+               for delay, nombre in ((0.3, "c"), (0.1, "a"), (0.2, "b"), (0.1, "a2"))]
+    cancelada = planificador.programar(0.15, orden.append, "cancelada")
+    assert cancelada.cancel()
+    for f in futuros:
+        f.result(timeout=5)
+    assert orden == ["a", "a2", "b", "c"]
+
+
+def test_las_excepciones_de_las_tareas_no_se_pierden(monkeypatch):
+    vistas = []
+    avisadas = threading.Semaphore(0)
+
+    def excepthook(tipo, valor, tb):
+        vistas.append(valor)
+        avisadas.release()
+
+    monkeypatch.setattr(sys, "excepthook", excepthook)
+
+    def falla():
+        raise KeyError("perdida")
+
+    threading_utils.start_thread(falla)
+    threading_utils.delayed_call(0, falla)
+    threading_utils.start_thread(lambda: None).result(timeout=5)
+
+    assert avisadas.acquire(timeout=5) and avisadas.acquire(timeout=5)
+    assert [type(e) for e in vistas] == [KeyError, KeyError]
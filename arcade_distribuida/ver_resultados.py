@@ -1,22 +1,139 @@
 # ver_resultados.py
+"""
+Exporta los resultados guardados en resultados.db como JSON Lines o CSV.
+
+Las filas se leen por bloques (fetchmany) y se escriben según llegan, así
+que la memoria no depende del tamaño de la base de datos. La base de datos
+se abre en sólo lectura (mode=ro): en modo WAL la exportación lee una
+instantánea y no bloquea las escrituras del servidor en marcha.
+
+Uso (desde la raíz del proyecto):
+    python ver_resultados.py                              # todo, JSONL por la salida estándar
+    python ver_resultados.py --juego hanoi --formato csv --salida hanoi.csv
+    python ver_resultados.py --desde 2024-05-01 --hasta 2024-05-31 --completado
+"""
+import argparse
+import csv
+import json
+import os
 import sqlite3
-from pprint import pprint
+import sys
+from datetime import date
+from pathlib import Path
+
+# juego -> (tabla, columna de partida completada)
+TABLAS = {
+    "nreinas": ("nreinas", "resuelto"),
+    "caballo": ("knight_tour", "completado"),
+    "hanoi": ("hanoi", "completado"),
+}
+
+# Filas pedidas a SQLite en cada fetchmany
+TAM_BLOQUE = 1000
+
+
+def abrir_solo_lectura(ruta) -> sqlite3.Connection:
+    """Abre 'ruta' en sólo lectura (falla si no existe en lugar de crearla)."""
+    uri = Path(ruta).resolve().as_uri() + "?mode=ro"
+    return sqlite3.connect(uri, uri=True)
+
+
+def consulta(juego, desde=None, hasta=None, completado=None) -> tuple:
+    """SQL y parámetros de las filas de 'juego' que cumplen los filtros."""
+    tabla, columna = TABLAS[juego]
+    condiciones, params = [], []
+    if desde is not None:
+        condiciones.append("timestamp >= ?")
+        params.append(desde.isoformat())
+    if hasta is not None:
+        # 'hasta' es un día completo: todo lo anterior al día siguiente
+        condiciones.append("timestamp < date(?, '+1 day')")
+        params.append(hasta.isoformat())
+    if completado is not None:
+        condiciones.append(f"{columna} = ?")
+        params.append(int(completado))
+    sql = f"SELECT * FROM {tabla}"
+    if condiciones:
+        sql += " WHERE " + " AND ".join(condiciones)
+    return sql + " ORDER BY id", params
+
+
+def filas(conn, juego, **filtros):
+    """Genera las filas de 'juego' como diccionarios, TAM_BLOQUE cada vez."""
+    sql, params = consulta(juego, **filtros)
+    cur = conn.execute(sql, params)
+    columnas = [d[0] for d in cur.description]
+    while True:
+        bloque = cur.fetchmany(TAM_BLOQUE)
+        if not bloque:
+            break
+        for fila in bloque:
+            yield {"juego": juego, **dict(zip(columnas, fila))}
+
+
+def columnas(conn, juegos) -> list:
+    """'juego' más la unión de las columnas de las tablas, en orden."""
+    resultado = ["juego"]
+    for juego in juegos:
+        tabla, _ = TABLAS[juego]
+        for fila in conn.execute(f"PRAGMA table_info({tabla})"):
+            if fila[1] not in resultado:
+                resultado.append(fila[1])
+    return resultado
+
+
+def exportar(conn, salida, juegos, formato="jsonl", **filtros) -> int:
+    """Escribe en 'salida' las filas de 'juegos'. Devuelve cuántas."""
+    total = 0
+    if formato == "csv":
+        # Con varios juegos, las columnas que no tiene una tabla quedan vacías
+        escritor = csv.DictWriter(salida, fieldnames=columnas(conn, juegos), restval="")
+        escritor.writeheader()
+        escribir = escritor.writerow
+    else:
+        def escribir(fila):
+            salida.write(json.dumps(fila, ensure_ascii=False) + "\n")
+    for juego in juegos:
+        for fila in filas(conn, juego, **filtros):
+            escribir(fila)
+            total += 1
+    return total
 
-def mostrar_tabla(cur, nombre):
-    cur.execute(f"PRAGMA table_info({nombre});")
-    cols = [row[1] for row in cur.fetchall()]
-    cur.execute(f"SELECT * FROM {nombre};")
-    filas = cur.fetchall()
-    print(f"\n=== {nombre} ===")
-    print(cols)
-    pprint(filas)
 
 def main():
-    db = sqlite3.connect("resultados.db")
-    cur = db.cursor()
-    for tabla in ("nreinas", "knight_tour", "hanoi"):
-        mostrar_tabla(cur, tabla)
-    db.close()
+    parser = argparse.ArgumentParser(description="Exporta los resultados de resultados.db")
+    parser.add_argument("--db", default="resultados.db", help="base de datos (por defecto resultados.db)")
+    parser.add_argument("--juego", action="append", choices=tuple(TABLAS),
+                        help="juego a exportar (se puede repetir; por defecto todos)")
+    parser.add_argument("--desde", type=date.fromisoformat, help="primer día (AAAA-MM-DD), incluido")
+    parser.add_argument("--hasta", type=date.fromisoformat, help="último día (AAAA-MM-DD), incluido")
+    estado = parser.add_mutually_exclusive_group()
+    estado.add_argument("--completado", dest="completado", action="store_true", default=None,
+                        help="sólo partidas completadas/resueltas")
+    estado.add_argument("--no-completado", dest="completado", action="store_false",
+                        help="sólo partidas sin completar")
+    parser.add_argument("--formato", choices=("jsonl", "csv"), default="jsonl")
+    parser.add_argument("--salida", help="fichero de salida (por defecto la salida estándar)")
+    args = parser.parse_args()
+
+    try:
+        conn = abrir_solo_lectura(args.db)
+    except sqlite3.OperationalError as e:
+        sys.exit(f"[ERROR] No se pudo abrir {args.db}: {e}")
+    salida = open(args.salida, "w", encoding="utf-8", newline="") if args.salida else sys.stdout
+    try:
+        total = exportar(conn, salida, args.juego or list(TABLAS), args.formato,
+                         desde=args.desde, hasta=args.hasta, completado=args.completado)
+    except BrokenPipeError:
+        # La salida se cerró antes de tiempo (p. ej. "| head"): sin traza
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+    finally:
+        if salida is not sys.stdout:
+            salida.close()
+        conn.close()
+    print(f"{total} filas exportadas", file=sys.stderr)
+
 
 if __name__ == "__main__":
     main()